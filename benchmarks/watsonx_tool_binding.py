@@ -0,0 +1,110 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compare watsonx function-calling prompt size and tool-binding latency before and after bound-client caching.
+
+Uses the same LLM_* / IS_WATSONX environment as the agent:
+
+    python benchmarks/watsonx_tool_binding.py --calls 50
+    python benchmarks/watsonx_tool_binding.py --calls 5 --invoke   # also time real function-calling requests
+"""
+
+import argparse
+import statistics
+import time
+
+from lumyn.llm_backends.function_calling_templates import FOR_NON_NATIVE_FUNCTION_CALLING
+from lumyn.llm_backends.get_default_backend import get_llm_backend_for_tools
+from lumyn.llm_backends.watsonx_ai import WatsonxLLMBackend, function_calling_system_prompt
+from lumyn.tools.grafana.custom_function_definitions_grafana import fd_query_jaeger_traces, fd_query_loki_logs
+from lumyn.utils.tokens import estimate_tokens
+
+# The NL2Traces / NL2Logs system prompts, alternated the way a diagnosis run alternates the tools.
+CASES = [
+    ("You are a function calling bot. You are given a prompt and you need to generate a tool call based on the prompt. "
+     "Make sure to fill the parameters correctly. If no timeframe is given always get the last 10 minutes of traces.",
+     [fd_query_jaeger_traces]),
+    ("Provide the correct tool call for querying loki logs using parameters provided in the input. For the LogQL query "
+     "generate it using the input as instructions. Do not wrap the LogQL query in any tags or special formatting.",
+     [fd_query_loki_logs]),
+]
+INPUT = "get traces for frontend for the last 15 minutes"
+
+
+def legacy_system_prompt(system_prompt: str) -> str:
+    # Previous behaviour: `system_prompt += system_prompt + ...` sent the prompt twice.
+    return system_prompt + system_prompt + "\n" + FOR_NON_NATIVE_FUNCTION_CALLING
+
+
+def time_calls(function, calls: int):
+    durations = []
+    for position in range(calls):
+        started = time.perf_counter()
+        function(position)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def describe(label: str, durations) -> str:
+    return (f"{label}: median {statistics.median(durations) * 1000:.2f}ms, "
+            f"max {max(durations) * 1000:.2f}ms over {len(durations)} calls")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--invoke", action="store_true", help="also send real function-calling requests")
+    args = parser.parse_args()
+
+    backend = get_llm_backend_for_tools()
+    if not isinstance(backend, WatsonxLLMBackend):
+        raise SystemExit("Configure a watsonx backend (IS_WATSONX=True) to run this benchmark.")
+
+    for system_prompt, _ in CASES:
+        before, after = legacy_system_prompt(system_prompt), function_calling_system_prompt(system_prompt)
+        print(f"system prompt: {len(before)} -> {len(after)} chars, "
+              f"~{estimate_tokens(before)} -> ~{estimate_tokens(after)} tokens")
+
+    legacy_client = backend.client
+
+    def legacy_bind(position: int):
+        nonlocal legacy_client
+        # Previous behaviour: rebind on every call, on top of whatever was bound before.
+        legacy_client = legacy_client.bind_tools(tools=CASES[position % len(CASES)][1])
+
+    def cached_bind(position: int):
+        backend._bound_client(CASES[position % len(CASES)][1])
+
+    print(describe("bind_tools per call (before)", time_calls(legacy_bind, args.calls)))
+    print(describe("cached bound client (after)", time_calls(cached_bind, args.calls)))
+
+    if args.invoke:
+        legacy_client = backend.client
+
+        def legacy_invoke(position: int):
+            nonlocal legacy_client
+            system_prompt, tools = CASES[position % len(CASES)]
+            legacy_client = legacy_client.bind_tools(tools=tools)
+            legacy_client.invoke([{"role": "system", "content": legacy_system_prompt(system_prompt)},
+                                  {"role": "user", "content": INPUT}], params=backend.parameters)
+
+        def cached_invoke(position: int):
+            system_prompt, tools = CASES[position % len(CASES)]
+            backend._function_calling_inference(system_prompt, INPUT, tools)
+
+        print(describe("function calling (before)", time_calls(legacy_invoke, args.calls)))
+        print(describe("function calling (after)", time_calls(cached_invoke, args.calls)))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,7 +13,48 @@
 # limitations under the License.
 
 
-from typing import Any, Dict, Optional
+import asyncio
+import os
+import re
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import httpx
+
+from lumyn.utils.async_bridge import gather_bounded
+
+from .response_cache import cache_key, get_response_cache
+
+LLM_BATCH_CONCURRENCY = int(os.getenv("LLM_BATCH_CONCURRENCY", 8))
+# One backend is shared by every tool, so its HTTP pool must cover the tools' combined concurrency.
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", 32))
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", 16))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", 120))
+
+
+def llm_http_limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=LLM_HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY)
+
+
+def stream_until(chunks: Iterable[Optional[str]], pattern: str) -> Tuple[str, bool]:
+    """Accumulate streamed text until `pattern` matches it.
+
+    Returns the text up to the end of the first match and True, or all of the text and False if the stream
+    ended without a match. The caller closes the stream, which is what stops generation.
+    """
+    compiled = re.compile(pattern, re.DOTALL)
+    text = ""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        text += chunk
+        match = compiled.search(text)
+        if match:
+            return text[:match.end()], True
+    return text, False
 
 
 class BaseLLMBackend:
@@ -27,9 +68,120 @@ class BaseLLMBackend:
         self.seed = seed
         self.top_p = top_p
         self.parameters = parameters
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._batch_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._batch_loop_lock = threading.Lock()
+
+    def inference(self, system_prompt: str, input: str) -> str:
+        return self._cached("inference", system_prompt, input, None, lambda: self._inference(system_prompt, input))
+
+    def inference_until(self, system_prompt: str, input: str, pattern: str) -> str:
+        """Like inference, but generation stops as soon as the output matches `pattern` (searched with re.DOTALL)."""
+        # The pattern goes in the tools slot of the cache key; a truncated answer is only reusable for the same pattern.
+        return self._cached("inference_until", system_prompt, input, pattern,
+                            lambda: self._inference_until(system_prompt, input, pattern))
+
+    def function_calling_inference(self, system_prompt: str, input: str, tools: Optional[Dict] = None) -> Tuple[str, Dict]:
+        # Cached values come back from JSON as lists; callers unpack a (name, arguments) pair either way.
+        function_name, function_arguments = self._cached(
+            "function_calling", system_prompt, input, tools,
+            lambda: list(self._function_calling_inference(system_prompt, input, tools)),
+            should_store=lambda value: value[0] is not None)
+        return function_name, function_arguments
+
+    async def ainference(self, system_prompt: str, input: str) -> str:
+        return await self._acached("inference", system_prompt, input, None,
+                                   lambda: self._ainference(system_prompt, input))
+
+    async def afunction_calling_inference(self, system_prompt: str, input: str,
+                                          tools: Optional[Dict] = None) -> Tuple[str, Dict]:
+
+        async def compute():
+            return list(await self._afunction_calling_inference(system_prompt, input, tools))
 
-    def inference(self, prompt: str) -> str:
+        function_name, function_arguments = await self._acached("function_calling", system_prompt, input, tools,
+                                                                compute, should_store=lambda value: value[0] is not None)
+        return function_name, function_arguments
+
+    async def abatch_inference(self, requests: List[Tuple[str, str]],
+                               max_concurrency: int = LLM_BATCH_CONCURRENCY) -> List[Union[str, Exception]]:
+        return await gather_bounded((self.ainference(system_prompt, input) for system_prompt, input in requests),
+                                    limit=max_concurrency)
+
+    def batch_inference(self, requests: List[Tuple[str, str]],
+                        max_concurrency: int = LLM_BATCH_CONCURRENCY) -> List[Union[str, Exception]]:
+        """Run (system_prompt, input) pairs concurrently, at most max_concurrency in flight.
+
+        Results are in request order; a failed request leaves its exception in its slot.
+        """
+        # Scheduling from this thread carries its context variables (e.g. the LLM cache's tool scope) to the task.
+        future = asyncio.run_coroutine_threadsafe(self.abatch_inference(requests, max_concurrency),
+                                                  self._batch_event_loop())
+        return future.result()
+
+    def _batch_event_loop(self) -> asyncio.AbstractEventLoop:
+        """Event loop on a daemon thread that every sync batch runs on.
+
+        A fresh loop per batch would need a fresh async client (and connection pool) per batch, and nothing would
+        close them; with one long-lived loop the backend keeps one async client whose connections are reused.
+        """
+        with self._batch_loop_lock:
+            if self._batch_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name=f"llm-batch-{self.model_name}", daemon=True).start()
+                self._batch_loop = loop
+            return self._batch_loop
+
+    def _cache_key(self, kind: str, system_prompt: str, input: str, tools: Optional[Dict]) -> str:
+        parameters = {
+            "temperature": self.temperature,
+            "seed": self.seed,
+            "top_p": self.top_p,
+            "parameters": self.parameters,
+            "api_version": self.api_version,
+        }
+        return cache_key(kind, self.model_name, self.base_url, system_prompt, input, tools, parameters)
+
+    def _cached(self, kind: str, system_prompt: str, input: str, tools: Optional[Dict], compute: Callable[[], Any],
+                should_store: Callable[[Any], bool] = lambda value: value is not None) -> Any:
+        cache = get_response_cache()
+        if cache is None:
+            return compute()
+        return cache.cached(self._cache_key(kind, system_prompt, input, tools), kind, compute, should_store)
+
+    async def _acached(self, kind: str, system_prompt: str, input: str, tools: Optional[Dict],
+                       compute: Callable[[], Awaitable[Any]],
+                       should_store: Callable[[Any], bool] = lambda value: value is not None) -> Any:
+        cache = get_response_cache()
+        if cache is None:
+            return await compute()
+        return await cache.acached(self._cache_key(kind, system_prompt, input, tools), kind, compute, should_store)
+
+    def _async_client(self) -> Any:
+        """Native async client for the running event loop; async HTTP pools cannot be shared across loops."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = self._create_async_client()
+        return client
+
+    def _create_async_client(self) -> Any:
+        raise NotImplementedError("Backends with native async support should override this")
+
+    def _inference(self, system_prompt: str, input: str) -> str:
         raise NotImplementedError("This method should be overridden by subclasses")
 
-    def function_calling_inference(self, system_prompt: str, input: str, tools: Optional[Dict] = None) -> str:
+    def _function_calling_inference(self, system_prompt: str, input: str, tools: Optional[Dict] = None) -> Tuple[str, Dict]:
         raise NotImplementedError("This method should be overridden by subclasses")
+
+    def _inference_until(self, system_prompt: str, input: str, pattern: str) -> str:
+        # Backends without streaming generate the full answer; callers still extract the match themselves.
+        return self._inference(system_prompt, input)
+
+    async def _ainference(self, system_prompt: str, input: str) -> str:
+        # Backends without a native async client run the blocking call on a worker thread.
+        return await asyncio.to_thread(self._inference, system_prompt, input)
+
+    async def _afunction_calling_inference(self, system_prompt: str, input: str,
+                                           tools: Optional[Dict] = None) -> Tuple[str, Dict]:
+        return await asyncio.to_thread(self._function_calling_inference, system_prompt, input, tools)
@@ -14,10 +14,15 @@
 
 
 import json
+import logging
 import os
+import threading
+import time
+from typing import Any, Dict, Tuple
 
 from crewai import LLM
 from dotenv import load_dotenv
+from ibm_watsonx_ai import APIClient, Credentials
 from langchain_ibm import WatsonxLLM
 
 from .open_ai import OpenAILLMBackend
@@ -26,6 +31,9 @@ from .watsonx_ai import WatsonxLLMBackend
 
 load_dotenv()
 
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
 global LLM_MODEL_NAME, LLM_BASE_URL, LLM_API_KEY, LLM_SEED, LLM_TOP_P, LLM_API_VERSION, LLM_TEMPERATURE, LLM_PROJECT_ID, IS_WATSONX, IS_AZURE
 
 try:
@@ -138,7 +146,55 @@ def get_llm_backend_for_agents():
     return llm
 
 
+_tool_backends: Dict[Tuple, Any] = {}
+_tool_backend_stats: Dict[Tuple, Dict[str, Any]] = {}
+_tool_backends_lock = threading.Lock()
+_watsonx_client = None
+
+
+def _tool_backend_key() -> Tuple:
+    parameters = json.dumps(LLM_CONFIGURATION_PARAMETERS, sort_keys=True) if IS_WATSONX else None
+    return (IS_WATSONX, IS_AZURE, LLM_MODEL_NAME, LLM_BASE_URL, LLM_API_VERSION, LLM_SEED, LLM_TOP_P, LLM_TEMPERATURE,
+            parameters)
+
+
+def _get_watsonx_client():
+    """One ibm_watsonx_ai APIClient per process, so the IAM token is fetched once and refreshed by the SDK.
+
+    Only IBM Cloud URLs are handled here; other deployments need username/instance id and keep letting
+    ChatWatsonx build its own client from the environment.
+    """
+    global _watsonx_client
+    if "cloud.ibm.com" not in LLM_BASE_URL:
+        return None
+    if _watsonx_client is None:
+        _watsonx_client = APIClient(credentials=Credentials(url=LLM_BASE_URL, api_key=LLM_API_KEY),
+                                    project_id=LLM_PROJECT_ID)
+    return _watsonx_client
+
+
 def get_llm_backend_for_tools():
+    """Shared tool backend for the current configuration; backends and their HTTP clients are thread-safe."""
+    key = _tool_backend_key()
+    with _tool_backends_lock:
+        backend = _tool_backends.get(key)
+        if backend is None:
+            started = time.monotonic()
+            backend = _tool_backends[key] = _create_llm_backend_for_tools()
+            _tool_backend_stats[key] = {"created_seconds": time.monotonic() - started, "reuses": 0}
+            logger.info(f"Created {type(backend).__name__} for {LLM_MODEL_NAME} "
+                        f"in {_tool_backend_stats[key]['created_seconds']:.2f}s")
+        else:
+            _tool_backend_stats[key]["reuses"] += 1
+        return backend
+
+
+def get_llm_backend_stats() -> Dict[str, Dict[str, Any]]:
+    with _tool_backends_lock:
+        return {f"{type(_tool_backends[key]).__name__}:{key[2]}": dict(stats) for key, stats in _tool_backend_stats.items()}
+
+
+def _create_llm_backend_for_tools():
     if IS_WATSONX:
         return WatsonxLLMBackend(model_name=LLM_MODEL_NAME,
                                  base_url=LLM_BASE_URL,
@@ -147,7 +203,8 @@ def get_llm_backend_for_tools():
                                  seed=None,
                                  top_p=None,
                                  parameters=LLM_CONFIGURATION_PARAMETERS,
-                                 project_id=LLM_PROJECT_ID)
+                                 project_id=LLM_PROJECT_ID,
+                                 watsonx_client=_get_watsonx_client())
     elif IS_AZURE:
         return OpenAILLMBackendAzure(model_name=LLM_MODEL_NAME,
                                      base_url=LLM_BASE_URL,
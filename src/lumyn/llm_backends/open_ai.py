@@ -17,9 +17,9 @@ import json
 import logging
 from typing import Any, Dict, Optional, Tuple
 
-from openai import OpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
 
-from .base import BaseLLMBackend
+from .base import BaseLLMBackend, llm_http_limits, stream_until
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
@@ -35,9 +35,10 @@ class OpenAILLMBackend(BaseLLMBackend):
                          seed=seed, top_p=top_p, 
                          parameters=parameters,
                          api_version=api_version)
-        self.client = OpenAI(base_url=base_url, api_key=self.api_key)
+        self.client = OpenAI(base_url=base_url, api_key=self.api_key,
+                             http_client=DefaultHttpxClient(limits=llm_http_limits()))
 
-    def inference(self, system_prompt: str, input: str) -> str:
+    def _inference(self, system_prompt: str, input: str) -> str:
         logger.info(f"OpenAI-Inference NL input received: {input}")
         print(f"OpenAI-Inference NL input received: {input}")
 
@@ -60,7 +61,35 @@ class OpenAILLMBackend(BaseLLMBackend):
                                                          temperature=self.temperature)
         return completion.choices[0].message.content
 
-    def function_calling_inference(self,
+    def _inference_until(self, system_prompt: str, input: str, pattern: str) -> str:
+        logger.info(f"OpenAI-StreamingInference NL input received: {input}")
+        print(f"OpenAI-StreamingInference NL input received: {input}")
+
+        stream = self.client.chat.completions.create(model=self.model_name,
+                                                     messages=[
+                                                         {
+                                                             "role": "system",
+                                                             "content": system_prompt
+                                                         },
+                                                         {
+                                                             "role": "user",
+                                                             "content": input
+                                                         },
+                                                     ],
+                                                     seed=self.seed,
+                                                     top_p=self.top_p,
+                                                     temperature=self.temperature,
+                                                     stream=True)
+        try:
+            text, matched = stream_until((chunk.choices[0].delta.content for chunk in stream if chunk.choices), pattern)
+        finally:
+            # Closing the response aborts generation instead of paying for tokens after the match.
+            stream.close()
+        if matched:
+            logger.info(f"OpenAI-StreamingInference stopped generation after {len(text)} chars")
+        return text
+
+    def _function_calling_inference(self,
                                    system_prompt: str,
                                    input: str,
                                    tools: Optional[Dict] = None) -> Tuple[str, Dict]:
@@ -82,6 +111,9 @@ class OpenAILLMBackend(BaseLLMBackend):
                                                          seed=self.seed,
                                                          top_p=self.top_p,
                                                          temperature=self.temperature)
+        return self._parse_tool_call(completion)
+
+    def _parse_tool_call(self, completion) -> Tuple[str, Dict]:
         finish_reason = completion.choices[0].finish_reason
         if finish_reason == "tool_calls":
             function_name, function_arguments = completion.choices[0].message.tool_calls[0].function.name, json.loads(
@@ -96,3 +128,47 @@ class OpenAILLMBackend(BaseLLMBackend):
         logger.info(f"OpenAI-FunctionCallingInference unsuccessful finish reason is: {finish_reason}")
         print(f"OpenAI-FunctionCallingInference unsuccessful finish reason is: {finish_reason}")
         return None, None
+
+    def _create_async_client(self) -> AsyncOpenAI:
+        return AsyncOpenAI(base_url=self.base_url, api_key=self.api_key,
+                           http_client=DefaultAsyncHttpxClient(limits=llm_http_limits()))
+
+    async def _ainference(self, system_prompt: str, input: str) -> str:
+        logger.info(f"OpenAI-AsyncInference NL input received: {input}")
+        completion = await self._async_client().chat.completions.create(model=self.model_name,
+                                                                        messages=[
+                                                                            {
+                                                                                "role": "system",
+                                                                                "content": system_prompt
+                                                                            },
+                                                                            {
+                                                                                "role": "user",
+                                                                                "content": input
+                                                                            },
+                                                                        ],
+                                                                        seed=self.seed,
+                                                                        top_p=self.top_p,
+                                                                        temperature=self.temperature)
+        return completion.choices[0].message.content
+
+    async def _afunction_calling_inference(self,
+                                           system_prompt: str,
+                                           input: str,
+                                           tools: Optional[Dict] = None) -> Tuple[str, Dict]:
+        logger.info(f"OpenAI-AsyncFunctionCallingInference NL input received: {input}")
+        completion = await self._async_client().chat.completions.create(model=self.model_name,
+                                                                        messages=[
+                                                                            {
+                                                                                "role": "system",
+                                                                                "content": system_prompt
+                                                                            },
+                                                                            {
+                                                                                "role": "user",
+                                                                                "content": input
+                                                                            },
+                                                                        ],
+                                                                        tools=tools,
+                                                                        seed=self.seed,
+                                                                        top_p=self.top_p,
+                                                                        temperature=self.temperature)
+        return self._parse_tool_call(completion)
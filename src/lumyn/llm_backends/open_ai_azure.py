@@ -17,9 +17,9 @@ import json
 import logging
 from typing import Any, Dict, Optional, Tuple
 
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI, AzureOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient
 
-from .base import BaseLLMBackend
+from .base import BaseLLMBackend, llm_http_limits, stream_until
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
@@ -29,9 +29,10 @@ class OpenAILLMBackendAzure(BaseLLMBackend):
 
     def __init__(self, model_name: str, base_url: str, api_key: str, api_version: str, temperature: float, seed: int , top_p: float, parameters: Any = None):
         super().__init__(model_name, base_url, api_key, api_version, temperature, seed, top_p, parameters)
-        self.client = AzureOpenAI(api_key=self.api_key, base_url=self.base_url, api_version=self.api_version)
+        self.client = AzureOpenAI(api_key=self.api_key, base_url=self.base_url, api_version=self.api_version,
+                                  http_client=DefaultHttpxClient(limits=llm_http_limits()))
 
-    def inference(self, system_prompt: str, input: str) -> str:
+    def _inference(self, system_prompt: str, input: str) -> str:
         logger.info(f"OpenAI-Inference NL input received: {input}")
         print(f"OpenAI-Inference NL input received: {input}")
 
@@ -54,7 +55,35 @@ class OpenAILLMBackendAzure(BaseLLMBackend):
                                                          seed=self.seed)
         return completion.choices[0].message.content
 
-    def function_calling_inference(self,
+    def _inference_until(self, system_prompt: str, input: str, pattern: str) -> str:
+        logger.info(f"OpenAI-StreamingInference NL input received: {input}")
+        print(f"OpenAI-StreamingInference NL input received: {input}")
+
+        stream = self.client.chat.completions.create(model=self.model_name,
+                                                     messages=[
+                                                         {
+                                                             "role": "system",
+                                                             "content": system_prompt
+                                                         },
+                                                         {
+                                                             "role": "user",
+                                                             "content": input
+                                                         },
+                                                     ],
+                                                     top_p=self.top_p,
+                                                     temperature=self.temperature,
+                                                     seed=self.seed,
+                                                     stream=True)
+        try:
+            text, matched = stream_until((chunk.choices[0].delta.content for chunk in stream if chunk.choices), pattern)
+        finally:
+            # Closing the response aborts generation instead of paying for tokens after the match.
+            stream.close()
+        if matched:
+            logger.info(f"OpenAI-StreamingInference stopped generation after {len(text)} chars")
+        return text
+
+    def _function_calling_inference(self,
                                    system_prompt: str,
                                    input: str,
                                    tools: Optional[Dict] = None) -> Tuple[str, Dict]:
@@ -76,6 +105,9 @@ class OpenAILLMBackendAzure(BaseLLMBackend):
                                                          seed=self.seed,
                                                          top_p=self.top_p,
                                                          temperature=self.temperature)
+        return self._parse_tool_call(completion)
+
+    def _parse_tool_call(self, completion) -> Tuple[str, Dict]:
         finish_reason = completion.choices[0].finish_reason
         if finish_reason == "tool_calls":
             function_name, function_arguments = completion.choices[0].message.tool_calls[0].function.name, json.loads(
@@ -90,3 +122,47 @@ class OpenAILLMBackendAzure(BaseLLMBackend):
         logger.info(f"OpenAI-FunctionCallingInference unsuccessful finish reason is: {finish_reason}")
         print(f"OpenAI-FunctionCallingInference unsuccessful finish reason is: {finish_reason}")
         return None, None
+
+    def _create_async_client(self) -> AsyncAzureOpenAI:
+        return AsyncAzureOpenAI(api_key=self.api_key, base_url=self.base_url, api_version=self.api_version,
+                                http_client=DefaultAsyncHttpxClient(limits=llm_http_limits()))
+
+    async def _ainference(self, system_prompt: str, input: str) -> str:
+        logger.info(f"OpenAI-AsyncInference NL input received: {input}")
+        completion = await self._async_client().chat.completions.create(model=self.model_name,
+                                                                        messages=[
+                                                                            {
+                                                                                "role": "system",
+                                                                                "content": system_prompt
+                                                                            },
+                                                                            {
+                                                                                "role": "user",
+                                                                                "content": input
+                                                                            },
+                                                                        ],
+                                                                        top_p=self.top_p,
+                                                                        temperature=self.temperature,
+                                                                        seed=self.seed)
+        return completion.choices[0].message.content
+
+    async def _afunction_calling_inference(self,
+                                           system_prompt: str,
+                                           input: str,
+                                           tools: Optional[Dict] = None) -> Tuple[str, Dict]:
+        logger.info(f"OpenAI-AsyncFunctionCallingInference NL input received: {input}")
+        completion = await self._async_client().chat.completions.create(model=self.model_name,
+                                                                        messages=[
+                                                                            {
+                                                                                "role": "system",
+                                                                                "content": system_prompt
+                                                                            },
+                                                                            {
+                                                                                "role": "user",
+                                                                                "content": input
+                                                                            },
+                                                                        ],
+                                                                        tools=tools,
+                                                                        seed=self.seed,
+                                                                        top_p=self.top_p,
+                                                                        temperature=self.temperature)
+        return self._parse_tool_call(completion)
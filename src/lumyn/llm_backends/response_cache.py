@@ -0,0 +1,215 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import contextlib
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "False") == "True"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "lumyn", "llm_cache.db"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# Milliseconds a process waits on another process's write lock before giving up on the cache for that call.
+LLM_CACHE_BUSY_TIMEOUT = int(os.getenv("LLM_CACHE_BUSY_TIMEOUT", 5000))
+# Evict down to this fraction of the limit so eviction does not run on every write once the cache is full.
+EVICTION_TARGET_RATIO = 0.9
+
+_current_tool: contextvars.ContextVar[str] = contextvars.ContextVar("llm_cache_tool", default="unscoped")
+
+
+@contextlib.contextmanager
+def tool_scope(name: str):
+    """Attribute LLM calls made inside the block to the named tool in the cache statistics."""
+    token = _current_tool.set(name)
+    try:
+        yield
+    finally:
+        _current_tool.reset(token)
+
+
+def scoped_tool_run(run: Callable) -> Callable:
+    """Decorator for a tool's `_run` that opens a tool_scope named after the tool."""
+
+    @functools.wraps(run)
+    def wrapper(self, *args, **kwargs):
+        with tool_scope(self.name):
+            return run(self, *args, **kwargs)
+
+    return wrapper
+
+
+def cache_key(kind: str, model: str, base_url: str, system_prompt: str, input: str, tools: Any,
+              parameters: Dict[str, Any]) -> str:
+    payload = json.dumps([kind, model, base_url, system_prompt, input, tools, parameters], sort_keys=True,
+                         default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed LLM response cache with size-based LRU eviction, safe to share between processes."""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+        self._stats_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, kind TEXT NOT NULL, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_access REAL NOT NULL)")
+        connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        # Running total of responses.size, kept in the writes' own transactions so eviction need not scan.
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta (id INTEGER PRIMARY KEY CHECK (id = 0), total_size INTEGER NOT NULL)")
+        connection.execute("INSERT OR IGNORE INTO meta VALUES (0, (SELECT COALESCE(SUM(size), 0) FROM responses))")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads; each thread gets its own.
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=LLM_CACHE_BUSY_TIMEOUT / 1000, isolation_level=None)
+            connection.execute(f"PRAGMA busy_timeout={LLM_CACHE_BUSY_TIMEOUT}")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _record(self, hit: bool):
+        with self._stats_lock:
+            self._stats[_current_tool.get()]["hits" if hit else "misses"] += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        connection = self._connection()
+        row = connection.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._record(False)
+            return None
+        self._record(True)
+        try:
+            connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.OperationalError:
+            # Recency is best effort; a busy writer elsewhere should not fail a hit.
+            pass
+        return json.loads(row[0])
+
+    def put(self, key: str, kind: str, value: Any):
+        encoded = json.dumps(value)
+        now = time.time()
+        connection = self._connection()
+        size = len(encoded.encode())
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            replaced = connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                               (key, kind, encoded, size, now, now))
+            connection.execute("UPDATE meta SET total_size = total_size + ? WHERE id = 0",
+                               (size - (replaced[0] if replaced else 0),))
+            total = connection.execute("SELECT total_size FROM meta WHERE id = 0").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(connection, total)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _evict(self, connection: sqlite3.Connection, total: int):
+        excess = total - int(self.max_bytes * EVICTION_TARGET_RATIO)
+        victims, freed = [], 0
+        for key, size in connection.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        connection.executemany("DELETE FROM responses WHERE key = ?", victims)
+        connection.execute("UPDATE meta SET total_size = total_size - ? WHERE id = 0", (freed,))
+        logger.info(f"LLM response cache evicted {len(victims)} entries")
+
+    def cached(self, key: str, kind: str, compute: Callable[[], Any],
+               should_store: Callable[[Any], bool] = lambda value: value is not None) -> Any:
+        try:
+            value = self.get(key)
+        except sqlite3.Error as e:
+            logger.error(f"LLM response cache read failed: {e}")
+            return compute()
+        if value is not None:
+            logger.info(f"LLM response cache hit for {_current_tool.get()} ({kind})")
+            return value
+        value = compute()
+        if should_store(value):
+            try:
+                self.put(key, kind, value)
+            except sqlite3.Error as e:
+                logger.error(f"LLM response cache write failed: {e}")
+        return value
+
+    async def acached(self, key: str, kind: str, compute: Callable[[], Awaitable[Any]],
+                      should_store: Callable[[Any], bool] = lambda value: value is not None) -> Any:
+        # SQLite lookups are local and short; only the LLM call itself is awaited.
+        try:
+            value = self.get(key)
+        except sqlite3.Error as e:
+            logger.error(f"LLM response cache read failed: {e}")
+            return await compute()
+        if value is not None:
+            logger.info(f"LLM response cache hit for {_current_tool.get()} ({kind})")
+            return value
+        value = await compute()
+        if should_store(value):
+            try:
+                self.put(key, kind, value)
+            except sqlite3.Error as e:
+                logger.error(f"LLM response cache write failed: {e}")
+        return value
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._stats_lock:
+            return {
+                tool: {**counts, "hit_rate": counts["hits"] / max(counts["hits"] + counts["misses"], 1)}
+                for tool, counts in self._stats.items()
+            }
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """The process-wide cache, or None when LLM_CACHE_ENABLED is off."""
+    global _response_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
+
+
+def get_response_cache_stats() -> Optional[Dict[str, Dict[str, Any]]]:
+    cache = _response_cache
+    return cache.stats() if cache is not None else None
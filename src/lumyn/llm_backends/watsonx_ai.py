@@ -13,15 +13,18 @@
 # limitations under the License.
 
 
+import functools
+import hashlib
 import json
 import logging
 import os
 import re
+import threading
 from typing import Any, Dict, Optional, Tuple
 
 from langchain_ibm import ChatWatsonx
 
-from .base import BaseLLMBackend
+from .base import BaseLLMBackend, stream_until
 from .function_calling_templates import FOR_NON_NATIVE_FUNCTION_CALLING
 
 logging.basicConfig(
@@ -30,10 +33,38 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=128)
+def function_calling_system_prompt(system_prompt: str) -> str:
+    """System prompt plus the non-native function calling instructions, assembled once per distinct prompt."""
+    return system_prompt + "\n" + FOR_NON_NATIVE_FUNCTION_CALLING
+
+
+def tools_key(tools: Any) -> str:
+    return hashlib.sha256(json.dumps(tools, sort_keys=True, default=str).encode()).hexdigest()
+
+
+FUNCTION_CALL_START = re.compile(r"<function=(\w+)>\s*")
+FUNCTION_CALL_END = "</function>"
+_json_decoder = json.JSONDecoder()
+
+
+def parse_streamed_function_call(text: str) -> Optional[Tuple[str, Dict]]:
+    """The first `<function=name>{...}` block in partial output, once its JSON arguments are complete and valid."""
+    match = FUNCTION_CALL_START.search(text)
+    if match is None or not text.startswith("{", match.end()):
+        return None
+    try:
+        arguments, _ = _json_decoder.raw_decode(text, match.end())
+    except json.JSONDecodeError:
+        return None
+    return match.group(1), arguments
+
+
 class WatsonxLLMBackend(BaseLLMBackend):
 
     def __init__(self, model_name: str, base_url: str, api_key: str,
-                 temperature: float, seed:int, top_p:float, parameters: Any, project_id: str):
+                 temperature: float, seed:int, top_p:float, parameters: Any, project_id: str,
+                 watsonx_client: Any = None):
         super().__init__(model_name, base_url, api_key, api_version=None, temperature=temperature, seed=seed, top_p=top_p,
                          parameters=parameters)
         
@@ -44,13 +75,19 @@ class WatsonxLLMBackend(BaseLLMBackend):
         
 
 
+        # A shared ibm_watsonx_ai APIClient (if given) holds the IAM token, so it is fetched once and refreshed
+        # by the SDK before expiry instead of per backend.
         self.client = ChatWatsonx(
             model_id=self.model_name,
             url=self.base_url,
             project_id=project_id,
+            watsonx_client=watsonx_client,
         )
+        # Tool-bound views of self.client, one per distinct tool schema; self.client itself stays unbound.
+        self._bound_clients: Dict[str, Any] = {}
+        self._bound_clients_lock = threading.Lock()
 
-    def inference(self, system_prompt: str, input: str) -> str:
+    def _inference(self, system_prompt: str, input: str) -> str:
         logger.info(f"WatsonX.AI-Inference NL input received: {input}")
         print(f"WatsonX.AI-Inference NL input received: {input}")
 
@@ -67,7 +104,31 @@ class WatsonxLLMBackend(BaseLLMBackend):
                                         params=self.parameters)
         return completion.content
 
-    def function_calling_inference(
+    def _inference_until(self, system_prompt: str, input: str, pattern: str) -> str:
+        logger.info(f"WatsonX.AI-StreamingInference NL input received: {input}")
+        print(f"WatsonX.AI-StreamingInference NL input received: {input}")
+
+        stream = self.client.stream([
+            {
+                "role": "system",
+                "content": system_prompt
+            },
+            {
+                "role": "user",
+                "content": input
+            },
+        ],
+                                    params=self.parameters)
+        try:
+            text, matched = stream_until((chunk.content for chunk in stream), pattern)
+        finally:
+            # Closing the generator closes the HTTP stream, which ends generation on the server.
+            stream.close()
+        if matched:
+            logger.info(f"WatsonX.AI-StreamingInference stopped generation after {len(text)} chars")
+        return text
+
+    def _function_calling_inference(
             self,
             system_prompt: str,
             input: str,
@@ -77,14 +138,75 @@ class WatsonxLLMBackend(BaseLLMBackend):
         print(
             f"WatsonX.AI-FunctionCallingInference NL input received: {input}")
 
-        if self.is_function_calling_supported:
-            if tools is not None:
-                self.client = self.client.bind_tools(tools=tools)
+        client, system_prompt = self._prepare_function_calling(system_prompt, tools)
+        if not self.is_function_calling_supported:
+            return self._stream_function_call(system_prompt, input)
+        completion = client.invoke([
+            {
+                "role": "system",
+                "content": system_prompt
+            },
+            {
+                "role": "user",
+                "content": input
+            },
+        ],
+                                   params=self.parameters)
+        return self._parse_function_calling_completion(completion)
+
+    async def _ainference(self, system_prompt: str, input: str) -> str:
+        logger.info(f"WatsonX.AI-AsyncInference NL input received: {input}")
+        completion = await self.client.ainvoke([
+            {
+                "role": "system",
+                "content": system_prompt
+            },
+            {
+                "role": "user",
+                "content": input
+            },
+        ],
+                                               params=self.parameters)
+        return completion.content
+
+    async def _afunction_calling_inference(self,
+                                           system_prompt: str,
+                                           input: str,
+                                           tools: Optional[Dict] = None) -> Tuple[str, Dict]:
+        logger.info(f"WatsonX.AI-AsyncFunctionCallingInference NL input received: {input}")
+        client, system_prompt = self._prepare_function_calling(system_prompt, tools)
+        if not self.is_function_calling_supported:
+            return await self._astream_function_call(system_prompt, input)
+        completion = await client.ainvoke([
+            {
+                "role": "system",
+                "content": system_prompt
+            },
+            {
+                "role": "user",
+                "content": input
+            },
+        ],
+                                          params=self.parameters)
+        return self._parse_function_calling_completion(completion)
+
+    def _prepare_function_calling(self, system_prompt: str, tools: Optional[Dict]):
+        return self._bound_client(tools), function_calling_system_prompt(system_prompt)
 
-        # if self.is_function_calling_supported:
-        system_prompt += system_prompt + "\n" + FOR_NON_NATIVE_FUNCTION_CALLING
+    def _bound_client(self, tools: Optional[Dict]):
+        if not self.is_function_calling_supported or tools is None:
+            return self.client
+        key = tools_key(tools)
+        with self._bound_clients_lock:
+            client = self._bound_clients.get(key)
+            if client is None:
+                client = self._bound_clients[key] = self.client.bind_tools(tools=tools)
+            return client
 
-        completion = self.client.invoke([
+    def _stream_function_call(self, system_prompt: str, input: str) -> Tuple[str, Dict]:
+        # Without native tool calls the model writes a <function=...> block; stop as soon as it is complete
+        # rather than letting it keep generating explanation after the call.
+        stream = self.client.stream([
             {
                 "role": "system",
                 "content": system_prompt
@@ -94,7 +216,63 @@ class WatsonxLLMBackend(BaseLLMBackend):
                 "content": input
             },
         ],
-                                        params=self.parameters)
+                                    params=self.parameters,
+                                    stop=[FUNCTION_CALL_END])
+        text = ""
+        try:
+            for chunk in stream:
+                text += chunk.content or ""
+                function_call = parse_streamed_function_call(text)
+                if function_call is not None:
+                    return self._log_streamed_function_call(function_call)
+        finally:
+            stream.close()
+        return self._parse_streamed_text(text)
+
+    async def _astream_function_call(self, system_prompt: str, input: str) -> Tuple[str, Dict]:
+        stream = self.client.astream([
+            {
+                "role": "system",
+                "content": system_prompt
+            },
+            {
+                "role": "user",
+                "content": input
+            },
+        ],
+                                     params=self.parameters,
+                                     stop=[FUNCTION_CALL_END])
+        text = ""
+        try:
+            async for chunk in stream:
+                text += chunk.content or ""
+                function_call = parse_streamed_function_call(text)
+                if function_call is not None:
+                    return self._log_streamed_function_call(function_call)
+        finally:
+            await stream.aclose()
+        return self._parse_streamed_text(text)
+
+    def _log_streamed_function_call(self, function_call: Tuple[str, Dict]) -> Tuple[str, Dict]:
+        function_name, function_arguments = function_call
+        logger.info(
+            f"WatsonX.AI-FunctionCallingInference function arguments via stream identified are: {function_name} {function_arguments}"
+        )
+        print(
+            f"WatsonX.AI-FunctionCallingInference function arguments via stream identified are: {function_name} {function_arguments}"
+        )
+        return function_name, function_arguments
+
+    def _parse_streamed_text(self, text: str) -> Tuple[str, Dict]:
+        # The stop sequence is not echoed back, so close the block before handing it to the full-text parser.
+        function_name, function_arguments = self.parse_tool_response(text + FUNCTION_CALL_END)
+        if function_name is not None and function_arguments is not None:
+            return self._log_streamed_function_call((function_name, function_arguments))
+        logger.info(f"WatsonX.AI-FunctionCallingInference unsuccessful streamed response: {text}")
+        print(f"WatsonX.AI-FunctionCallingInference unsuccessful streamed response: {text}")
+        return None, None
+
+    def _parse_function_calling_completion(self, completion) -> Tuple[str, Dict]:
         finish_reason = completion.response_metadata["finish_reason"]
         if finish_reason == "tool_calls":
             function_name, function_arguments = completion.tool_calls[0][
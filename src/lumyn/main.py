@@ -21,8 +21,14 @@ import sys
 import time
 
 from lumyn.crew import LumynCrew
+from lumyn.llm_backends.get_default_backend import get_llm_backend_stats
+from lumyn.llm_backends.response_cache import get_response_cache_stats
+from lumyn.tools.evidence_prefetch import prefetch_evidence, watch_alert_namespaces
 from lumyn.tools.grafana.get_alerts import GetAlertsCustomTool
+from lumyn.tools.grafana.connection_pool import get_connection_pool_stats
 from lumyn.tools.grafana.get_topology_nodes import GetTopologyNodes
+from lumyn.tools.kubectl.kube_api_engine import get_kube_api_stats
+from lumyn.utils.evidence_cache import EVIDENCE_PREFETCH
 
 # Logs directory, optional
 logs_dir_path = "/runner"
@@ -95,6 +101,22 @@ def format_final_op():
         json.dump(op_json, f, indent=4, separators=(',', ': '))
 
 
+def report_run_stats():
+    """Print what the process-wide clients and caches served during the run."""
+    connection_pool_stats = get_connection_pool_stats()
+    if connection_pool_stats is not None:
+        print(f"Grafana connection pool stats: {json.dumps(connection_pool_stats)}")
+    kube_api_stats = get_kube_api_stats()
+    if kube_api_stats is not None:
+        print(f"Kubernetes API engine stats: {json.dumps(kube_api_stats)}")
+    llm_backend_stats = get_llm_backend_stats()
+    if llm_backend_stats:
+        print(f"Shared tool LLM backend stats: {json.dumps(llm_backend_stats)}")
+    response_cache_stats = get_response_cache_stats()
+    if response_cache_stats is not None:
+        print(f"LLM response cache hit rates per tool: {json.dumps(response_cache_stats)}")
+
+
 def run():
     """
     Run the crew.
@@ -135,10 +157,20 @@ def run():
             os.environ.get('SRE_AGENT_NAME_VERSION_NUMBER'),
             os.environ.get('LLM_MODEL_NAME').replace('/', '_'),
             os.environ.get('INCIDENT_NUMBER'), os.environ.get('EXP_NAME'))
+    alert_start_time = datetime.datetime.now().isoformat()
+    # Tools anchor their default query windows on the alert start time.
+    os.environ["ALERT_START_TIME"] = alert_start_time
     with open(os.path.join(eval_dir, 'alert_start_time.txt'), 'w') as f:
-        f.write(datetime.datetime.now().isoformat())
+        f.write(alert_start_time)
+
+    # List and watch the alerting namespaces now rather than on the crew's first kubectl read there.
+    watch_alert_namespaces(alerts)
+    if EVIDENCE_PREFETCH:
+        # Pull the obvious first queries for the alerting entities up front so the crew starts warm.
+        prefetch_evidence(alerts, nodes)
 
     LumynCrew().crew().kickoff(inputs=inputs)
+    report_run_stats()
     format_final_op()
 
 
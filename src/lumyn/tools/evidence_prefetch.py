@@ -0,0 +1,311 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from string import Template
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from lumyn.utils.evidence_cache import EvidenceCache, evidence_cache
+from lumyn.utils.incident_window import get_incident_window
+
+from .grafana.compact_encoding import COMPACT_ENCODING_TOKEN_BUDGET, ERROR_LINE
+from .grafana.grafana_base_client import GrafanaRequest
+from .grafana.jaeger_catalog import get_jaeger_catalog
+from .grafana.log_template_miner import SOURCE_LABELS, LogTemplateMiner
+from .grafana.loki_label_catalog import get_loki_label_catalog
+from .grafana.loki_pager import LOKI_MAX_QUERY_LIMIT
+from .grafana.metrics_summary import summarize_matrix
+from .grafana.nl2logs import NL2LogsCustomTool
+from .grafana.nl2metrics import PROMETHEUS_RANGE_MAX_POINTS, PROMETHEUS_RANGE_STEP
+from .grafana.nl2traces import NL2TRACES_BATCH_LIMIT
+from .grafana.trace_analytics import summarize_traces
+from .kubectl.kube_api_engine import KubernetesAPIEngine
+from .kubectl.nl2kubectl import NL2KUBECTL_USE_API, NL2KubectlCustomTool
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+EVIDENCE_MAX_ENTITIES = int(os.getenv("EVIDENCE_MAX_ENTITIES", 5))
+EVIDENCE_LOOKBACK_SECONDS = int(os.getenv("EVIDENCE_LOOKBACK_SECONDS", 1800))
+
+WORKLOAD_KINDS = ("Deployment", "StatefulSet", "DaemonSet")
+# Alert labels that name a workload outright, for when the topology does not list it.
+ENTITY_LABELS = ("deployment", "statefulset", "daemonset", "service_name", "service", "app")
+# $service is the entity's Jaeger service name; span metrics of services that do not emit them come back empty.
+GOLDEN_SIGNAL_QUERIES = {
+    "request_rate": 'sum(rate(traces_span_metrics_calls_total{service_name="$service"}[5m]))',
+    "error_rate": 'sum(rate(traces_span_metrics_calls_total{service_name="$service",'
+                  'status_code="STATUS_CODE_ERROR"}[5m]))',
+    "p95_latency_ms": 'histogram_quantile(0.95, sum by (le) ('
+                      'rate(traces_span_metrics_duration_milliseconds_bucket{service_name="$service"}[5m])))',
+    "cpu_cores": 'sum(rate(container_cpu_usage_seconds_total{namespace="$namespace",pod=~"$name-.*",'
+                 'container!=""}[5m]))',
+    "memory_bytes": 'sum(container_memory_working_set_bytes{namespace="$namespace",pod=~"$name-.*",container!=""})',
+    "restarts": 'sum(kube_pod_container_status_restarts_total{namespace="$namespace",pod=~"$name-.*"})',
+}
+
+
+class IncidentEntity(NamedTuple):
+    kind: str
+    name: str
+    namespace: Optional[str]
+    # The name the alert used when it differs, e.g. without the Helm release prefix of the workload.
+    alias: Optional[str] = None
+
+
+def alert_entities(alerts: List[Dict[str, Any]],
+                   nodes: Optional[List[Dict[str, Any]]],
+                   max_entities: int = EVIDENCE_MAX_ENTITIES) -> List[IncidentEntity]:
+    """Topology workloads (and services) the firing alerts' label values name, in alert order.
+
+    A label value matches a workload by name; the value of one of ENTITY_LABELS also matches a workload named
+    `<release>-<value>`, and a pod label's value one whose pods are named `<workload>-<hash>...`. Alerts whose labels
+    match nothing in the topology still contribute the workload named by one of ENTITY_LABELS.
+    """
+    candidates = [node for node in nodes or [] if node.get("kind") in WORKLOAD_KINDS + ("Service",)]
+    entities: Dict[Tuple[Optional[str], str], IncidentEntity] = {}
+
+    def add(entity: IncidentEntity):
+        existing = entities.get((entity.namespace, entity.name))
+        # A workload and its same-named Service are one entity; the workload is what pods and metrics hang off.
+        if existing is None or (existing.kind == "Service" and entity.kind != "Service"):
+            entities[(entity.namespace, entity.name)] = entity
+
+    for alert in alerts or []:
+        labels = {key: str(value) for key, value in (alert.get("labels") or {}).items()}
+        namespace = labels.get("namespace")
+        matched = False
+        for key, value in labels.items():
+            for node in candidates:
+                if namespace and node.get("namespace") != namespace:
+                    continue
+                name = node["name"]
+                if value == name or (key in ENTITY_LABELS and name.endswith(f"-{value}")) or (
+                        "pod" in key and node["kind"] != "Service" and value.startswith(f"{name}-")):
+                    alias = value if key in ENTITY_LABELS and value != name else None
+                    add(IncidentEntity(node["kind"], name, node.get("namespace") or namespace, alias))
+                    matched = True
+        if not matched:
+            label = next((label for label in ENTITY_LABELS if labels.get(label)), None)
+            if label is not None:
+                add(IncidentEntity("Deployment", labels[label], namespace))
+    return list(entities.values())[:max_entities]
+
+
+def _jaeger_service(name: str, services: List[str]) -> Optional[str]:
+    if name in services:
+        return name
+    related = [service for service in services if name.endswith(f"-{service}") or service.endswith(f"-{name}")]
+    return max(related, key=len) if related else None
+
+
+def _loki_selector(entity: IncidentEntity, label_values: Dict[str, List[str]]) -> Optional[str]:
+    matchers = []
+    if entity.namespace and entity.namespace in (label_values.get("namespace") or []):
+        matchers.append(f'namespace="{entity.namespace}"')
+    names = [name for name in (entity.name, entity.alias) if name]
+    source = next(((label, name) for label in SOURCE_LABELS for name in names
+                   if name in (label_values.get(label) or [])), None)
+    if source is not None:
+        matchers.append(f'{source[0]}="{source[1]}"')
+    elif any(pod.startswith(f"{entity.name}-") for pod in label_values.get("pod") or []):
+        matchers.append(f'pod=~"{entity.name}-.*"')
+    else:
+        return None
+    return "{" + ", ".join(matchers) + "}"
+
+
+class _Slot(NamedTuple):
+    entity: IncidentEntity
+    signal: str
+    name: str
+
+
+class EvidencePrefetcher:
+    """Pulls golden signals, recent error logs, error traces and pod status for the alerting entities at once.
+
+    Every Grafana query goes out in one concurrent batch while pod status is read from Kubernetes alongside it.
+    Results are reduced locally with the tools' own encoders (no LLM calls) and stored in the evidence cache, which
+    the NL2* tools serve alongside their first live answer about each entity. Empty results are not stored.
+    """
+
+    def __init__(self, cache: EvidenceCache = evidence_cache, lookback_seconds: int = EVIDENCE_LOOKBACK_SECONDS):
+        self.cache = cache
+        self.lookback_seconds = lookback_seconds
+        # The tools carry the Grafana client configuration and the kubectl execution path; no LLM is needed.
+        self.grafana = NL2LogsCustomTool(llm_backend=None)
+        self.kubectl = NL2KubectlCustomTool(llm_backend=None)
+
+    def prefetch(self, alerts: List[Dict[str, Any]], nodes: Optional[List[Dict[str, Any]]]) -> List[IncidentEntity]:
+        entities = alert_entities(alerts, nodes)
+        if not entities:
+            logger.info("Evidence pre-fetch found no topology entities in the firing alerts")
+            return entities
+        logger.info(f"Evidence pre-fetch for {', '.join(f'{e.kind}/{e.name}' for e in entities)}")
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pods = executor.submit(self._prefetch_pods, entities)
+            self._prefetch_grafana(entities)
+            pods.result()
+        logger.info(f"Evidence pre-fetch cached: {'; '.join(self.cache.digest())}")
+        return entities
+
+    def _datasource_id(self, datasource_type: str) -> Optional[str]:
+        try:
+            return self.grafana.get_datasource_id(datasource_type)
+        except Exception as e:
+            logger.error(f"Evidence pre-fetch skipping {datasource_type}: {str(e)}")
+            return None
+
+    def _prefetch_grafana(self, entities: List[IncidentEntity]):
+        start, end = get_incident_window(self.lookback_seconds)
+        step = max(PROMETHEUS_RANGE_STEP, int((end - start) / PROMETHEUS_RANGE_MAX_POINTS) + 1)
+        base_url = f"{self.grafana.grafana_url}/api/datasources/proxy/uid"
+        prometheus, loki, jaeger = (self._datasource_id(kind) for kind in ("prometheus", "loki", "jaeger"))
+        label_values = self._loki_label_values(loki) if loki else {}
+        services = self._jaeger_services(jaeger, entities) if jaeger else {}
+
+        slots: List[_Slot] = []
+        requests_to_send: List[GrafanaRequest] = []
+        for entity in entities:
+            service = services.get(entity.name) or entity.alias or entity.name
+            if prometheus:
+                for signal, query in GOLDEN_SIGNAL_QUERIES.items():
+                    query = Template(query).safe_substitute(service=service, name=entity.name,
+                                                            namespace=entity.namespace or "")
+                    slots.append(_Slot(entity, "metrics", signal))
+                    requests_to_send.append(GrafanaRequest(
+                        "GET", f"{base_url}/{prometheus}/api/v1/query_range",
+                        {"query": query, "start": start, "end": end, "step": step}))
+            selector = _loki_selector(entity, label_values) if loki else None
+            if selector is not None:
+                slots.append(_Slot(entity, "logs", selector))
+                requests_to_send.append(GrafanaRequest(
+                    "GET", f"{base_url}/{loki}/loki/api/v1/query_range",
+                    {"query": f"{selector} |~ `{ERROR_LINE.pattern}`", "start": int(start * 1e9),
+                     "end": int(end * 1e9), "limit": LOKI_MAX_QUERY_LIMIT, "direction": "backward"}))
+            if entity.name in services:
+                slots.append(_Slot(entity, "traces", service))
+                requests_to_send.append(GrafanaRequest(
+                    "GET", f"{base_url}/{jaeger}/api/traces",
+                    {"service": service, "start": int(start * 1e6), "end": int(end * 1e6),
+                     "limit": NL2TRACES_BATCH_LIMIT, "tags": json.dumps({"error": "true"})}))
+        if not requests_to_send:
+            return
+
+        results = self.grafana._gather_requests(requests_to_send)
+        collected: Dict[Tuple[IncidentEntity, str], List[Tuple[_Slot, Any]]] = {}
+        for slot, result in zip(slots, results):
+            if isinstance(result, Exception):
+                logger.error(f"Evidence pre-fetch {slot.signal} {slot.name} for {slot.entity.name} failed: {result}")
+                continue
+            collected.setdefault((slot.entity, slot.signal), []).append((slot, result))
+
+        for (entity, signal), fetched in collected.items():
+            try:
+                text = self._reduce(signal, fetched)
+            except Exception as e:
+                logger.error(f"Evidence pre-fetch could not reduce {signal} for {entity.name}: {str(e)}")
+                continue
+            if text is None:
+                logger.info(f"Evidence pre-fetch found no {signal} for {entity.name}")
+                continue
+            self.cache.put(signal, entity.name, text, filter(None, [services.get(entity.name), entity.alias]))
+
+    def _reduce(self, signal: str, fetched: List[Tuple[_Slot, Any]]) -> Optional[str]:
+        """The signal's evidence text, or None if nothing came back (an empty table is no evidence)."""
+        if signal == "metrics":
+            # Each golden signal is one aggregated series; label it with the signal so the table tells them apart.
+            result = [{**series, "metric": {"signal": slot.name, **(series.get("metric") or {})}}
+                      for slot, payload in fetched for series in (payload.get("data") or {}).get("result") or []
+                      if series.get("values")]
+            return summarize_matrix(result) if result else None
+        if signal == "logs":
+            miner = LogTemplateMiner()
+            for slot, payload in fetched:
+                miner.add_streams((payload.get("data") or {}).get("result") or [])
+            if not miner.lines:
+                return None
+            notes = [f"Recent error-looking lines of {slot.name}" for slot, _ in fetched]
+            return miner.encoding(COMPACT_ENCODING_TOKEN_BUDGET, notes).render()
+        traces = [trace for _, payload in fetched for trace in payload.get("data") or []]
+        return summarize_traces(traces) if traces else None
+
+    def _loki_label_values(self, datasource_id: str) -> Dict[str, List[str]]:
+        try:
+            return get_loki_label_catalog(self.grafana.grafana_url, datasource_id).get(self.grafana, datasource_id)
+        except Exception as e:
+            logger.error(f"Evidence pre-fetch could not read Loki labels: {str(e)}")
+            return {}
+
+    def _jaeger_services(self, datasource_id: str, entities: List[IncidentEntity]) -> Dict[str, str]:
+        """Entity name -> Jaeger service name, for the entities that have one."""
+        try:
+            catalog = get_jaeger_catalog(self.grafana.grafana_url, datasource_id)
+            known, _ = catalog.lookup(self.grafana, datasource_id, entities[0].name)
+        except Exception as e:
+            logger.error(f"Evidence pre-fetch could not read Jaeger services: {str(e)}")
+            return {}
+        services = {entity.name: _jaeger_service(entity.name, known) for entity in entities}
+        return {name: service for name, service in services.items() if service}
+
+    def _prefetch_pods(self, entities: List[IncidentEntity]):
+        for namespace in dict.fromkeys(entity.namespace for entity in entities if entity.namespace):
+            try:
+                # The plain table, not the structured projection, so rows can be picked out per entity.
+                output = self.kubectl._execute_kubectl_command(f"kubectl get pods -n {namespace} -o wide")
+            except Exception as e:
+                logger.error(f"Evidence pre-fetch could not list pods in {namespace}: {str(e)}")
+                continue
+            if output.startswith("Error executing kubectl command"):
+                logger.error(f"Evidence pre-fetch could not list pods in {namespace}: {output}")
+                continue
+            lines = output.splitlines()
+            for entity in entities:
+                if entity.namespace != namespace:
+                    continue
+                rows = [line for line in lines[1:] if line.startswith(f"{entity.name}-")]
+                if rows:
+                    text = "\n".join(lines[:1] + rows)
+                else:
+                    text = f"No pods named {entity.name}-* in {namespace}; all pods there:\n{output}"
+                self.cache.put("pods", entity.name, text, filter(None, [entity.alias]))
+
+
+def watch_alert_namespaces(alerts: List[Dict[str, Any]]) -> List[str]:
+    """Start the kubectl informers for the firing alerts' namespaces, so the crew's first reads there hit memory."""
+    namespaces = list(dict.fromkeys(str(alert["labels"]["namespace"]) for alert in alerts or []
+                                    if (alert.get("labels") or {}).get("namespace")))
+    if not namespaces or not NL2KUBECTL_USE_API:
+        return namespaces
+    try:
+        engine = KubernetesAPIEngine.instance()
+        if engine is not None:
+            engine.watch_namespaces(namespaces)
+            logger.info(f"Watching namespaces {', '.join(namespaces)} ahead of the crew")
+    except Exception as e:
+        logger.error(f"Could not start informers for {', '.join(namespaces)}: {str(e)}")
+    return namespaces
+
+
+def prefetch_evidence(alerts: List[Dict[str, Any]], nodes: Optional[List[Dict[str, Any]]]) -> List[IncidentEntity]:
+    """Best-effort pre-fetch stage run before the crew starts; a failure only means the tools start cold."""
+    try:
+        return EvidencePrefetcher().prefetch(alerts, nodes)
+    except Exception as e:
+        logger.error(f"Evidence pre-fetch failed: {str(e)}")
+        return []
@@ -0,0 +1,149 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import logging
+import os
+from typing import Any, Callable, List
+
+from lumyn.llm_backends.base import LLM_BATCH_CONCURRENCY
+from lumyn.utils.tokens import estimate_tokens, tokens_to_chars
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Largest input sent to one summarization call; bigger payloads are split into chunks of at most this size.
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", 6000))
+# Payloads this small are returned as they are; summarizing them costs more than reading them.
+SUMMARY_PASSTHROUGH_TOKENS = int(os.getenv("SUMMARY_PASSTHROUGH_TOKENS", 300))
+SUMMARY_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", LLM_BATCH_CONCURRENCY))
+
+MERGE_INSTRUCTIONS = (
+    " The data was too large to read at once, so you are given summaries of its parts instead."
+    " Merge them into one brief summary and analysis, keeping every error, anomaly and affected entity they mention.")
+
+
+def _dumps(value: Any) -> str:
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def _result(payload: Any) -> Any:
+    if isinstance(payload, dict) and isinstance(payload.get("data"), dict):
+        return payload["data"].get("result")
+    return None
+
+
+def split_prometheus_series(metrics: Any) -> List[str]:
+    """One unit per series of a Prometheus vector or matrix result."""
+    result = _result(metrics)
+    if not isinstance(result, list) or not result:
+        return [_dumps(metrics)]
+    return [json.dumps(series) for series in result]
+
+
+def split_loki_streams(logs: Any, chunk_tokens: int = SUMMARY_CHUNK_TOKENS) -> List[str]:
+    """One unit per Loki stream; streams too large for a chunk are cut into runs of lines that keep their labels."""
+    result = _result(logs)
+    if not isinstance(result, list) or not result:
+        return [_dumps(logs)]
+    units = []
+    for stream in result:
+        values = stream.get("values")
+        encoded = json.dumps(stream)
+        if not isinstance(values, list) or len(values) < 2 or estimate_tokens(encoded) <= chunk_tokens:
+            units.append(encoded)
+            continue
+        labels = {key: value for key, value in stream.items() if key != "values"}
+        # Lines per piece from the stream's average line size, with headroom for lines longer than average.
+        per_piece = max(1, int(0.9 * len(values) * chunk_tokens / estimate_tokens(encoded)))
+        for offset in range(0, len(values), per_piece):
+            units.append(json.dumps({**labels, "values": values[offset:offset + per_piece]}))
+    return units
+
+
+def split_jaeger_traces(traces: Any) -> List[str]:
+    """One unit per Jaeger trace."""
+    data = traces.get("data") if isinstance(traces, dict) else None
+    if not isinstance(data, list) or not data:
+        return [_dumps(traces)]
+    return [json.dumps(trace) for trace in data]
+
+
+def pack_chunks(units: List[str], chunk_tokens: int = SUMMARY_CHUNK_TOKENS) -> List[str]:
+    """Greedily pack units, in order, into newline-joined chunks of at most chunk_tokens each.
+
+    A unit that alone exceeds the budget is cut by characters; splitters avoid that where a natural boundary exists.
+    """
+    max_chars = tokens_to_chars(chunk_tokens)
+    chunks, current, current_chars = [], [], 0
+    for unit in units:
+        pieces = [unit[offset:offset + max_chars] for offset in range(0, len(unit), max_chars)] or [unit]
+        for piece in pieces:
+            if current and current_chars + len(piece) + 1 > max_chars:
+                chunks.append("\n".join(current))
+                current, current_chars = [], 0
+            current.append(piece)
+            current_chars += len(piece) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def _summarize_chunks(llm_backend, system_prompt: str, chunks: List[str], max_concurrency: int) -> List[str]:
+    requests = [(system_prompt, f"Part {position + 1} of {len(chunks)}:\n{chunk}")
+                for position, chunk in enumerate(chunks)]
+    summaries = []
+    for position, summary in enumerate(llm_backend.batch_inference(requests, max_concurrency)):
+        if isinstance(summary, Exception):
+            logger.error(f"Summarizing part {position + 1} of {len(chunks)} failed: {summary}")
+            summary = f"(part could not be summarized: {summary})"
+        summaries.append(f"Part {position + 1}: {summary}")
+    return summaries
+
+
+def summarize_payload(llm_backend,
+                      system_prompt: str,
+                      payload: Any,
+                      splitter: Callable[[Any], List[str]] = lambda payload: [_dumps(payload)],
+                      chunk_tokens: int = SUMMARY_CHUNK_TOKENS,
+                      passthrough_tokens: int = SUMMARY_PASSTHROUGH_TOKENS,
+                      max_concurrency: int = SUMMARY_MAX_CONCURRENCY) -> str:
+    """Summarize a tool payload of any size with at most chunk_tokens per LLM call.
+
+    Small payloads come back verbatim and medium ones take a single call. Larger ones are split on the natural
+    boundaries `splitter` returns (series, streams, traces), packed into chunks that are summarized concurrently
+    (map), and the partial summaries are merged (reduce), in rounds if they are themselves too large for one call.
+    """
+    text = _dumps(payload)
+    tokens = estimate_tokens(text)
+    if tokens <= passthrough_tokens:
+        return text
+    if tokens <= chunk_tokens:
+        return llm_backend.inference(system_prompt, text)
+
+    chunks = pack_chunks(splitter(payload), chunk_tokens)
+    logger.info(f"Summarizing ~{tokens} tokens in {len(chunks)} chunks of up to {chunk_tokens} tokens")
+    summaries = _summarize_chunks(llm_backend, system_prompt, chunks, max_concurrency)
+
+    merge_prompt = system_prompt + MERGE_INSTRUCTIONS
+    merged = "\n\n".join(summaries)
+    while estimate_tokens(merged) > chunk_tokens and len(summaries) > 1:
+        chunks = pack_chunks(summaries, chunk_tokens)
+        if len(chunks) >= len(summaries):
+            # Each summary fills a chunk on its own; another round would not shrink anything.
+            break
+        summaries = _summarize_chunks(llm_backend, merge_prompt, chunks, max_concurrency)
+        merged = "\n\n".join(summaries)
+    return llm_backend.inference(merge_prompt, merged)
@@ -0,0 +1,384 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import datetime
+import json
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from lumyn.utils.tokens import estimate_tokens, tokens_to_chars
+
+from .chunked_summary import SUMMARY_CHUNK_TOKENS, pack_chunks
+from .trace_analytics import is_error_span
+
+COMPACT_ENCODING = os.getenv("COMPACT_ENCODING", "True") == "True"
+COMPACT_ENCODING_TOKEN_BUDGET = int(os.getenv("COMPACT_ENCODING_TOKEN_BUDGET", 16000))
+COMPACT_MAX_CELL_CHARS = int(os.getenv("COMPACT_MAX_CELL_CHARS", 400))
+# Matrix series are downsampled through these point counts, in order, until the table fits its budget.
+MATRIX_POINT_LIMITS = (None, 60, 20, 5)
+ERROR_LINE = re.compile(r"(?i)\b(error|exception|fail(ed|ure)?|fatal|panic|timeout|refused)\b")
+SEPARATOR = " | "
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        text = f"{value:.6g}"
+    elif isinstance(value, (dict, list)):
+        text = json.dumps(value, separators=(",", ":"))
+    else:
+        text = str(value)
+    text = text.replace("\n", "\\n").replace("|", "\\|")
+    if len(text) > COMPACT_MAX_CELL_CHARS:
+        text = text[:COMPACT_MAX_CELL_CHARS] + "..."
+    return text
+
+
+def _number(value: Any) -> str:
+    # Prometheus sends sample values as strings, including "NaN" and "+Inf".
+    try:
+        return f"{float(value):.6g}"
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _format_time(milliseconds: float) -> str:
+    moment = datetime.datetime.fromtimestamp(milliseconds / 1000, tz=datetime.timezone.utc)
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def _fit_rows(lengths: Sequence[int], max_chars: int, important: Optional[Sequence[bool]] = None) -> List[int]:
+    """Indices of rows that fit in max_chars: important rows first, then an even sample of the rest, in order."""
+    if sum(lengths) <= max_chars:
+        return list(range(len(lengths)))
+    chosen, used = set(), 0
+    for index, length in enumerate(lengths):
+        if important and important[index] and used + length <= max_chars:
+            chosen.add(index)
+            used += length
+    rest = [index for index in range(len(lengths)) if index not in chosen]
+    if rest and used < max_chars:
+        average = sum(lengths[index] for index in rest) / len(rest)
+        count = min(len(rest), max(1, int((max_chars - used) / average)))
+        for position in range(count):
+            index = rest[int(position * len(rest) / count)]
+            if used + lengths[index] <= max_chars:
+                chosen.add(index)
+                used += lengths[index]
+    return sorted(chosen)
+
+
+class CompactTable:
+    """One result type as a table: columns constant across all rows are hoisted into a `common:` header line,
+    and rows are ordered by time with each timestamp written as the delta from the previous row."""
+
+    def __init__(self,
+                 title: str,
+                 columns: List[str],
+                 rows: List[List[Any]],
+                 times: Optional[List[float]] = None,
+                 important: Optional[List[bool]] = None,
+                 notes: Optional[List[str]] = None):
+        """`times` are epoch milliseconds, one per row; `important` rows are kept first when sampling to a budget."""
+        self.title = title
+        self.notes = list(notes or [])
+        cells = [[_cell(value) for value in row] for row in rows]
+        if times is not None:
+            order = sorted(range(len(cells)), key=lambda index: times[index])
+            cells = [cells[index] for index in order]
+            times = [times[index] for index in order]
+            important = [important[index] for index in order] if important else None
+            if len(set(times)) == 1:
+                self.notes.insert(0, f"at: {_format_time(times[0])}")
+                times = None
+        self.times = times
+        self.important = important
+
+        self.common: Dict[str, str] = {}
+        keep = list(range(len(columns)))
+        if len(cells) > 1:
+            keep = []
+            for column, name in enumerate(columns):
+                values = {row[column] for row in cells}
+                if len(values) == 1:
+                    value = values.pop()
+                    if value:
+                        self.common[name] = value
+                else:
+                    keep.append(column)
+        self.columns = [columns[column] for column in keep]
+        self.rows = [[row[column] for column in keep] for row in cells]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _header(self, first_time: Optional[float]) -> List[str]:
+        lines = [self.title]
+        if self.common:
+            lines.append("common: " + ", ".join(f"{key}={value}" for key, value in self.common.items()))
+        if first_time is not None:
+            lines.append(f"t0: {_format_time(first_time)}")
+        lines.extend(self.notes)
+        columns = (["+ms"] if self.times is not None else []) + self.columns
+        lines.append("columns: " + SEPARATOR.join(columns))
+        return lines
+
+    def _row_lengths(self) -> List[int]:
+        # Time deltas are rendered after sampling; reserve a typical width for them.
+        extra = 12 if self.times is not None else 1
+        return [sum(len(cell) for cell in row) + len(SEPARATOR) * max(len(row) - 1, 0) + extra for row in self.rows]
+
+    def render_rows(self, indices: List[int], omitted: int = 0) -> str:
+        """The header and the rows at `indices`, noting `omitted` rows that were left out."""
+        first_time = self.times[indices[0]] if self.times is not None and indices else None
+        lines = self._header(first_time)
+        previous = first_time
+        for index in indices:
+            cells = self.rows[index]
+            if self.times is not None:
+                cells = [f"+{round(self.times[index] - previous)}"] + cells
+                previous = self.times[index]
+            lines.append(SEPARATOR.join(cells))
+        if omitted:
+            kept = "rows with errors first, then an even sample" if self.important and any(self.important) \
+                else "an even sample"
+            lines.append(f"... {omitted} of {len(self.rows)} rows omitted to fit the token budget (kept {kept})")
+        return "\n".join(lines)
+
+    def fit(self, token_budget: Optional[int]) -> List[int]:
+        if token_budget is None:
+            return list(range(len(self.rows)))
+        header_chars = len("\n".join(self._header(0))) + 120
+        return _fit_rows(self._row_lengths(), tokens_to_chars(token_budget) - header_chars, self.important)
+
+    def render(self, token_budget: Optional[int] = None) -> str:
+        indices = self.fit(token_budget)
+        return self.render_rows(indices, len(self.rows) - len(indices))
+
+    def parts(self, indices: List[int], chunk_tokens: int) -> List[str]:
+        """The given rows split into consecutive tables of at most chunk_tokens, each with its own header."""
+        max_chars = tokens_to_chars(chunk_tokens) - len("\n".join(self._header(0))) - 120
+        lengths = self._row_lengths()
+        parts, current, used = [], [], 0
+        for index in indices:
+            if current and used + lengths[index] > max_chars:
+                parts.append(self.render_rows(current))
+                current, used = [], 0
+            current.append(index)
+            used += lengths[index]
+        if current or not parts:
+            parts.append(self.render_rows(current))
+        omitted = len(self.rows) - len(indices)
+        if omitted:
+            parts[-1] += f"\n... {omitted} of {len(self.rows)} rows omitted to fit the token budget"
+        return parts
+
+
+class CompactEncoding:
+    """Tables for one payload sharing a token budget; tables earlier in the list are allotted budget first."""
+
+    def __init__(self, tables: List[CompactTable], token_budget: int = COMPACT_ENCODING_TOKEN_BUDGET,
+                 text: Optional[str] = None):
+        self.tables = tables
+        self.text = text
+        self._kept: List[List[int]] = []
+        remaining = token_budget
+        for table in tables:
+            indices = table.fit(max(remaining, 0))
+            self._kept.append(indices)
+            remaining -= estimate_tokens(table.render_rows(indices, len(table) - len(indices)))
+
+    def render(self) -> str:
+        if not self.tables:
+            return self.text
+        return "\n\n".join(table.render_rows(indices, len(table) - len(indices))
+                           for table, indices in zip(self.tables, self._kept))
+
+    def parts(self, chunk_tokens: int = SUMMARY_CHUNK_TOKENS) -> List[str]:
+        """The rendering split into pieces of at most chunk_tokens, each a self-describing table."""
+        if not self.tables:
+            return pack_chunks([self.text], chunk_tokens)
+        return [part for table, indices in zip(self.tables, self._kept) for part in table.parts(indices, chunk_tokens)]
+
+
+def _label_keys(labels: List[Dict[str, Any]]) -> List[str]:
+    keys = sorted({key for series_labels in labels for key in series_labels})
+    # The metric name reads best first.
+    return sorted(keys, key=lambda key: key != "__name__")
+
+
+def _series_samples(values: List[List[Any]], t0: float, max_points: Optional[int]) -> Tuple[str, bool]:
+    if max_points is not None and len(values) > max_points:
+        values = [values[int(position * len(values) / max_points)] for position in range(max_points)]
+        downsampled = True
+    else:
+        downsampled = False
+    timestamps = [float(point[0]) for point in values]
+    samples = " ".join(_number(point[1]) for point in values)
+    if not timestamps:
+        return "", downsampled
+    steps = {round(later - earlier, 3) for earlier, later in zip(timestamps, timestamps[1:])}
+    if len(steps) <= 1:
+        step = steps.pop() if steps else 0
+        return f"+{timestamps[0] - t0:g}s every {'~' if downsampled else ''}{step:g}s: {samples}", downsampled
+    offsets = " ".join(f"+{timestamp - t0:g}:{_number(point[1])}" for timestamp, point in zip(timestamps, values))
+    return offsets, downsampled
+
+
+def prometheus_tables(payload: Dict[str, Any], token_budget: int = COMPACT_ENCODING_TOKEN_BUDGET) -> List[CompactTable]:
+    """Prometheus (or Loki metric query) result: one row per series."""
+    data = payload["data"]
+    result_type, result = data.get("resultType"), data.get("result")
+    if result_type in ("scalar", "string"):
+        return [CompactTable(f"Prometheus {result_type}", ["value"], [[_number(result[1])]], times=[float(result[0]) * 1000])]
+
+    labels = [series.get("metric") or {} for series in result]
+    keys = _label_keys(labels)
+    if result_type == "vector":
+        rows = [[series_labels.get(key) for key in keys] + [_number(series["value"][1])]
+                for series_labels, series in zip(labels, result)]
+        times = [float(series["value"][0]) * 1000 for series in result]
+        return [CompactTable(f"Prometheus vector: {len(result)} series", keys + ["value"], rows, times=times)]
+
+    first_timestamps = [float(series["values"][0][0]) for series in result if series.get("values")]
+    t0 = min(first_timestamps) if first_timestamps else 0.0
+    table = None
+    for max_points in MATRIX_POINT_LIMITS:
+        rows, downsampled = [], False
+        for series_labels, series in zip(labels, result):
+            samples, series_downsampled = _series_samples(series.get("values") or [], t0, max_points)
+            downsampled |= series_downsampled
+            rows.append([series_labels.get(key) for key in keys] + [len(series.get("values") or []), samples])
+        notes = [f"t0: {_format_time(t0 * 1000)}; sample offsets in seconds from t0"]
+        if downsampled:
+            notes.append(f"series with more than {max_points} points are evenly downsampled to {max_points}")
+        table = CompactTable(f"Prometheus matrix: {len(result)} series", keys + ["points", "samples"], rows, notes=notes)
+        if len(table.fit(token_budget)) == len(table):
+            break
+    return [table]
+
+
+def loki_tables(payload: Dict[str, Any]) -> List[CompactTable]:
+    """Loki streams: one row per distinct line per stream, repeats counted, errors kept first under a budget."""
+    result = payload["data"].get("result") or []
+    labels = [stream.get("stream") or {} for stream in result]
+    keys = sorted({key for stream_labels in labels for key in stream_labels})
+    first_seen: Dict[Tuple[int, str], float] = {}
+    counts: Counter = Counter()
+    for stream_number, stream in enumerate(result):
+        for timestamp, line in stream.get("values") or []:
+            key = (stream_number, line)
+            milliseconds = int(timestamp) / 1e6
+            counts[key] += 1
+            if key not in first_seen or milliseconds < first_seen[key]:
+                first_seen[key] = milliseconds
+    rows, times, important = [], [], []
+    for (stream_number, line), count in counts.items():
+        rows.append([labels[stream_number].get(key) for key in keys] + [count if count > 1 else None, line])
+        times.append(first_seen[(stream_number, line)])
+        important.append(bool(ERROR_LINE.search(line)))
+    title = f"Loki logs: {sum(counts.values())} lines in {len(result)} streams, {len(rows)} distinct"
+    return [CompactTable(title, keys + ["repeats", "line"], rows, times=times, important=important)]
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def jaeger_tables(payload: Dict[str, Any], token_budget: int = COMPACT_ENCODING_TOKEN_BUDGET) -> List[CompactTable]:
+    """Jaeger traces: one row per span; when they do not all fit, a per-operation aggregate goes first."""
+    rows, important = [], []
+    durations: Dict[Tuple[str, str], List[float]] = defaultdict(list)
+    errors: Counter = Counter()
+    traces = payload.get("data") or []
+    for trace in traces:
+        processes = trace.get("processes") or {}
+        spans = sorted(trace.get("spans") or [], key=lambda span: span.get("startTime", 0))
+        if not spans:
+            continue
+        trace_start = spans[0].get("startTime", 0)
+        position = {span["spanID"]: number for number, span in enumerate(spans)}
+        for number, span in enumerate(spans):
+            service = (processes.get(span.get("processID")) or {}).get("serviceName", "unknown")
+            parent = next((position[reference["spanID"]] for reference in span.get("references") or []
+                           if reference.get("spanID") in position), None)
+            error = is_error_span(span)
+            duration = span.get("duration", 0) / 1000
+            rows.append([trace.get("traceID", "")[:8], number, parent, service, span.get("operationName", ""),
+                         (span.get("startTime", 0) - trace_start) / 1000, duration, "E" if error else None])
+            important.append(error)
+            durations[(service, span.get("operationName", ""))].append(duration)
+            errors[(service, span.get("operationName", ""))] += error
+    spans_table = CompactTable(f"Jaeger spans: {len(traces)} traces, {len(rows)} spans; start offset and duration in ms",
+                               ["trace", "span", "parent", "service", "operation", "start", "duration", "error"],
+                               rows, important=important)
+    if len(spans_table.fit(token_budget)) == len(spans_table):
+        return [spans_table]
+
+    aggregate_rows = []
+    for (service, operation), values in sorted(durations.items(),
+                                               key=lambda item: (-errors[item[0]], -max(item[1]))):
+        ordered = sorted(values)
+        aggregate_rows.append([service, operation, len(values), errors[(service, operation)],
+                               _percentile(ordered, 0.5), _percentile(ordered, 0.95), ordered[-1]])
+    aggregate_table = CompactTable("Jaeger operations aggregated over all spans; durations in ms",
+                                   ["service", "operation", "spans", "errors", "p50", "p95", "max"], aggregate_rows)
+    return [aggregate_table, spans_table]
+
+
+def json_tables(value: Any) -> List[CompactTable]:
+    """A list of objects (or an object holding one under `items`/`data`) as a table; nothing otherwise."""
+    items = value
+    if isinstance(value, dict):
+        items = value.get("items", value.get("data"))
+    if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+        return []
+    keys = list(dict.fromkeys(key for item in items for key in item))
+    rows = [[item.get(key) for key in keys] for item in items]
+    return [CompactTable(f"{len(items)} objects", keys, rows)]
+
+
+def encode_payload(payload: Any, token_budget: int = COMPACT_ENCODING_TOKEN_BUDGET) -> CompactEncoding:
+    """Encode a Prometheus, Loki or Jaeger response, or generic JSON, compactly within token_budget.
+
+    Strings that parse as JSON are encoded like the parsed value; other text is left as it is.
+    """
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            return CompactEncoding([], token_budget, text=payload)
+
+    data = payload.get("data") if isinstance(payload, dict) else None
+    tables = []
+    if isinstance(data, dict) and data.get("resultType") == "streams":
+        tables = loki_tables(payload)
+    elif isinstance(data, dict) and data.get("resultType") in ("vector", "matrix", "scalar", "string"):
+        tables = prometheus_tables(payload, token_budget)
+    elif isinstance(data, list) and data and all(isinstance(trace, dict) and "spans" in trace for trace in data):
+        tables = jaeger_tables(payload, token_budget)
+    else:
+        tables = json_tables(payload)
+    if tables:
+        return CompactEncoding(tables, token_budget)
+
+    text = json.dumps(payload, separators=(",", ":"), default=str)
+    max_chars = tokens_to_chars(token_budget)
+    if len(text) > max_chars:
+        text = text[:max_chars] + f"... ({len(text) - max_chars} characters omitted to fit the token budget)"
+    return CompactEncoding([], token_budget, text=text)
@@ -0,0 +1,118 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+import os
+import socket
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+GRAFANA_POOL_CONNECTIONS = int(os.getenv("GRAFANA_POOL_CONNECTIONS", 10))
+GRAFANA_POOL_MAXSIZE = int(os.getenv("GRAFANA_POOL_MAXSIZE", 20))
+GRAFANA_POOL_BLOCK = os.getenv("GRAFANA_POOL_BLOCK", "False") == "True"
+GRAFANA_KEEPALIVE = os.getenv("GRAFANA_KEEPALIVE", "True") == "True"
+GRAFANA_KEEPALIVE_IDLE = int(os.getenv("GRAFANA_KEEPALIVE_IDLE", 60))
+GRAFANA_KEEPALIVE_INTERVAL = int(os.getenv("GRAFANA_KEEPALIVE_INTERVAL", 15))
+
+
+def _keepalive_socket_options():
+    options = list(HTTPConnection.default_socket_options)
+    if not GRAFANA_KEEPALIVE:
+        return options
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    # TCP_KEEPIDLE/TCP_KEEPINTVL are Linux specific; other platforms keep the OS defaults.
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, GRAFANA_KEEPALIVE_IDLE))
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, GRAFANA_KEEPALIVE_INTERVAL))
+    return options
+
+
+class KeepAliveHTTPAdapter(HTTPAdapter):
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = _keepalive_socket_options()
+        super().init_poolmanager(*args, **kwargs)
+
+
+class GrafanaConnectionPool:
+    """Singleton requests session shared by every GrafanaBaseClient in the process."""
+
+    _instance: Optional["GrafanaConnectionPool"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self,
+                 max_retries: Retry,
+                 pool_connections: int = GRAFANA_POOL_CONNECTIONS,
+                 pool_maxsize: int = GRAFANA_POOL_MAXSIZE,
+                 pool_block: bool = GRAFANA_POOL_BLOCK):
+        self.adapter = KeepAliveHTTPAdapter(pool_connections=pool_connections,
+                                            pool_maxsize=pool_maxsize,
+                                            pool_block=pool_block,
+                                            max_retries=max_retries)
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        if not GRAFANA_KEEPALIVE:
+            self.session.headers["Connection"] = "close"
+        self.clients = 0
+
+    @classmethod
+    def instance(cls, max_retries: Retry) -> "GrafanaConnectionPool":
+        # max_retries only applies to the first call; later callers share the existing adapter.
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(max_retries=max_retries)
+                logger.info(
+                    f"GrafanaConnectionPool created with pool_connections={GRAFANA_POOL_CONNECTIONS}, pool_maxsize={GRAFANA_POOL_MAXSIZE}, keepalive={GRAFANA_KEEPALIVE}"
+                )
+            cls._instance.clients += 1
+            return cls._instance
+
+    def stats(self) -> Dict[str, int]:
+        requests_served = 0
+        connections_opened = 0
+        hosts = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            hosts += 1
+            requests_served += pool.num_requests
+            connections_opened += pool.num_connections
+        # Every request that did not need a new connection was served from the pool.
+        return {
+            "clients": self.clients,
+            "hosts": hosts,
+            "requests": requests_served,
+            "pool_hits": max(requests_served - connections_opened, 0),
+            "pool_misses": connections_opened,
+        }
+
+
+def get_connection_pool_stats() -> Optional[Dict[str, int]]:
+    pool = GrafanaConnectionPool._instance
+    return pool.stats() if pool is not None else None
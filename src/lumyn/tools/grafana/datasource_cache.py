@@ -0,0 +1,86 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+DATASOURCE_CACHE_TTL = float(os.getenv("DATASOURCE_CACHE_TTL", 300))
+
+
+class DatasourceUIDCache:
+    """Process-wide cache of Grafana datasource UIDs keyed by (Grafana URL, datasource type)."""
+
+    def __init__(self, ttl: float = DATASOURCE_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+        self._refresh_locks: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, grafana_url: str, datasource_type: str, record_stats: bool = True) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get((grafana_url, datasource_type))
+            if entry is not None and time.monotonic() >= entry[1]:
+                del self._entries[(grafana_url, datasource_type)]
+                entry = None
+            if record_stats:
+                if entry is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+            return None if entry is None else entry[0]
+
+    def populate(self, grafana_url: str, datasources: List[Dict]):
+        # The first datasource of each type wins, matching the linear scan this cache replaces.
+        expires_at = time.monotonic() + self.ttl
+        resolved = {}
+        for datasource in datasources:
+            resolved.setdefault(datasource["type"], datasource["uid"])
+        with self._lock:
+            for datasource_type, uid in resolved.items():
+                self._entries[(grafana_url, datasource_type)] = (uid, expires_at)
+
+    def invalidate_uid(self, grafana_url: str, uid: str):
+        with self._lock:
+            stale = [key for key, (cached_uid, _) in self._entries.items() if key[0] == grafana_url and cached_uid == uid]
+            for key in stale:
+                del self._entries[key]
+        if stale:
+            logger.info(f"Datasource UID cache dropped stale uid {uid} for {grafana_url}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def refresh_lock(self, grafana_url: str) -> threading.Lock:
+        # Serializes refreshes per Grafana instance so concurrent misses trigger a single fetch.
+        with self._lock:
+            return self._refresh_locks.setdefault(grafana_url, threading.Lock())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+datasource_uid_cache = DatasourceUIDCache()
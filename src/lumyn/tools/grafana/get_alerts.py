@@ -15,7 +15,8 @@
 
 import json
 import logging
-from typing import Any, Dict, Optional
+import threading
+from typing import Any, Dict, List, Optional
 
 from crewai.tools.base_tool import BaseTool
 
@@ -24,6 +25,19 @@ from .grafana_base_client import GrafanaBaseClient
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+_latest_alerts: List[Dict[str, Any]] = []
+_latest_alerts_lock = threading.Lock()
+
+
+def get_latest_alerts() -> List[Dict[str, Any]]:
+    """Firing alerts from the most recent successful GetAlertsCustomTool call in this process."""
+    with _latest_alerts_lock:
+        return list(_latest_alerts)
+
+
+def get_latest_alert_label_values() -> List[str]:
+    return [str(value) for alert in get_latest_alerts() for value in (alert.get("labels") or {}).values()]
+
 
 class GetAlertsCustomTool(GrafanaBaseClient, BaseTool):
     name: str = "GetAlerts Tool"
@@ -43,6 +57,8 @@ class GetAlertsCustomTool(GrafanaBaseClient, BaseTool):
                 if len(data["data"]["alerts"]) == 0:
                     return None
                 alerts = list(filter(lambda i: i["state"] == "Alerting", data["data"]["alerts"]))
+                with _latest_alerts_lock:
+                    _latest_alerts[:] = alerts
                 return alerts
             return None
         except Exception as e:
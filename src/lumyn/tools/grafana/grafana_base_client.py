@@ -13,14 +13,21 @@
 # limitations under the License.
 
 
+import asyncio
 import logging
 import os
-from typing import Any, Dict, Optional
+import re
+from typing import Any, Dict, List, NamedTuple, Optional
 
+import httpx
 import requests
-from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from lumyn.utils.async_bridge import gather_bounded, run_sync
+
+from .connection_pool import GrafanaConnectionPool
+from .datasource_cache import datasource_uid_cache
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
@@ -29,6 +36,11 @@ logger = logging.getLogger(__name__)
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", 120))
 RETRY_TOTAL = int(os.getenv("RETRY_TOTAL", 3))
 RETRY_BACKOFF_FACTOR = float(os.getenv("RETRY_BACKOFF_FACTOR", 0.3))
+RETRY_STATUS_FORCELIST = [500, 502, 503, 504]
+RETRY_ALLOWED_METHODS = Retry.DEFAULT_ALLOWED_METHODS
+GRAFANA_ASYNC_CONCURRENCY = int(os.getenv("GRAFANA_ASYNC_CONCURRENCY", 10))
+
+DATASOURCE_PROXY_UID_PATTERN = re.compile(r"/api/datasources/proxy/uid/([^/]+)/")
 
 
 class GrafanaBaseClient:
@@ -55,15 +67,10 @@ class GrafanaBaseClient:
         self.session = self._create_retrying_session()
 
     def _create_retrying_session(self) -> requests.Session:
-        session = requests.Session()
-
         retries = Retry(total=RETRY_TOTAL,
                         backoff_factor=RETRY_BACKOFF_FACTOR,
-                        status_forcelist=[500, 502, 503, 504])
-        adapter = HTTPAdapter(max_retries=retries)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        return session
+                        status_forcelist=RETRY_STATUS_FORCELIST)
+        return GrafanaConnectionPool.instance(max_retries=retries).session
 
     def _make_request(self, method: str, url: str,
                       **kwargs) -> requests.Response:
@@ -73,6 +80,8 @@ class GrafanaBaseClient:
                                             headers=self.headers,
                                             timeout=REQUEST_TIMEOUT,
                                             **kwargs)
+            if response.status_code == 404:
+                self._invalidate_datasource_uid(url)
             response.raise_for_status()
             return response
         except requests.Timeout:
@@ -82,17 +91,142 @@ class GrafanaBaseClient:
             logger.error(f"Request failed: {e}")
             raise
 
+    def _invalidate_datasource_uid(self, url: str):
+        match = DATASOURCE_PROXY_UID_PATTERN.search(url)
+        if match:
+            datasource_uid_cache.invalidate_uid(self.grafana_url, match.group(1))
+
     def get_datasource_id(self, datasource_type: str) -> str:
+        uid = datasource_uid_cache.get(self.grafana_url, datasource_type)
+        if uid is not None:
+            return uid
+
         url = f"{self.grafana_url}/api/datasources"
 
         try:
-            response = self._make_request("GET", url)
-            datasources = response.json()
+            with datasource_uid_cache.refresh_lock(self.grafana_url):
+                # Another thread may have refreshed the cache while we waited for the lock.
+                uid = datasource_uid_cache.get(self.grafana_url, datasource_type, record_stats=False)
+                if uid is not None:
+                    return uid
+                response = self._make_request("GET", url)
+                datasource_uid_cache.populate(self.grafana_url, response.json())
+            uid = datasource_uid_cache.get(self.grafana_url, datasource_type, record_stats=False)
+            if uid is None:
+                raise ValueError(f"{datasource_type} data source not found")
+            return uid
+        except Exception as e:
+            logger.error(f"Error fetching datasources: {str(e)}")
+            raise
+
+    def _gather_requests(self,
+                         requests_to_send: List["GrafanaRequest"],
+                         max_concurrency: int = GRAFANA_ASYNC_CONCURRENCY) -> List[Any]:
+        """Issue many Grafana requests concurrently from sync code and return their JSON bodies (or exceptions) in order."""
+        return run_sync(
+            AsyncGrafanaBaseClient.gather_once(self.grafana_url, self.headers, requests_to_send,
+                                               max_concurrency))
+
+
+class GrafanaRequest(NamedTuple):
+    method: str
+    url: str
+    params: Optional[Dict[str, Any]] = None
 
-            for datasource in datasources:
-                if datasource["type"] == datasource_type:
-                    return datasource["uid"]
-            raise ValueError(f"{datasource_type} data source not found")
+
+class AsyncGrafanaBaseClient:
+    """asyncio counterpart of GrafanaBaseClient with the same timeout, retry and datasource cache semantics."""
+
+    def __init__(self,
+                 grafana_url: str,
+                 headers: Dict[str, str],
+                 max_concurrency: int = GRAFANA_ASYNC_CONCURRENCY):
+        self.grafana_url = grafana_url
+        self.headers = headers
+        self.max_concurrency = max_concurrency
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self) -> "AsyncGrafanaBaseClient":
+        self.client = httpx.AsyncClient(headers=self.headers,
+                                        timeout=REQUEST_TIMEOUT,
+                                        limits=httpx.Limits(max_connections=self.max_concurrency,
+                                                            max_keepalive_connections=self.max_concurrency))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+        self.client = None
+
+    @classmethod
+    async def gather_once(cls, grafana_url: str, headers: Dict[str, str],
+                          requests_to_send: List[GrafanaRequest],
+                          max_concurrency: int = GRAFANA_ASYNC_CONCURRENCY) -> List[Any]:
+        async with cls(grafana_url, headers, max_concurrency=max_concurrency) as client:
+            return await client.gather(requests_to_send)
+
+    def _backoff(self, consecutive_errors: int) -> float:
+        # Mirrors urllib3.Retry: the first retry is immediate, then factor * 2 ** (n - 1).
+        if consecutive_errors <= 1:
+            return 0
+        return RETRY_BACKOFF_FACTOR * (2**(consecutive_errors - 1))
+
+    async def _make_request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        retries_left = RETRY_TOTAL if method.upper() in RETRY_ALLOWED_METHODS else 0
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.request(method, url, **kwargs)
+                if response.status_code in RETRY_STATUS_FORCELIST and retries_left > 0:
+                    retries_left -= 1
+                    attempt += 1
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+                if response.status_code == 404:
+                    match = DATASOURCE_PROXY_UID_PATTERN.search(url)
+                    if match:
+                        datasource_uid_cache.invalidate_uid(self.grafana_url, match.group(1))
+                response.raise_for_status()
+                return response
+            except httpx.TimeoutException:
+                if retries_left > 0:
+                    retries_left -= 1
+                    attempt += 1
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+                logger.error(f"Request timed out after {REQUEST_TIMEOUT} seconds")
+                raise
+            except httpx.TransportError as e:
+                if retries_left > 0:
+                    retries_left -= 1
+                    attempt += 1
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+                logger.error(f"Request failed: {e}")
+                raise
+            except httpx.HTTPStatusError as e:
+                logger.error(f"Request failed: {e}")
+                raise
+
+    async def get_datasource_id(self, datasource_type: str) -> str:
+        uid = datasource_uid_cache.get(self.grafana_url, datasource_type)
+        if uid is not None:
+            return uid
+        try:
+            response = await self._make_request("GET", f"{self.grafana_url}/api/datasources")
+            datasource_uid_cache.populate(self.grafana_url, response.json())
+            uid = datasource_uid_cache.get(self.grafana_url, datasource_type, record_stats=False)
+            if uid is None:
+                raise ValueError(f"{datasource_type} data source not found")
+            return uid
         except Exception as e:
             logger.error(f"Error fetching datasources: {str(e)}")
             raise
+
+    async def fetch_json(self, request: GrafanaRequest) -> Any:
+        response = await self._make_request(request.method, request.url, params=request.params)
+        return response.json()
+
+    async def gather(self, requests_to_send: List[GrafanaRequest]) -> List[Any]:
+        """Fan out requests under the concurrency limit; failed requests come back as exceptions in their slot."""
+        return await gather_bounded((self.fetch_json(request) for request in requests_to_send),
+                                    limit=self.max_concurrency)
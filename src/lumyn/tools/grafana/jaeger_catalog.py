@@ -0,0 +1,97 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+from .grafana_base_client import GrafanaBaseClient, GrafanaRequest
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+JAEGER_CATALOG_TTL = float(os.getenv("JAEGER_CATALOG_TTL", 600))
+# Minimum time between targeted refreshes for the same unknown service, so a wrong name does not hammer Jaeger.
+JAEGER_CATALOG_MISS_INTERVAL = float(os.getenv("JAEGER_CATALOG_MISS_INTERVAL", 30))
+
+
+class JaegerServiceCatalog:
+    """Services and their operations for one Jaeger datasource, warmed in parallel and refreshed on misses."""
+
+    def __init__(self, ttl: float = JAEGER_CATALOG_TTL):
+        self.ttl = ttl
+        self.services: List[str] = []
+        self.operations: Dict[str, List[Any]] = {}
+        self._expires_at = 0.0
+        self._last_miss_refresh: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, client: GrafanaBaseClient, datasource_id: str, service: str) -> Tuple[List[str], List[Any]]:
+        """Known services and the operations of `service`, as consumed by JaegerLinter."""
+        with self._lock:
+            base_url = f"{client.grafana_url}/api/datasources/proxy/uid/{datasource_id}/api"
+            if time.monotonic() >= self._expires_at:
+                self._warm(client, base_url)
+            if service in self.operations:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._refresh_service(client, base_url, service)
+            return list(self.services), list(self.operations.get(service) or [])
+
+    def _fetch_services(self, client: GrafanaBaseClient, base_url: str):
+        response = client._make_request("GET", f"{base_url}/services")
+        self.services = response.json().get("data") or []
+
+    def _warm(self, client: GrafanaBaseClient, base_url: str):
+        self._fetch_services(client, base_url)
+        results = client._gather_requests(
+            [GrafanaRequest("GET", f"{base_url}/operations", {"service": service}) for service in self.services])
+        operations = {}
+        for service, result in zip(self.services, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error fetching Jaeger operations for {service}: {str(result)}")
+                continue
+            operations[service] = result.get("data") or []
+        self.operations = operations
+        self._last_miss_refresh = {}
+        self._expires_at = time.monotonic() + self.ttl
+        logger.info(f"JaegerServiceCatalog warmed {len(self.services)} services")
+
+    def _refresh_service(self, client: GrafanaBaseClient, base_url: str, service: str):
+        now = time.monotonic()
+        if now - self._last_miss_refresh.get(service, float("-inf")) < JAEGER_CATALOG_MISS_INTERVAL:
+            return
+        self._last_miss_refresh[service] = now
+        if service not in self.services:
+            self._fetch_services(client, base_url)
+        if service in self.services:
+            response = client._make_request("GET", f"{base_url}/operations", params={"service": service})
+            self.operations[service] = response.json().get("data") or []
+
+
+_catalogs: Dict[Tuple[str, str], JaegerServiceCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_jaeger_catalog(grafana_url: str, datasource_id: str) -> JaegerServiceCatalog:
+    with _catalogs_lock:
+        return _catalogs.setdefault((grafana_url, datasource_id), JaegerServiceCatalog())
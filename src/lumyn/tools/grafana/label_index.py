@@ -0,0 +1,104 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+from lumyn.utils.tokens import estimate_tokens
+
+TOKEN_SPLIT_PATTERN = re.compile(r"[^a-z0-9]+")
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def word_tokens(text: str) -> Set[str]:
+    return {token for token in TOKEN_SPLIT_PATTERN.split(text.lower()) if token}
+
+
+class LabelValueIndex:
+    """Trigram and token index over a label -> values catalog, used to keep only the relevant part in prompts."""
+
+    def __init__(self, label_values: Dict[str, List[str]]):
+        self.label_values = label_values
+        self.full_tokens = estimate_tokens(str(label_values))
+        self._keys: List[Tuple[str, str]] = []
+        self._trigram_counts: List[int] = []
+        self._trigram_postings: Dict[str, List[int]] = defaultdict(list)
+        self._token_postings: Dict[str, List[int]] = defaultdict(list)
+        for label, values in label_values.items():
+            for value in values:
+                position = len(self._keys)
+                self._keys.append((label, value))
+                value_trigrams = trigrams(value)
+                self._trigram_counts.append(len(value_trigrams))
+                for trigram in value_trigrams:
+                    self._trigram_postings[trigram].append(position)
+                for token in word_tokens(value):
+                    self._token_postings[token].append(position)
+
+    def score_values(self, text: str) -> Dict[int, float]:
+        scores: Dict[int, float] = defaultdict(float)
+        overlaps: Dict[int, int] = defaultdict(int)
+        for trigram in trigrams(text):
+            for position in self._trigram_postings.get(trigram, ()):
+                overlaps[position] += 1
+        for position, overlap in overlaps.items():
+            # Fraction of the value's trigrams present in the text; partial matches below half are noise.
+            coverage = overlap / self._trigram_counts[position]
+            if coverage >= 0.5:
+                scores[position] += coverage
+        for token in word_tokens(text):
+            for position in self._token_postings.get(token, ()):
+                scores[position] += 1.0
+        return scores
+
+    def select(self, query: str, context_terms: Iterable[str] = (), top_k_labels: int = 8,
+               top_k_values: int = 25) -> Dict[str, List[str]]:
+        text = " ".join([query, *context_terms])
+        query_tokens = word_tokens(text)
+
+        per_label: Dict[str, List[Tuple[float, str]]] = defaultdict(list)
+        for position, score in self.score_values(text).items():
+            label, value = self._keys[position]
+            per_label[label].append((score, value))
+
+        label_scores = {label: max(score for score, _ in scored) for label, scored in per_label.items()}
+        for label in self.label_values:
+            # A label named in the query (e.g. "app", "namespace") is relevant even if no value matched.
+            if word_tokens(label) & query_tokens:
+                label_scores[label] = label_scores.get(label, 0.0) + 1.0
+
+        selected = {}
+        for label in sorted(label_scores, key=lambda name: (-label_scores[name], name))[:top_k_labels]:
+            scored = sorted(per_label.get(label, []), key=lambda item: (-item[0], item[1]))
+            values = [value for _, value in scored[:top_k_values]]
+            if not values:
+                values = self.label_values[label][:top_k_values]
+            selected[label] = values
+        return selected
+
+    def render(self, query: str, context_terms: Iterable[str] = (), top_k_labels: int = 8,
+               top_k_values: int = 25) -> Tuple[str, int]:
+        """Prompt text for the relevant labels, and the estimated tokens saved versus the full catalog."""
+        selected = self.select(query, context_terms, top_k_labels, top_k_values)
+        other_labels = sorted(set(self.label_values) - set(selected))
+        rendered = f"{selected}"
+        if other_labels:
+            rendered += f" (other labels available: {other_labels})"
+        return rendered, max(self.full_tokens - estimate_tokens(rendered), 0)
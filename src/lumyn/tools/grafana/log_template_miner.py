@@ -0,0 +1,182 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import datetime
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from .compact_encoding import COMPACT_ENCODING_TOKEN_BUDGET, ERROR_LINE, CompactEncoding, CompactTable
+
+LOG_TEMPLATE_MINING = os.getenv("LOG_TEMPLATE_MINING", "True") == "True"
+# Parse tree depth counting the root and token-count layers, so depth 4 routes on the first two tokens.
+LOG_TEMPLATE_DEPTH = int(os.getenv("LOG_TEMPLATE_DEPTH", 4))
+LOG_TEMPLATE_SIMILARITY = float(os.getenv("LOG_TEMPLATE_SIMILARITY", 0.4))
+LOG_TEMPLATE_MAX_CHILDREN = int(os.getenv("LOG_TEMPLATE_MAX_CHILDREN", 100))
+LOG_TEMPLATE_MAX_CLUSTERS = int(os.getenv("LOG_TEMPLATE_MAX_CLUSTERS", 1000))
+
+WILDCARD = "<*>"
+# Applied in order before tokenizing, so e.g. a timestamp is not also split into numbers.
+MASKS = [
+    (re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"), "<TS>"),
+    (re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"), "<UUID>"),
+    (re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"), "<IP>"),
+    (re.compile(r"\b(?:0x[0-9a-fA-F]+|[0-9a-fA-F]{16,})\b"), "<HEX>"),
+    (re.compile(r"\b\d+(?:\.\d+)?(?:ms|s|us|µs|ns|m|h)?\b"), "<NUM>"),
+]
+# Stream labels naming the emitting service, most specific first.
+SOURCE_LABELS = ("app", "service_name", "container", "job")
+MAX_SOURCES = 3
+
+
+def mask(line: str) -> str:
+    for pattern, replacement in MASKS:
+        line = pattern.sub(replacement, line)
+    return line
+
+
+def _format_time(milliseconds: Optional[float]) -> Optional[str]:
+    if milliseconds is None:
+        return None
+    moment = datetime.datetime.fromtimestamp(milliseconds / 1000, tz=datetime.timezone.utc)
+    return moment.strftime("%H:%M:%S.%f")[:-3]
+
+
+class LogTemplate:
+    """One cluster of similar lines: the shared template, how often and when it occurred, and one example."""
+
+    def __init__(self, tokens: List[str], line: str, timestamp: Optional[float], source: Optional[str]):
+        self.tokens = tokens
+        self.count = 0
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.example = line
+        self.sources: List[str] = []
+        self.record(timestamp, source)
+
+    @property
+    def template(self) -> str:
+        return " ".join(self.tokens)
+
+    def record(self, timestamp: Optional[float], source: Optional[str]):
+        self.count += 1
+        if timestamp is not None:
+            self.first_seen = timestamp if self.first_seen is None else min(self.first_seen, timestamp)
+            self.last_seen = timestamp if self.last_seen is None else max(self.last_seen, timestamp)
+        if source and source not in self.sources and len(self.sources) <= MAX_SOURCES:
+            self.sources.append(source)
+
+    def similarity(self, tokens: List[str]) -> Tuple[float, int]:
+        """Share of positions holding the same literal token, and the number of wildcards as the tie-breaker."""
+        matches = sum(1 for own, other in zip(self.tokens, tokens) if own == other and own != WILDCARD)
+        return matches / max(len(tokens), 1), self.tokens.count(WILDCARD)
+
+    def merge(self, tokens: List[str]):
+        self.tokens = [own if own == other else WILDCARD for own, other in zip(self.tokens, tokens)]
+
+
+class _Node:
+    __slots__ = ("children", "templates")
+
+    def __init__(self):
+        self.children: Dict[Any, "_Node"] = {}
+        self.templates: List[LogTemplate] = []
+
+
+class LogTemplateMiner:
+    """Streaming Drain-style log template miner.
+
+    Lines are masked, tokenized and routed through a fixed-depth tree by token count and leading tokens, then
+    matched against the few templates in that leaf, so each line costs the same however many have been seen.
+    """
+
+    def __init__(self,
+                 depth: int = LOG_TEMPLATE_DEPTH,
+                 similarity_threshold: float = LOG_TEMPLATE_SIMILARITY,
+                 max_children: int = LOG_TEMPLATE_MAX_CHILDREN,
+                 max_clusters: int = LOG_TEMPLATE_MAX_CLUSTERS):
+        self.prefix_depth = max(depth - 2, 0)
+        self.similarity_threshold = similarity_threshold
+        self.max_children = max_children
+        self.max_clusters = max_clusters
+        self.root = _Node()
+        self.clusters: List[LogTemplate] = []
+        self.lines = 0
+        # Lines that matched no template after max_clusters was reached; counted rather than kept.
+        self.overflow = 0
+
+    def add(self, line: str, timestamp: Optional[float] = None, source: Optional[str] = None) -> Optional[LogTemplate]:
+        """Fold one line (timestamp in epoch milliseconds) into the templates; returns its template."""
+        self.lines += 1
+        tokens = mask(line).split()
+        leaf = self._leaf(tokens)
+        best, best_score = None, (-1.0, -1)
+        for template in leaf.templates:
+            score = template.similarity(tokens)
+            if score > best_score:
+                best, best_score = template, score
+        if best is not None and best_score[0] >= self.similarity_threshold:
+            best.merge(tokens)
+            best.record(timestamp, source)
+            return best
+        if len(self.clusters) >= self.max_clusters:
+            self.overflow += 1
+            return None
+        template = LogTemplate(tokens, line, timestamp, source)
+        leaf.templates.append(template)
+        self.clusters.append(template)
+        return template
+
+    def _leaf(self, tokens: List[str]) -> _Node:
+        node = self.root.children.setdefault(len(tokens), _Node())
+        for token in tokens[:self.prefix_depth]:
+            if token not in node.children:
+                # Tokens that carry digits are likely variables; route them, and tokens past the fan-out limit, to *.
+                if any(character.isdigit() for character in token) or len(node.children) >= self.max_children:
+                    token = WILDCARD
+            node = node.children.setdefault(token, _Node())
+        return node
+
+    def add_streams(self, result: List[Dict[str, Any]]):
+        """Fold a Loki `streams` result in, taking each line's source from its stream labels."""
+        for stream in result:
+            labels = stream.get("stream") or {}
+            source = next((labels[label] for label in SOURCE_LABELS if labels.get(label)), None)
+            for timestamp, line in stream.get("values") or []:
+                self.add(line, int(timestamp) / 1e6, source)
+
+    def templates(self) -> List[LogTemplate]:
+        """Templates that look like errors first, then by descending count."""
+        return sorted(self.clusters, key=lambda template: (not ERROR_LINE.search(template.template), -template.count))
+
+    def encoding(self, token_budget: int = COMPACT_ENCODING_TOKEN_BUDGET,
+                 notes: Optional[List[str]] = None) -> CompactEncoding:
+        templates = self.templates()
+        rows = [[
+            template.count,
+            _format_time(template.first_seen),
+            _format_time(template.last_seen),
+            ",".join(template.sources[:MAX_SOURCES]) + ("..." if len(template.sources) > MAX_SOURCES else ""),
+            template.template,
+            template.example if template.example != template.template else None,
+        ] for template in templates]
+        notes = list(notes or []) + ["<*> and <NUM>, <IP>, <UUID>, <HEX>, <TS> mark the variable parts of a template"]
+        if self.overflow:
+            notes.append(f"{self.overflow} lines matched none of the first {self.max_clusters} templates and are not shown")
+        table = CompactTable(f"Log templates: {self.lines} lines collapsed into {len(templates)} templates",
+                             ["count", "first_seen", "last_seen", "sources", "template", "example"], rows,
+                             important=[bool(ERROR_LINE.search(template.template)) for template in templates],
+                             notes=notes)
+        return CompactEncoding([table], token_budget)
@@ -0,0 +1,117 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from lumyn.utils.incident_window import get_incident_window
+
+from .grafana_base_client import GrafanaBaseClient, GrafanaRequest
+from .label_index import LabelValueIndex
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+LOKI_LABEL_CATALOG_TTL = float(os.getenv("LOKI_LABEL_CATALOG_TTL", 300))
+
+
+class LokiLabelCatalog:
+    """Label -> values catalog for one Loki datasource, bounded to the incident window.
+
+    The first refresh covers the whole incident window. Later refreshes only ask Loki for labels
+    and values seen since the previous refresh and merge them into the catalog.
+    """
+
+    def __init__(self, ttl: float = LOKI_LABEL_CATALOG_TTL):
+        self.ttl = ttl
+        self._label_values: Dict[str, Set[str]] = {}
+        self._synced_until_ns: Optional[int] = None
+        self._expires_at = 0.0
+        self._index: Optional[LabelValueIndex] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.refreshes = 0
+
+    def get(self, client: GrafanaBaseClient, datasource_id: str) -> Dict[str, List[str]]:
+        with self._lock:
+            self._refresh_if_expired(client, datasource_id)
+            return self._snapshot()
+
+    def get_index(self, client: GrafanaBaseClient, datasource_id: str) -> LabelValueIndex:
+        with self._lock:
+            self._refresh_if_expired(client, datasource_id)
+            if self._index is None:
+                self._index = LabelValueIndex(self._snapshot())
+            return self._index
+
+    def _snapshot(self) -> Dict[str, List[str]]:
+        return {label: sorted(values) for label, values in self._label_values.items()}
+
+    def _refresh_if_expired(self, client: GrafanaBaseClient, datasource_id: str):
+        if self._synced_until_ns is None or time.monotonic() >= self._expires_at:
+            self._refresh(client, datasource_id)
+        else:
+            self.hits += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._expires_at = 0.0
+
+    def _refresh(self, client: GrafanaBaseClient, datasource_id: str):
+        base_url = f"{client.grafana_url}/api/datasources/proxy/uid/{datasource_id}/loki/api/v1"
+        end_ns = time.time_ns()
+        if self._synced_until_ns is None:
+            window_start, _ = get_incident_window()
+            start_ns = int(window_start * 1e9)
+        else:
+            start_ns = self._synced_until_ns
+        params = {"start": start_ns, "end": end_ns}
+
+        labels = client._make_request("GET", f"{base_url}/labels", params=params).json().get("data") or []
+        results = client._gather_requests(
+            [GrafanaRequest("GET", f"{base_url}/label/{label}/values", params) for label in labels])
+
+        complete = True
+        for label, result in zip(labels, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error fetching Loki values for label {label}: {str(result)}")
+                complete = False
+                continue
+            self._label_values.setdefault(label, set()).update(result.get("data") or [])
+        self._index = None
+
+        # Only advance the cursor when every label was fetched, so failed labels are retried next time.
+        if complete:
+            self._synced_until_ns = end_ns
+        elif self._synced_until_ns is None:
+            self._synced_until_ns = start_ns
+        self._expires_at = time.monotonic() + self.ttl
+        self.refreshes += 1
+        logger.info(
+            f"LokiLabelCatalog refreshed {len(labels)} labels for window {start_ns}-{end_ns} (refresh #{self.refreshes})")
+
+
+_catalogs: Dict[Tuple[str, str], LokiLabelCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_loki_label_catalog(grafana_url: str, datasource_id: str) -> LokiLabelCatalog:
+    with _catalogs_lock:
+        return _catalogs.setdefault((grafana_url, datasource_id), LokiLabelCatalog())
@@ -0,0 +1,243 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import datetime
+import logging
+import os
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .compact_encoding import COMPACT_ENCODING_TOKEN_BUDGET, ERROR_LINE, CompactEncoding, CompactTable
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Loki rejects limits above its max_entries_limit_per_query, which defaults to 5000.
+LOKI_MAX_QUERY_LIMIT = int(os.getenv("LOKI_MAX_QUERY_LIMIT", 5000))
+LOKI_PAGE_SIZE = int(os.getenv("LOKI_PAGE_SIZE", 1000))
+LOKI_PAGER_MAX_PAGES = int(os.getenv("LOKI_PAGER_MAX_PAGES", 50))
+LOKI_PAGER_MAX_LINES = int(os.getenv("LOKI_PAGER_MAX_LINES", 50000))
+LOKI_PAGER_MAX_BYTES = int(os.getenv("LOKI_PAGER_MAX_BYTES", 32 * 1024 * 1024))
+# Loki's own default window when neither start nor since is given.
+LOKI_DEFAULT_LOOKBACK_SECONDS = 3600
+
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h|d|w)")
+DURATION_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_duration_seconds(value: Any) -> Optional[float]:
+    """Seconds in a Prometheus-style duration ("1h30m") or a plain number of seconds; None if unparseable."""
+    if value is None:
+        return None
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    matches = DURATION_PATTERN.findall(text)
+    if not matches or "".join(number + unit for number, unit in matches) != text:
+        return None
+    return sum(float(number) * DURATION_SECONDS[unit] for number, unit in matches)
+
+
+def to_nanoseconds(value: Any) -> Optional[int]:
+    """A Loki timestamp (Unix epoch in s/ms/us/ns, or RFC3339) as Unix nanoseconds; None if unparseable."""
+    if value is None or value == "":
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        try:
+            moment = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=datetime.timezone.utc)
+        return int(moment.timestamp() * 1e9)
+    # Guess the unit from the magnitude, the way Loki itself accepts any of them.
+    for limit, scale in ((1e11, 1e9), (1e14, 1e6), (1e17, 1e3)):
+        if number < limit:
+            return int(number * scale)
+    return int(number)
+
+
+def resolve_window(start: Any = None, end: Any = None, since: Any = None) -> Tuple[int, int]:
+    """(start, end) in Unix nanoseconds with Loki's defaults: end is now, start is `since` (or an hour) before end."""
+    end_ns = to_nanoseconds(end) or time.time_ns()
+    start_ns = to_nanoseconds(start)
+    if start_ns is None:
+        lookback = parse_duration_seconds(since) or LOKI_DEFAULT_LOOKBACK_SECONDS
+        start_ns = end_ns - int(lookback * 1e9)
+    return start_ns, end_ns
+
+
+class LokiPagerStats:
+
+    def __init__(self, start_ns: int, end_ns: int, forward: bool = True):
+        self.start_ns = start_ns
+        self.end_ns = end_ns
+        self.forward = forward
+        self.pages = 0
+        self.lines = 0
+        self.bytes = 0
+        self.stopped_early: Optional[str] = None
+
+    def describe(self) -> str:
+        window = "-".join(
+            datetime.datetime.fromtimestamp(ns / 1e9, tz=datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+            for ns in (self.start_ns, self.end_ns))
+        text = f"scanned {self.lines} lines ({self.bytes} bytes) in {self.pages} pages over {window}"
+        if self.stopped_early:
+            text += (f"; stopped early at the {self.stopped_early}, "
+                     f"{'later' if self.forward else 'earlier'} lines were not read")
+        return text
+
+
+def page_loki_range(fetch: Callable[[Dict[str, Any]], Dict[str, Any]],
+                    query: str,
+                    start_ns: int,
+                    end_ns: int,
+                    reducer: Any,
+                    direction: str = "forward",
+                    page_size: int = LOKI_PAGE_SIZE,
+                    max_pages: int = LOKI_PAGER_MAX_PAGES,
+                    max_lines: int = LOKI_PAGER_MAX_LINES,
+                    max_bytes: int = LOKI_PAGER_MAX_BYTES) -> Tuple[Optional[Dict[str, Any]], LokiPagerStats]:
+    """Walk a LogQL range query in pages and feed each page's streams to `reducer.add_streams`.
+
+    `fetch` sends one query_range request with the given params and returns the decoded response. A forward walk
+    starts each page at the last timestamp of the previous one; a backward walk (newest lines first, so the caps
+    cut off the oldest lines) ends each page just after the earliest timestamp of the previous one, as Loki's end
+    is exclusive. Lines at that boundary timestamp that were already delivered are dropped, so nothing is fed twice
+    or skipped when a page ends mid-timestamp. Only one page is held at a time.
+
+    Returns (response, stats): the first response itself if the query is a metric query (not a `streams` result),
+    otherwise None.
+    """
+    forward = direction != "backward"
+    stats = LokiPagerStats(start_ns, end_ns, forward)
+    cursor = start_ns if forward else end_ns
+    boundary_ns: Optional[int] = None
+    boundary_seen: Set[Tuple[Tuple, str]] = set()
+    while cursor < end_ns if forward else cursor > start_ns:
+        if stats.pages >= max_pages:
+            stats.stopped_early = "page limit"
+            break
+        window = {"start": cursor, "end": end_ns} if forward else {"start": start_ns, "end": cursor}
+        payload = fetch({"query": query, **window, "limit": page_size,
+                         "direction": "forward" if forward else "backward"})
+        data = (payload.get("data") or {}) if isinstance(payload, dict) else {}
+        if data.get("resultType") != "streams":
+            return payload, stats
+        stats.pages += 1
+
+        fresh, received, last_ns = [], 0, None
+        last_seen: Set[Tuple[Tuple, str]] = set()
+        for stream in data.get("result") or []:
+            key = tuple(sorted((stream.get("stream") or {}).items()))
+            values = []
+            for timestamp, line in stream.get("values") or []:
+                received += 1
+                timestamp_ns = int(timestamp)
+                if timestamp_ns == boundary_ns and (key, line) in boundary_seen:
+                    continue
+                values.append([timestamp, line])
+                # The page's far edge: its newest line walking forward, its oldest walking backward.
+                if last_ns is None or (timestamp_ns > last_ns if forward else timestamp_ns < last_ns):
+                    last_ns, last_seen = timestamp_ns, set()
+                if timestamp_ns == last_ns:
+                    last_seen.add((key, line))
+            if values:
+                fresh.append({**stream, "values": values})
+
+        fresh = _within_caps(fresh, stats, max_lines, max_bytes)
+        if fresh:
+            reducer.add_streams(fresh)
+        if stats.stopped_early or received < page_size:
+            break
+        if last_ns is None:
+            # More than a page of lines share one nanosecond; step past it rather than re-reading it forever.
+            logger.info(f"Loki pager skipping past {page_size}+ lines at timestamp {boundary_ns}")
+            cursor = cursor + 1 if forward else cursor - 1
+            continue
+        if last_ns == boundary_ns:
+            # A whole page of one timestamp: keep what was already seen there so it is not fed again.
+            boundary_seen |= last_seen
+        else:
+            boundary_ns, boundary_seen = last_ns, last_seen
+        cursor = last_ns if forward else last_ns + 1
+    logger.info(f"Loki pager {stats.describe()}")
+    return None, stats
+
+
+def _within_caps(result: List[Dict[str, Any]], stats: LokiPagerStats, max_lines: int,
+                 max_bytes: int) -> List[Dict[str, Any]]:
+    kept = []
+    for stream in result:
+        values = []
+        for timestamp, line in stream["values"]:
+            size = len(line.encode())
+            if stats.lines >= max_lines or stats.bytes + size > max_bytes:
+                stats.stopped_early = "line limit" if stats.lines >= max_lines else "byte limit"
+                break
+            values.append([timestamp, line])
+            stats.lines += 1
+            stats.bytes += size
+        if values:
+            kept.append({**stream, "values": values})
+        if stats.stopped_early:
+            break
+    return kept
+
+
+class ErrorCounter:
+    """Incremental per-source tally of all and error-looking lines, with the first error line of each source."""
+
+    def __init__(self):
+        self.sources: Dict[str, Dict[str, Any]] = {}
+
+    def add_streams(self, result: List[Dict[str, Any]]):
+        for stream in result:
+            labels = stream.get("stream") or {}
+            source = labels.get("app") or labels.get("service_name") or labels.get("container") or \
+                ",".join(f"{key}={value}" for key, value in sorted(labels.items()))
+            tally = self.sources.setdefault(source, {"lines": 0, "errors": 0, "first_error": None,
+                                                     "last_error": None, "example": None})
+            for timestamp, line in stream.get("values") or []:
+                tally["lines"] += 1
+                if not ERROR_LINE.search(line):
+                    continue
+                milliseconds = int(timestamp) / 1e6
+                tally["errors"] += 1
+                if tally["first_error"] is None or milliseconds < tally["first_error"]:
+                    tally["first_error"], tally["example"] = milliseconds, line
+                tally["last_error"] = max(tally["last_error"] or milliseconds, milliseconds)
+
+    def encoding(self, token_budget: int = COMPACT_ENCODING_TOKEN_BUDGET,
+                 notes: Optional[List[str]] = None) -> CompactEncoding:
+        rows = [[source, tally["lines"], tally["errors"], _clock(tally["first_error"]), _clock(tally["last_error"]),
+                 tally["example"]]
+                for source, tally in sorted(self.sources.items(), key=lambda item: -item[1]["errors"])]
+        table = CompactTable(f"Log lines and error lines per source across {len(rows)} sources",
+                             ["source", "lines", "errors", "first_error", "last_error", "first_error_line"], rows,
+                             important=[row[2] > 0 for row in rows], notes=notes)
+        return CompactEncoding([table], token_budget)
+
+
+def _clock(milliseconds: Optional[float]) -> Optional[str]:
+    if milliseconds is None:
+        return None
+    return datetime.datetime.fromtimestamp(milliseconds / 1000, tz=datetime.timezone.utc).strftime("%H:%M:%S.%f")[:-3]
@@ -0,0 +1,156 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import datetime
+import warnings
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+# A jump is a step change when it exceeds this many robust standard deviations of the series' point-to-point changes.
+STEP_CHANGE_THRESHOLD = 5.0
+
+
+def _format_number(value: float) -> str:
+    if np.isnan(value):
+        return "-"
+    return f"{value:.4g}"
+
+
+def _format_timestamp(seconds: float) -> str:
+    return datetime.datetime.fromtimestamp(seconds, tz=datetime.timezone.utc).strftime("%H:%M:%S")
+
+
+def matrix_to_arrays(result: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray, List[Dict[str, str]]]:
+    """Align a Prometheus matrix result on a common time grid: (grid seconds, values[series, step], labels)."""
+    series_timestamps = [np.array([point[0] for point in series.get("values", [])], dtype=float) for series in result]
+    all_timestamps = np.unique(np.concatenate(series_timestamps)) if series_timestamps else np.array([])
+    if all_timestamps.size == 0:
+        return all_timestamps, np.empty((len(result), 0)), [series.get("metric", {}) for series in result]
+
+    step = np.min(np.diff(all_timestamps)) if all_timestamps.size > 1 else 1.0
+    grid = np.arange(all_timestamps[0], all_timestamps[-1] + step / 2, step)
+    values = np.full((len(result), grid.size), np.nan)
+    for row, (series, timestamps) in enumerate(zip(result, series_timestamps)):
+        if timestamps.size == 0:
+            continue
+        columns = np.rint((timestamps - grid[0]) / step).astype(int)
+        # Prometheus encodes samples as strings, including "NaN" and "+Inf".
+        values[row, columns] = np.array([point[1] for point in series["values"]], dtype=float)
+    values[np.isinf(values)] = np.nan
+    return grid, values, [series.get("metric", {}) for series in result]
+
+
+def compute_series_statistics(grid: np.ndarray, values: np.ndarray) -> Dict[str, np.ndarray]:
+    """Per-series statistics computed across all series at once; rows of `values` are series."""
+    finite = ~np.isnan(values)
+    has_data = finite.any(axis=1)
+
+    with np.errstate(all="ignore"), warnings.catch_warnings():
+        # All-NaN rows are expected (series with no samples); their statistics stay NaN.
+        warnings.simplefilter("ignore", RuntimeWarning)
+        minimum = np.where(has_data, np.min(np.where(finite, values, np.inf), axis=1), np.nan)
+        maximum = np.where(has_data, np.max(np.where(finite, values, -np.inf), axis=1), np.nan)
+        count = finite.sum(axis=1)
+        mean = np.where(has_data, np.where(finite, values, 0.0).sum(axis=1) / np.maximum(count, 1), np.nan)
+        p95 = np.full(values.shape[0], np.nan)
+        if has_data.any():
+            p95[has_data] = np.nanpercentile(values[has_data], 95, axis=1)
+        last_index = values.shape[1] - 1 - np.argmax(finite[:, ::-1], axis=1)
+        last = np.where(has_data, values[np.arange(values.shape[0]), last_index], np.nan)
+
+        # Least-squares slope per minute over the finite points of each row.
+        minutes = (grid - grid[0]) / 60.0 if grid.size else grid
+        x = np.where(finite, minutes[None, :], 0.0)
+        y = np.where(finite, values, 0.0)
+        x_mean = x.sum(axis=1) / np.maximum(count, 1)
+        y_mean = y.sum(axis=1) / np.maximum(count, 1)
+        covariance = (np.where(finite, (x - x_mean[:, None]) * (y - y_mean[:, None]), 0.0)).sum(axis=1)
+        variance = (np.where(finite, (x - x_mean[:, None])**2, 0.0)).sum(axis=1)
+        slope = np.where((count >= 2) & (variance > 0), covariance / np.where(variance > 0, variance, 1.0), np.nan)
+
+        # Step changes: jumps far outside the typical point-to-point change (robust z-score via MAD).
+        deltas = np.diff(values, axis=1)
+        if deltas.shape[1]:
+            median_delta = np.nanmedian(deltas, axis=1)
+            mad = np.nanmedian(np.abs(deltas - median_delta[:, None]), axis=1) * 1.4826
+            threshold = np.where(mad > 0, STEP_CHANGE_THRESHOLD * mad, 0.0)
+            jumps = np.abs(deltas - median_delta[:, None])
+            is_step = (jumps > threshold[:, None]) & ~np.isnan(jumps)
+            # With a perfectly flat series any change counts, but ignore float noise.
+            is_step &= jumps > 1e-9 * np.maximum(np.abs(np.nan_to_num(maximum))[:, None], 1.0)
+            step_changes = is_step.sum(axis=1)
+            largest = np.argmax(np.where(is_step, jumps, -1.0), axis=1)
+            largest_step_at = np.where(step_changes > 0, grid[1:][largest], np.nan)
+        else:
+            step_changes = np.zeros(values.shape[0], dtype=int)
+            largest_step_at = np.full(values.shape[0], np.nan)
+
+        # Count contiguous runs of missing samples, not individual missing points.
+        missing = ~finite
+        gap_starts = missing & ~np.concatenate([np.zeros((values.shape[0], 1), dtype=bool), missing[:, :-1]], axis=1)
+        nan_gaps = np.where(has_data, gap_starts.sum(axis=1), 0)
+
+    return {
+        "min": minimum,
+        "max": maximum,
+        "mean": mean,
+        "p95": p95,
+        "last": last,
+        "slope_per_min": slope,
+        "step_changes": step_changes,
+        "largest_step_at": largest_step_at,
+        "nan_gaps": nan_gaps,
+        "missing_points": missing.sum(axis=1),
+    }
+
+
+def summarize_matrix(result: List[Dict[str, Any]], max_rows: int = 50) -> str:
+    """Render a Prometheus matrix result as a compact statistics table, one row per series."""
+    grid, values, labels = matrix_to_arrays(result)
+    if grid.size == 0:
+        return "No samples returned for the query."
+    statistics = compute_series_statistics(grid, values)
+
+    common = {key: value for key, value in labels[0].items() if all(series.get(key) == value for series in labels)}
+    lines = [
+        f"Window {_format_timestamp(grid[0])}-{_format_timestamp(grid[-1])} UTC, step {grid[1] - grid[0] if grid.size > 1 else 0:g}s, {len(labels)} series",
+    ]
+    if common:
+        lines.append("Common labels: " + ", ".join(f"{key}={value}" for key, value in sorted(common.items())))
+    lines.append("series | min | max | mean | p95 | last | slope/min | step_changes (largest at) | nan_gaps (missing points)")
+
+    # Most volatile series first so truncation keeps the interesting ones.
+    order = np.argsort(-(statistics["step_changes"] * 1e6 + np.nan_to_num(np.abs(statistics["slope_per_min"]))),
+                       kind="stable")
+    for row in order[:max_rows]:
+        series_labels = ",".join(f"{key}={value}" for key, value in sorted(labels[row].items()) if key not in common)
+        largest_at = statistics["largest_step_at"][row]
+        steps = f"{statistics['step_changes'][row]}" + (f" ({_format_timestamp(largest_at)})"
+                                                        if not np.isnan(largest_at) else "")
+        lines.append(" | ".join([
+            series_labels or "{}",
+            _format_number(statistics["min"][row]),
+            _format_number(statistics["max"][row]),
+            _format_number(statistics["mean"][row]),
+            _format_number(statistics["p95"][row]),
+            _format_number(statistics["last"][row]),
+            _format_number(statistics["slope_per_min"][row]),
+            steps,
+            f"{statistics['nan_gaps'][row]} ({statistics['missing_points'][row]})",
+        ]))
+    if len(order) > max_rows:
+        lines.append(f"... {len(order) - max_rows} more series omitted")
+    return "\n".join(lines)
@@ -13,25 +13,38 @@
 # limitations under the License.
 
 
-import json
 import logging
 import os
 import time
-from typing import Any, Dict, Optional, Type
+from typing import Any, Dict, List, Optional, Type
 
 from crewai.tools.base_tool import BaseTool
 from pydantic import BaseModel, Field
 
+from lumyn.llm_backends.response_cache import scoped_tool_run
 from lumyn.tools.linting.logql_linter import LogQLLinter
+from lumyn.utils.evidence_cache import EVIDENCE_PREFETCH, evidence_cache, with_evidence
 
+from .chunked_summary import split_loki_streams, summarize_payload
+from .compact_encoding import COMPACT_ENCODING, COMPACT_ENCODING_TOKEN_BUDGET, encode_payload
 from .custom_function_definitions_grafana import fd_query_loki_logs
+from .get_alerts import get_latest_alert_label_values
 from .grafana_base_client import GrafanaBaseClient
+from .log_template_miner import LOG_TEMPLATE_MINING, LogTemplateMiner
+from .loki_label_catalog import get_loki_label_catalog
+from .loki_pager import LOKI_MAX_QUERY_LIMIT, ErrorCounter, page_loki_range, resolve_window
+from .query_cost import QUERY_COST_PREFLIGHT, QueryPlan, plan_loki_query
 
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+LOKI_LABEL_PRUNING = os.getenv("LOKI_LABEL_PRUNING", "True") == "True"
+LOKI_PROMPT_TOP_K_LABELS = int(os.getenv("LOKI_PROMPT_TOP_K_LABELS", 8))
+LOKI_PROMPT_TOP_K_VALUES = int(os.getenv("LOKI_PROMPT_TOP_K_VALUES", 25))
+NL2LOGS_PAGER_MODE = os.getenv("NL2LOGS_PAGER_MODE", "True") == "True"
+
 
 class NL2LogsCustomToolInput(BaseModel):
     nl_query: str = Field(
@@ -46,20 +59,43 @@ class NL2LogsCustomTool(GrafanaBaseClient, BaseTool):
         "Converts natural language to LogQL queries and executes them to access logs (and other information) from Loki via the Grafana API."
     )
     llm_backend: Any = None
+    compact_encoding: bool = COMPACT_ENCODING
+    compact_token_budget: int = COMPACT_ENCODING_TOKEN_BUDGET
+    template_mining: bool = LOG_TEMPLATE_MINING
+    pager_mode: bool = NL2LOGS_PAGER_MODE
+    cost_preflight: bool = QUERY_COST_PREFLIGHT
+    prefetched_evidence: bool = EVIDENCE_PREFETCH
     args_schema: Type[BaseModel] = NL2LogsCustomToolInput
 
+    @scoped_tool_run
     def _run(self, nl_query: str) -> str:
+        return with_evidence(self._prefetched(nl_query), self._run_live(nl_query))
+
+    def _run_live(self, nl_query: str) -> str:
         try:
             function_name, function_arguments = self._generate_logql_query(
                 prompt=nl_query)
             lint_message = LogQLLinter.lint(function_arguments)
             if lint_message != function_arguments:
                 return lint_message
-            return self._summarize_logs(self._query_loki_logs(**function_arguments))
+            function_arguments, plan = self._plan_query(function_arguments)
+            if plan.sketch is not None:
+                return plan.sketch
+            if self.pager_mode:
+                # The LLM's limit bounds a single page; pager mode deliberately reads the whole window and reduces it locally,
+                # walking in the LLM's direction so the caps drop the lines it cares least about.
+                return plan.annotate(self._summarize_paged_logs(**function_arguments))
+            return plan.annotate(self._summarize_logs(self._query_loki_logs(**function_arguments)))
         except Exception as exc:
             logger.error(f"NL2Logs Tool failed with: {exc}")
             return f"NL2Logs Tool failed with: {exc}"
 
+    def _prefetched(self, nl_query: str) -> Optional[str]:
+        """Error log templates pre-fetched for the alerting entities the query names, if not served yet."""
+        if not self.prefetched_evidence:
+            return None
+        return evidence_cache.take("logs", nl_query)
+
     def _generate_logql_query(self, prompt: str) -> str:
 
         with open(
@@ -73,7 +109,7 @@ class NL2LogsCustomTool(GrafanaBaseClient, BaseTool):
         time_nano = time.time_ns()
 
         
-        input = f"{loki_icl}\n\nWrite a LogQL query to do the following and return it in a tool call to query_loki_logs: {prompt}.\n\nHere is a dictionary of the values available for each label in the query {self._get_label_value_dict()} \n\nThe current time in nanoseconds is {time_nano}"
+        input = f"{loki_icl}\n\nWrite a LogQL query to do the following and return it in a tool call to query_loki_logs: {prompt}.\n\nHere is a dictionary of the values available for each label in the query {self._get_relevant_label_values(prompt)} \n\nThe current time in nanoseconds is {time_nano}"
         
         
         tools = [fd_query_loki_logs]
@@ -90,6 +126,24 @@ class NL2LogsCustomTool(GrafanaBaseClient, BaseTool):
         )
         return function_name, function_arguments
 
+    def _plan_query(self, function_arguments: Dict[str, Any]):
+        """Pre-flight cost check; returns the arguments to run (window narrowed if needed) and the QueryPlan."""
+        plan = QueryPlan(function_arguments.get("start"), function_arguments.get("end"))
+        if not self.cost_preflight:
+            return function_arguments, plan
+        try:
+            datasource_id = self.get_datasource_id("loki")
+            start_ns, end_ns = resolve_window(function_arguments.get("start"), function_arguments.get("end"),
+                                              function_arguments.get("since"))
+            plan = plan_loki_query(self, datasource_id, function_arguments["query"], start_ns, end_ns)
+        except Exception as e:
+            # The estimate is best effort; the query still runs as generated if it fails.
+            logger.error(f"Error estimating LogQL query cost: {str(e)}")
+            return function_arguments, plan
+        if plan.note is not None:
+            function_arguments = {**function_arguments, "start": str(plan.start), "end": str(plan.end), "since": None}
+        return function_arguments, plan
+
     def _query_loki_logs(
             self,
             query: str,
@@ -105,7 +159,7 @@ class NL2LogsCustomTool(GrafanaBaseClient, BaseTool):
             url = f"{self.grafana_url}/api/datasources/proxy/uid/{datasource_id}/loki/api/v1/query_range"
             params = {
                 "query": query,
-                "limit": 10,
+                "limit": min(int(limit), LOKI_MAX_QUERY_LIMIT),
                 "start": start,
                 "end": end,
                 "since": since,
@@ -123,6 +177,44 @@ class NL2LogsCustomTool(GrafanaBaseClient, BaseTool):
             logger.error(f"Error querying Loki logs: {str(e)}")
             return f"Error querying Loki logs: {str(e)} Here is a dictionary of the values available for each label in the query {self._get_label_value_dict()}"
         
+    def _stream_loki_logs(self,
+                          reducer: Any,
+                          query: str,
+                          start: Optional[str] = None,
+                          end: Optional[str] = None,
+                          since: Optional[str] = None,
+                          direction: str = "backward",
+                          **_: Any):
+        """Feed every line of the query's window to `reducer` page by page; returns page_loki_range's (response, stats).
+
+        Backward (the default, as for single queries) reads the newest lines first, so the pager's caps cut off the oldest.
+        """
+        datasource_id = self.get_datasource_id("loki")
+        url = f"{self.grafana_url}/api/datasources/proxy/uid/{datasource_id}/loki/api/v1/query_range"
+        start_ns, end_ns = resolve_window(start, end, since)
+        return page_loki_range(lambda params: self._make_request("GET", url, params=params).json(), query, start_ns,
+                               end_ns, reducer, direction=direction)
+
+    def _summarize_paged_logs(self, **function_arguments):
+        reducer = LogTemplateMiner() if self.template_mining else ErrorCounter()
+        try:
+            response, stats = self._stream_loki_logs(reducer, **function_arguments)
+        except Exception as e:
+            print(f"Error querying Loki logs: {str(e)}")
+            logger.error(f"Error querying Loki logs: {str(e)}")
+            return self._summarize_logs(f"Error querying Loki logs: {str(e)} Here is a dictionary of the values available for each label in the query {self._get_label_value_dict()}")
+        if response is not None:
+            # Metric queries return one matrix or vector, not pages of lines.
+            return self._summarize_logs(response)
+        logger.info(f"NL2Logs Tool {stats.describe()}")
+        print(f"NL2Logs Tool {stats.describe()}")
+        notes = [f"Loki {stats.describe()}"]
+        if self.template_mining:
+            return self._summarize_log_templates(reducer, notes)
+        system_prompt = "You do log analysis and summarization. You are given, per log source, the number of lines and of error lines in a time window, when errors were first and last seen, and the first error line. Provide a brief summary and analysis of them."
+        encoding = reducer.encoding(self.compact_token_budget, notes)
+        return summarize_payload(self.llm_backend, system_prompt, encoding.render(), lambda _: encoding.parts())
+
     def _get_labels(self):
         try:
             datasource_id = self.get_datasource_id("loki")
@@ -159,14 +251,7 @@ class NL2LogsCustomTool(GrafanaBaseClient, BaseTool):
     def _get_label_value_dict(self):
         try:
             datasource_id = self.get_datasource_id("loki")
-            label_url = f"{self.grafana_url}/api/datasources/proxy/uid/{datasource_id}/loki/api/v1/labels"
-            response = self._make_request("GET", label_url)
-            label_value_dict = {}
-            for label in response.json()['data']:
-                value_url = f"{self.grafana_url}/api/datasources/proxy/uid/{datasource_id}/loki/api/v1/label/{label}/values"
-                values = self._make_request("GET", value_url).json()['data']
-                label_value_dict[label] = values
-            return label_value_dict
+            return get_loki_label_catalog(self.grafana_url, datasource_id).get(self, datasource_id)
 
         except Exception as e:
             print(f"Error querying Loki logs: {str(e)}")
@@ -174,6 +259,23 @@ class NL2LogsCustomTool(GrafanaBaseClient, BaseTool):
             return f"Error querying Loki logs: {str(e)}"
 
     
+    def _get_relevant_label_values(self, prompt: str):
+        if not LOKI_LABEL_PRUNING:
+            return self._get_label_value_dict()
+        try:
+            datasource_id = self.get_datasource_id("loki")
+            index = get_loki_label_catalog(self.grafana_url, datasource_id).get_index(self, datasource_id)
+            label_values, tokens_saved = index.render(prompt, get_latest_alert_label_values(),
+                                                      top_k_labels=LOKI_PROMPT_TOP_K_LABELS,
+                                                      top_k_values=LOKI_PROMPT_TOP_K_VALUES)
+            logger.info(
+                f"NL2Logs Tool label catalog pruned from ~{index.full_tokens} tokens, saving ~{tokens_saved} tokens")
+            print(f"NL2Logs Tool label catalog pruned from ~{index.full_tokens} tokens, saving ~{tokens_saved} tokens")
+            return label_values
+        except Exception as e:
+            logger.error(f"Error pruning Loki label catalog: {str(e)}")
+            return self._get_label_value_dict()
+
     def _get_last_hour(self, application):
         try:
             datasource_id = self.get_datasource_id("loki")
@@ -193,5 +295,17 @@ class NL2LogsCustomTool(GrafanaBaseClient, BaseTool):
         
     def _summarize_logs(self, logs):
         system_prompt = "You do log analysis and summarization. Look at the logs given to you and provide a brief summary and analysis of them."
-        logs_summary = self.llm_backend.inference(system_prompt, json.dumps(logs))
-        return logs_summary
\ No newline at end of file
+        if self.template_mining and isinstance(logs, dict) and (logs.get("data") or {}).get("resultType") == "streams":
+            miner = LogTemplateMiner()
+            miner.add_streams(logs["data"].get("result") or [])
+            return self._summarize_log_templates(miner)
+        if self.compact_encoding:
+            encoding = encode_payload(logs, self.compact_token_budget)
+            return summarize_payload(self.llm_backend, system_prompt, encoding.render(), lambda _: encoding.parts())
+        logs_summary = summarize_payload(self.llm_backend, system_prompt, logs, split_loki_streams)
+        return logs_summary
+
+    def _summarize_log_templates(self, miner: LogTemplateMiner, notes: Optional[List[str]] = None):
+        system_prompt = "You do log analysis and summarization. You are given the distinct message templates mined from the logs, each with its number of occurrences, when it was first and last seen, and an example line. Provide a brief summary and analysis of them."
+        encoding = miner.encoding(self.compact_token_budget, notes)
+        return summarize_payload(self.llm_backend, system_prompt, encoding.render(), lambda _: encoding.parts())
\ No newline at end of file
@@ -14,7 +14,6 @@
 
 
 import logging
-import json
 import os
 import re
 import time
@@ -23,13 +22,30 @@ from typing import Any, Dict, Optional, Type
 from crewai.tools.base_tool import BaseTool
 from pydantic import BaseModel, ConfigDict, Field
 
+from lumyn.llm_backends.response_cache import scoped_tool_run
 from lumyn.tools.linting.promql_linter import PromQLLinter
+from lumyn.utils.evidence_cache import EVIDENCE_PREFETCH, evidence_cache, with_evidence
+from lumyn.utils.incident_window import get_incident_window
 
+from .chunked_summary import split_prometheus_series, summarize_payload
+from .compact_encoding import COMPACT_ENCODING, COMPACT_ENCODING_TOKEN_BUDGET, encode_payload
+from .get_alerts import get_latest_alert_label_values
 from .grafana_base_client import GrafanaBaseClient
+from .metrics_summary import summarize_matrix
+from .prometheus_catalog import get_prometheus_catalog
+from .query_cost import QUERY_COST_PREFLIGHT, QueryPlan, plan_prometheus_query
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+NL2METRICS_RANGE_QUERY = os.getenv("NL2METRICS_RANGE_QUERY", "True") == "True"
+PROMETHEUS_RANGE_LOOKBACK = int(os.getenv("PROMETHEUS_RANGE_LOOKBACK", 1800))
+PROMETHEUS_RANGE_STEP = int(os.getenv("PROMETHEUS_RANGE_STEP", 15))
+PROMETHEUS_RANGE_MAX_POINTS = int(os.getenv("PROMETHEUS_RANGE_MAX_POINTS", 240))
+PROMETHEUS_METRIC_CATALOG = os.getenv("PROMETHEUS_METRIC_CATALOG", "True") == "True"
+PROMETHEUS_PROMPT_TOP_K_METRICS = int(os.getenv("PROMETHEUS_PROMPT_TOP_K_METRICS", 15))
+PROMQL_BLOCK = r"```promql\n(.*?)\n```"
+
 
 class NL2MetricsCustomToolInput(BaseModel):
     nl_query: str = Field(
@@ -44,19 +60,48 @@ class NL2MetricsCustomTool(GrafanaBaseClient, BaseTool):
         "Converts natural language to PromQL queries and execute them to access metrics from Prometheus via the Grafana API."
     )
     llm_backend: Any = None
+    range_query: bool = NL2METRICS_RANGE_QUERY
+    compact_encoding: bool = COMPACT_ENCODING
+    compact_token_budget: int = COMPACT_ENCODING_TOKEN_BUDGET
+    cost_preflight: bool = QUERY_COST_PREFLIGHT
+    prefetched_evidence: bool = EVIDENCE_PREFETCH
     args_schema: Type[BaseModel] = NL2MetricsCustomToolInput
 
+    @scoped_tool_run
     def _run(self, nl_query: str) -> str:
+        return with_evidence(self._prefetched(nl_query), self._run_live(nl_query))
+
+    def _run_live(self, nl_query: str) -> str:
         try:
             function_arguments = self._generate_promql_query(prompt=nl_query)
             lint_message = PromQLLinter.lint(function_arguments)
             if lint_message != function_arguments:
                 return lint_message
+            selector_message = self._validate_selectors(function_arguments)
+            if selector_message is not None:
+                return selector_message
+            start, end, step = self._range_window()
+            plan = self._plan_query(function_arguments, start, end, step if self.range_query else None)
+            if plan.sketch is not None:
+                return plan.sketch
+            if self.range_query:
+                metrics = self._query_prometheus_range_metrics(function_arguments, plan.start, plan.end, plan.step)
+                # Queries that cannot be range-evaluated (e.g. a bare range selector) fall back to an instant query.
+                if isinstance(metrics, dict):
+                    return plan.annotate(self._summarize_metrics(metrics))
+                # Evaluated at the end of the planned window so the answer still refers to the incident.
+                return self._summarize_metrics(self._query_prometheus_metrics(function_arguments, plan.end))
             return self._summarize_metrics(self._query_prometheus_metrics(function_arguments))
         except Exception as exc:
             logger.error(f"NL2Metrics Tool failed with: {exc}")
             return f"NL2Metrics Tool failed with: {exc}"
 
+    def _prefetched(self, nl_query: str) -> Optional[str]:
+        """Golden-signal series pre-fetched for the alerting entities the query names, if not served yet."""
+        if not self.prefetched_evidence:
+            return None
+        return evidence_cache.take("metrics", nl_query)
+
     def _generate_promql_query(self, prompt: str) -> str:
 
         with open(
@@ -66,20 +111,71 @@ class NL2MetricsCustomTool(GrafanaBaseClient, BaseTool):
 
         time_in_seconds = time.time()
         input = f"{prom_icl}\n\nWrite a promql query to do the following: {prompt}\n\nThe current time in seconds is {time_in_seconds}"
+        candidate_metrics = self._get_candidate_metrics(prompt)
+        if candidate_metrics:
+            input += f"\n\nThese metrics exist in Prometheus and look relevant, prefer them over inventing metric names:\n{candidate_metrics}"
         system_prompt = "You write PromQL queries. Answer with only the correct PromQL query. The formatting should always be like this: ```promql\n<promql query>\n```"
-        function_arguments = self.llm_backend.inference(system_prompt, input)
+        # Generation stops at the closing fence; anything the model would add after the query is never produced.
+        function_arguments = self.llm_backend.inference_until(system_prompt, input, PROMQL_BLOCK)
         logger.info(f"NL2Metrics Tool NL prompt received: {prompt}")
         logger.info(f"NL2Metrics Tool function arguments identified are: {function_arguments}")
         print(f"NL2Metrics Tool NL prompt received: {prompt}")
         print(f"NL2Metrics Tool function arguments identified are: {function_arguments}")
-        response = re.search(r"```promql\n(.*?)\n```", function_arguments, re.DOTALL).group(1).strip()
+        response = re.search(PROMQL_BLOCK, function_arguments, re.DOTALL).group(1).strip()
         return response
 
-    def _query_prometheus_metrics(self, query: str) -> Optional[Dict[str, Any]]:
+    def _get_candidate_metrics(self, prompt: str) -> str:
+        if not PROMETHEUS_METRIC_CATALOG:
+            return ""
+        try:
+            datasource_id = self.get_datasource_id("prometheus")
+            catalog = get_prometheus_catalog(self.grafana_url, datasource_id)
+            catalog.ensure_fresh(self, datasource_id)
+            return catalog.describe_candidates(prompt, get_latest_alert_label_values(),
+                                               limit=PROMETHEUS_PROMPT_TOP_K_METRICS)
+        except Exception as e:
+            logger.error(f"Error looking up Prometheus metric catalog: {str(e)}")
+            return ""
+
+    def _validate_selectors(self, query: str) -> Optional[str]:
+        if not PROMETHEUS_METRIC_CATALOG:
+            return None
+        try:
+            datasource_id = self.get_datasource_id("prometheus")
+            catalog = get_prometheus_catalog(self.grafana_url, datasource_id)
+            catalog.ensure_fresh(self, datasource_id)
+            return catalog.validate(self, datasource_id, query)
+        except Exception as e:
+            # Validation is best effort; the query still runs if the catalog is unavailable.
+            logger.error(f"Error validating PromQL selectors: {str(e)}")
+            return None
+
+    def _range_window(self):
+        start, end = get_incident_window(PROMETHEUS_RANGE_LOOKBACK)
+        return start, end, self._range_step(start, end)
+
+    def _range_step(self, start: float, end: float) -> int:
+        return max(PROMETHEUS_RANGE_STEP, int((end - start) / PROMETHEUS_RANGE_MAX_POINTS) + 1)
+
+    def _plan_query(self, query: str, start: float, end: float, step: Optional[float]) -> QueryPlan:
+        if not self.cost_preflight:
+            return QueryPlan(start, end, step)
+        try:
+            datasource_id = self.get_datasource_id("prometheus")
+            return plan_prometheus_query(self, datasource_id, query, start, end, step)
+        except Exception as e:
+            # The estimate is best effort; the query still runs as generated if it fails.
+            logger.error(f"Error estimating PromQL query cost: {str(e)}")
+            return QueryPlan(start, end, step)
+
+    def _query_prometheus_metrics(self, query: str,
+                                  evaluation_time: Optional[float] = None) -> Optional[Dict[str, Any]]:
         try:
             datasource_id = self.get_datasource_id("prometheus")
             url = f"{self.grafana_url}/api/datasources/proxy/uid/{datasource_id}/api/v1/query"
             params = {"query": query}
+            if evaluation_time is not None:
+                params["time"] = evaluation_time
 
             response = self._make_request("GET", url, params=params)
             logger.info(f"NL2Metrics Tool query prometheus metrics: {response.status_code}")
@@ -90,7 +186,37 @@ class NL2MetricsCustomTool(GrafanaBaseClient, BaseTool):
             logger.error(f"Error querying Prometheus metrics: {str(e)}")
             return f"Error querying Prometheus metrics: {str(e)}"
 
+    def _query_prometheus_range_metrics(self,
+                                        query: str,
+                                        start: Optional[float] = None,
+                                        end: Optional[float] = None,
+                                        step: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        try:
+            if start is None or end is None:
+                start, end = get_incident_window(PROMETHEUS_RANGE_LOOKBACK)
+            if step is None:
+                step = self._range_step(start, end)
+            datasource_id = self.get_datasource_id("prometheus")
+            url = f"{self.grafana_url}/api/datasources/proxy/uid/{datasource_id}/api/v1/query_range"
+            params = {"query": query, "start": start, "end": end, "step": step}
+
+            response = self._make_request("GET", url, params=params)
+            logger.info(f"NL2Metrics Tool query prometheus range metrics: {response.status_code}")
+            print(f"NL2Metrics Tool query prometheus range metrics: {response.status_code}")
+            return response.json()
+        except Exception as e:
+            print(f"Error querying Prometheus range metrics: {str(e)}")
+            logger.error(f"Error querying Prometheus range metrics: {str(e)}")
+            return f"Error querying Prometheus range metrics: {str(e)}"
+
     def _summarize_metrics(self, metrics):
+        if isinstance(metrics, dict) and metrics.get("data", {}).get("resultType") == "matrix":
+            system_prompt = "You do metrics analysis and summarization. You are given a table of per-series statistics (min, max, mean, p95, last value, slope per minute, step changes and gaps in the data) computed over a time window. Provide a brief summary and analysis of the trends and anomalies in them."
+            metrics_summary = self.llm_backend.inference(system_prompt, summarize_matrix(metrics["data"]["result"]))
+            return metrics_summary
         system_prompt = "You do metrics analysis and summarization. Look at the metrics given to you and provide a brief summary and analysis of them."
-        metrics_summary = self.llm_backend.inference(system_prompt, json.dumps(metrics))
+        if self.compact_encoding:
+            encoding = encode_payload(metrics, self.compact_token_budget)
+            return summarize_payload(self.llm_backend, system_prompt, encoding.render(), lambda _: encoding.parts())
+        metrics_summary = summarize_payload(self.llm_backend, system_prompt, metrics, split_prometheus_series)
         return metrics_summary
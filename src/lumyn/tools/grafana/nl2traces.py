@@ -22,16 +22,25 @@ from typing import Any, Dict, Optional, Type
 from crewai.tools.base_tool import BaseTool
 from pydantic import BaseModel, ConfigDict, Field
 
+from lumyn.llm_backends.response_cache import scoped_tool_run
 from lumyn.tools.linting.jaeger_linter import JaegerLinter
+from lumyn.utils.evidence_cache import EVIDENCE_PREFETCH, evidence_cache, with_evidence
 
+from .chunked_summary import split_jaeger_traces, summarize_payload
+from .compact_encoding import COMPACT_ENCODING, COMPACT_ENCODING_TOKEN_BUDGET, encode_payload
 from .custom_function_definitions_grafana import fd_query_jaeger_traces
 from .grafana_base_client import GrafanaBaseClient
+from .jaeger_catalog import get_jaeger_catalog
+from .trace_analytics import summarize_traces
 
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+NL2TRACES_BATCH_MODE = os.getenv("NL2TRACES_BATCH_MODE", "True") == "True"
+NL2TRACES_BATCH_LIMIT = int(os.getenv("NL2TRACES_BATCH_LIMIT", 200))
+
 
 class NL2TracesCustomToolInput(BaseModel):
     nl_query: str = Field(
@@ -49,23 +58,41 @@ class NL2TracesCustomTool(GrafanaBaseClient, BaseTool):
         "Take in a natural language query or utterance and turn it into function arguments. This tool is for gathering traces from jaeger."
     )
     llm_backend: Any = None
+    batch_mode: bool = NL2TRACES_BATCH_MODE
+    batch_limit: int = NL2TRACES_BATCH_LIMIT
+    compact_encoding: bool = COMPACT_ENCODING
+    compact_token_budget: int = COMPACT_ENCODING_TOKEN_BUDGET
+    prefetched_evidence: bool = EVIDENCE_PREFETCH
     args_schema: Type[BaseModel] = NL2TracesCustomToolInput
 
+    @scoped_tool_run
     def _run(self, nl_query: str) -> str:
+        return with_evidence(self._prefetched(nl_query), self._run_live(nl_query))
+
+    def _run_live(self, nl_query: str) -> str:
         try:
             function_name, function_arguments, current_time = self._generate_jaeger_query(
                 prompt=nl_query)
-            services = self._get_services()
-            operations = self._get_operations(function_arguments['service'])
+            services, operations = self._get_services_and_operations(function_arguments['service'])
             lint_message = JaegerLinter().lint(function_arguments, services,
                                                operations, current_time)
             if lint_message != function_arguments:
                 return lint_message
+            if self.batch_mode:
+                # The linter bounds what the LLM may ask for; batch mode deliberately pulls far more and aggregates locally.
+                traces = self._query_jaeger_traces(**{**function_arguments, "limit": self.batch_limit})
+                return self._summarize_trace_batch(traces)
             return self._summarize_traces(self._query_jaeger_traces(**function_arguments))
         except Exception as exc:
             logger.error(f"NL2Traces Tool failed with: {exc}")
             return f"NL2Traces Tool failed with: {exc}"
 
+    def _prefetched(self, nl_query: str) -> Optional[str]:
+        """Error-trace aggregates pre-fetched for the alerting services the query names, if not served yet."""
+        if not self.prefetched_evidence:
+            return None
+        return evidence_cache.take("traces", nl_query)
+
     def _generate_jaeger_query(self, prompt: str) -> str:
 
         with open(
@@ -106,7 +133,7 @@ class NL2TracesCustomTool(GrafanaBaseClient, BaseTool):
                     "operation": operation,
                     "start": start_time,
                     "end": end_time,
-                    "limit": 1,
+                    "limit": limit,
                     "tags": json.dumps({"error": "true"})
                 }
             else:
@@ -115,19 +142,20 @@ class NL2TracesCustomTool(GrafanaBaseClient, BaseTool):
                     "operation": operation,
                     "start": start_time,
                     "end": end_time,
-                    "limit": 1
+                    "limit": limit
                 }
             response = self._make_request("GET", url, params=params)
             logger.info(
                 f"NL2Traces Tool query Jaeger traces: {response.status_code}"
             )
-            logger.info(
-                f"NL2Traces Tool query Jaeger traces: {response.content}")
             print(
                 f"NL2Traces Tool query Jaeger traces: {response.status_code}"
             )
-            print(
-                f"NL2Traces Tool query Jaeger traces: {response.content}")
+            if limit <= 10:
+                logger.info(
+                    f"NL2Traces Tool query Jaeger traces: {response.content}")
+                print(
+                    f"NL2Traces Tool query Jaeger traces: {response.content}")
             return response.json()
         except Exception as e:
             print(f"Error querying Jaeger traces: {str(e)}")
@@ -136,9 +164,27 @@ class NL2TracesCustomTool(GrafanaBaseClient, BaseTool):
         
     def _summarize_traces(self, traces):
         system_prompt = "You do trace analysis and summarization. Look at the traces given to you and provide a brief summary and analysis of them."
-        traces_summary = self.llm_backend.inference(system_prompt, json.dumps(traces))
+        if self.compact_encoding:
+            encoding = encode_payload(traces, self.compact_token_budget)
+            return summarize_payload(self.llm_backend, system_prompt, encoding.render(), lambda _: encoding.parts())
+        traces_summary = summarize_payload(self.llm_backend, system_prompt, traces, split_jaeger_traces)
         return traces_summary
         
+    def _summarize_trace_batch(self, traces):
+        if not isinstance(traces, dict):
+            return traces
+        system_prompt = "You do trace analysis and summarization. You are given latency percentiles, error rates and critical path shares aggregated over a batch of traces, per caller -> callee edge and per operation. Provide a brief summary and analysis of them, pointing out the edges and operations most likely responsible for errors or latency."
+        traces_summary = self.llm_backend.inference(system_prompt, summarize_traces(traces.get("data") or []))
+        return traces_summary
+
+    def _get_services_and_operations(self, service):
+        try:
+            datasource_id = self.get_datasource_id("jaeger")
+            return get_jaeger_catalog(self.grafana_url, datasource_id).lookup(self, datasource_id, service)
+        except Exception as e:
+            logger.error(f"Error reading Jaeger catalog, querying directly: {str(e)}")
+            return self._get_services(), self._get_operations(service)
+
     def _get_services(self):
         try:
             datasource_id = self.get_datasource_id("jaeger")
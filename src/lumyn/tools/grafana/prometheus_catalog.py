@@ -0,0 +1,194 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from lumyn.tools.linting.promql_selectors import extract_vector_selectors
+from lumyn.utils.incident_window import get_incident_window
+
+from .grafana_base_client import GrafanaBaseClient, GrafanaRequest
+from .label_index import trigrams, word_tokens
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_CATALOG_TTL = float(os.getenv("PROMETHEUS_CATALOG_TTL", 600))
+
+# Words that show up in NL metric requests but say nothing about which metric is meant.
+STOP_WORDS = {
+    "the", "of", "a", "an", "in", "on", "for", "over", "last", "get", "show", "what", "is", "are", "by", "and", "to",
+    "from", "with", "currently", "current", "called", "namespace", "minutes", "minute", "hour", "hours", "seconds"
+}
+# Suffixes Prometheus appends to histogram/summary series that share the base metric's metadata.
+METADATA_SUFFIXES = ("_bucket", "_sum", "_count", "_total", "_created")
+
+
+class PrometheusMetricCatalog:
+    """Cached metric names, metadata and per-metric label names for one Prometheus datasource."""
+
+    def __init__(self, ttl: float = PROMETHEUS_CATALOG_TTL):
+        self.ttl = ttl
+        self.metric_names: List[str] = []
+        self.metadata: Dict[str, Dict[str, str]] = {}
+        self._metric_labels: Dict[str, Set[str]] = {}
+        self._trigram_postings: Dict[str, List[int]] = {}
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def ensure_fresh(self, client: GrafanaBaseClient, datasource_id: str):
+        with self._lock:
+            if time.monotonic() >= self._expires_at:
+                self._refresh(client, datasource_id)
+
+    def _refresh(self, client: GrafanaBaseClient, datasource_id: str):
+        base_url = f"{client.grafana_url}/api/datasources/proxy/uid/{datasource_id}/api/v1"
+        names, metadata = client._gather_requests([
+            GrafanaRequest("GET", f"{base_url}/label/__name__/values"),
+            GrafanaRequest("GET", f"{base_url}/metadata"),
+        ])
+        if isinstance(names, Exception):
+            # Keep serving the previous catalog; retry on the next call.
+            logger.error(f"Error fetching Prometheus metric names: {str(names)}")
+            return
+        self.metric_names = sorted(names.get("data") or [])
+        if isinstance(metadata, Exception):
+            logger.error(f"Error fetching Prometheus metadata: {str(metadata)}")
+        else:
+            self.metadata = {name: entries[0] for name, entries in (metadata.get("data") or {}).items() if entries}
+        postings = defaultdict(list)
+        for position, name in enumerate(self.metric_names):
+            # Index the words of the name (split on _ and :) so word boundaries line up with NL query words.
+            for trigram in set().union(*(trigrams(word) for word in word_tokens(name))):
+                postings[trigram].append(position)
+        self._trigram_postings = dict(postings)
+        self._metric_labels = {}
+        self._expires_at = time.monotonic() + self.ttl
+        logger.info(f"PrometheusMetricCatalog refreshed {len(self.metric_names)} metrics")
+
+    def __contains__(self, metric: str) -> bool:
+        position = bisect.bisect_left(self.metric_names, metric)
+        return position < len(self.metric_names) and self.metric_names[position] == metric
+
+    def prefix_search(self, prefix: str, limit: int = 20) -> List[str]:
+        start = bisect.bisect_left(self.metric_names, prefix)
+        matches = []
+        for name in self.metric_names[start:]:
+            if not name.startswith(prefix) or len(matches) >= limit:
+                break
+            matches.append(name)
+        return matches
+
+    def get_metadata(self, metric: str) -> Optional[Dict[str, str]]:
+        if metric in self.metadata:
+            return self.metadata[metric]
+        for suffix in METADATA_SUFFIXES:
+            if metric.endswith(suffix) and metric[:-len(suffix)] in self.metadata:
+                return self.metadata[metric[:-len(suffix)]]
+        return None
+
+    def search(self, text: str, limit: int = 15) -> List[str]:
+        """Rank metric names against free text by per-word trigram coverage, plus prefix hits for metric-like words."""
+        scores: Dict[int, float] = defaultdict(float)
+        for word in word_tokens(text) - STOP_WORDS:
+            if len(word) < 3:
+                continue
+            word_trigrams = trigrams(word)
+            overlaps: Dict[int, int] = defaultdict(int)
+            for trigram in word_trigrams:
+                for position in self._trigram_postings.get(trigram, ()):
+                    overlaps[position] += 1
+            for position, overlap in overlaps.items():
+                coverage = overlap / len(word_trigrams)
+                if coverage >= 0.6:
+                    scores[position] += coverage
+        for word in text.split():
+            if "_" in word:
+                for name in self.prefix_search(word.strip("`'\",.")):
+                    scores[bisect.bisect_left(self.metric_names, name)] += 2.0
+        ranked = sorted(scores, key=lambda position: (-scores[position], len(self.metric_names[position])))
+        return [self.metric_names[position] for position in ranked[:limit]]
+
+    def describe_candidates(self, text: str, context_terms: Iterable[str] = (), limit: int = 15) -> str:
+        lines = []
+        for name in self.search(" ".join([text, *context_terms]), limit=limit):
+            metadata = self.get_metadata(name)
+            if metadata:
+                lines.append(f"{name} ({metadata.get('type', 'unknown')}): {metadata.get('help', '')}")
+            else:
+                lines.append(name)
+        return "\n".join(lines)
+
+    def get_label_names(self, client: GrafanaBaseClient, datasource_id: str,
+                        metrics: Iterable[str]) -> Dict[str, Set[str]]:
+        """Label names per metric, fetching the ones not cached yet concurrently."""
+        with self._lock:
+            missing = [metric for metric in set(metrics) if metric not in self._metric_labels]
+        if missing:
+            base_url = f"{client.grafana_url}/api/datasources/proxy/uid/{datasource_id}/api/v1"
+            start, end = get_incident_window()
+            results = client._gather_requests([
+                GrafanaRequest("GET", f"{base_url}/labels", {"match[]": metric, "start": start, "end": end})
+                for metric in missing
+            ])
+            with self._lock:
+                for metric, result in zip(missing, results):
+                    if isinstance(result, Exception):
+                        logger.error(f"Error fetching Prometheus labels for {metric}: {str(result)}")
+                        continue
+                    self._metric_labels[metric] = set(result.get("data") or [])
+        with self._lock:
+            return {metric: self._metric_labels[metric] for metric in metrics if metric in self._metric_labels}
+
+    def validate(self, client: GrafanaBaseClient, datasource_id: str, query: str) -> Optional[str]:
+        """Check the query's selectors against the catalog; returns a lint message or None when they look valid."""
+        if not self.metric_names:
+            return None
+        messages = []
+        selectors = extract_vector_selectors(query)
+        known_metrics = [selector.metric for selector in selectors if selector.metric and selector.metric in self]
+        for selector in selectors:
+            if selector.metric and selector.metric not in self:
+                suggestions = self.search(selector.metric.replace("_", " "), limit=5)
+                messages.append(f"Unknown metric {selector.metric}. Similar existing metrics are {suggestions}.")
+        label_names = self.get_label_names(client, datasource_id, known_metrics)
+        for selector in selectors:
+            labels = label_names.get(selector.metric)
+            if not labels:
+                continue
+            for label, _, _ in selector.matchers:
+                if label != "__name__" and label not in labels:
+                    messages.append(
+                        f"Label {label} does not exist on metric {selector.metric}. Valid labels are {sorted(labels)}."
+                    )
+        if messages:
+            return "Invalid PromQL Query: " + " ".join(messages)
+        return None
+
+
+_catalogs: Dict[Tuple[str, str], PrometheusMetricCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_prometheus_catalog(grafana_url: str, datasource_id: str) -> PrometheusMetricCatalog:
+    with _catalogs_lock:
+        return _catalogs.setdefault((grafana_url, datasource_id), PrometheusMetricCatalog())
@@ -0,0 +1,194 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+import math
+import os
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from lumyn.tools.linting.promql_selectors import extract_vector_selectors
+
+from .grafana_base_client import GrafanaBaseClient, GrafanaRequest
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+QUERY_COST_PREFLIGHT = os.getenv("QUERY_COST_PREFLIGHT", "True") == "True"
+# Bytes of log data a LogQL query may scan, as reported by Loki's index stats.
+LOKI_MAX_QUERY_BYTES = int(os.getenv("LOKI_MAX_QUERY_BYTES", 1024 * 1024 * 1024))
+# Narrowing a LogQL window below this is not worth it; a sketch is returned instead.
+LOKI_MIN_WINDOW_SECONDS = int(os.getenv("LOKI_MIN_WINDOW_SECONDS", 60))
+PROMETHEUS_MAX_SERIES = int(os.getenv("PROMETHEUS_MAX_SERIES", 5000))
+# Series times steps a range query may return.
+PROMETHEUS_MAX_POINTS = int(os.getenv("PROMETHEUS_MAX_POINTS", 500000))
+# Raising the step stops at this many points per series; past that the range is narrowed instead.
+PROMETHEUS_MIN_STEPS = int(os.getenv("PROMETHEUS_MIN_STEPS", 30))
+SKETCH_TOP_VALUES = 5
+
+
+class QueryPlan(NamedTuple):
+    """What to run after the pre-flight check: the (possibly narrowed) window and step, or a sketch instead."""
+    start: Any
+    end: Any
+    step: Any = None
+    note: Optional[str] = None
+    sketch: Optional[str] = None
+
+    def annotate(self, output: Any) -> Any:
+        """Prefix the tool output with what the pre-flight check changed, if anything."""
+        if self.note and isinstance(output, str):
+            return f"{self.note}\n{output}"
+        return output
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TiB"
+
+
+def _label_cardinalities(series: List[Dict[str, str]], complete: bool = True) -> str:
+    values: Dict[str, Counter] = defaultdict(Counter)
+    for labels in series:
+        for label, value in labels.items():
+            values[label][value] += 1
+    lines = []
+    for label, counts in sorted(values.items(), key=lambda item: -len(item[1])):
+        top = ", ".join(f"{value} ({count})" for value, count in counts.most_common(SKETCH_TOP_VALUES))
+        lines.append(f"{label}: {len(counts)}{'' if complete else '+'} values, most common {top}")
+    return "\n".join(lines)
+
+
+def stream_selectors(query: str) -> List[str]:
+    """The `{...}` stream selectors of a LogQL query; line filters and parsers are skipped like PromQL strings."""
+    return [selector.text for selector in extract_vector_selectors(query) if selector.text.startswith("{")]
+
+
+def plan_loki_query(client: GrafanaBaseClient,
+                    datasource_id: str,
+                    query: str,
+                    start_ns: int,
+                    end_ns: int,
+                    max_bytes: int = LOKI_MAX_QUERY_BYTES) -> QueryPlan:
+    """Estimate a LogQL query's scan size from /index/stats and keep it under max_bytes.
+
+    Over budget, the window is narrowed to its most recent part in proportion; if that would leave less than
+    LOKI_MIN_WINDOW_SECONDS, the query is not run and a sketch of the matched streams is returned instead.
+    """
+    plan = QueryPlan(start_ns, end_ns)
+    selectors = stream_selectors(query)
+    if not selectors:
+        return plan
+    base_url = f"{client.grafana_url}/api/datasources/proxy/uid/{datasource_id}/loki/api/v1"
+    results = client._gather_requests([
+        GrafanaRequest("GET", f"{base_url}/index/stats", {"query": selector, "start": start_ns, "end": end_ns})
+        for selector in selectors
+    ])
+    totals = Counter()
+    for selector, result in zip(selectors, results):
+        if isinstance(result, Exception):
+            # Older Loki versions lack index stats; the estimate is best effort.
+            logger.error(f"Error estimating Loki query cost for {selector}: {str(result)}")
+            return plan
+        for key in ("streams", "chunks", "entries", "bytes"):
+            totals[key] += result.get(key) or 0
+    logger.info(f"Loki query cost estimate for {query}: {dict(totals)}")
+    if totals["bytes"] <= max_bytes:
+        return plan
+
+    estimate = f"~{_format_bytes(totals['bytes'])} in {totals['streams']} streams ({totals['entries']} entries)"
+    window_ns = int((end_ns - start_ns) * max_bytes / totals["bytes"])
+    if window_ns >= LOKI_MIN_WINDOW_SECONDS * 1e9:
+        note = (f"Note: the query would scan {estimate}, over the {_format_bytes(max_bytes)} budget, so only the "
+                f"last {window_ns / 1e9:.0f}s of the requested {(end_ns - start_ns) / 1e9:.0f}s window were queried.")
+        return QueryPlan(end_ns - window_ns, end_ns, note=note)
+
+    # A short recent window keeps the sketch's own /series call cheap.
+    sketch_start = end_ns - int(LOKI_MIN_WINDOW_SECONDS * 1e9)
+    series = client._gather_requests([
+        GrafanaRequest("GET", f"{base_url}/series", {"match[]": selector, "start": sketch_start, "end": end_ns})
+        for selector in selectors
+    ])
+    streams = [labels for result in series if not isinstance(result, Exception) for labels in result.get("data") or []]
+    sketch = (f"The LogQL query {query} was not run: it would scan {estimate}, far over the "
+              f"{_format_bytes(max_bytes)} budget. Use a more specific stream selector or a shorter time range. "
+              f"Labels of the streams it matched in the last {LOKI_MIN_WINDOW_SECONDS}s:\n"
+              f"{_label_cardinalities(streams) or 'none'}")
+    return QueryPlan(start_ns, end_ns, sketch=sketch)
+
+
+def plan_prometheus_query(client: GrafanaBaseClient,
+                          datasource_id: str,
+                          query: str,
+                          start: float,
+                          end: float,
+                          step: Optional[float] = None,
+                          max_series: int = PROMETHEUS_MAX_SERIES,
+                          max_points: int = PROMETHEUS_MAX_POINTS) -> QueryPlan:
+    """Count the series a PromQL query selects via /api/v1/series and keep it within budget.
+
+    Too many series returns a sketch of their label cardinalities instead. A range query (step given) whose
+    returned series times steps exceed max_points gets a larger step, down to PROMETHEUS_MIN_STEPS points per
+    series, and then a narrower window ending at `end`. Series selected inside an aggregation are not counted as
+    returned, so an aggregated query is never coarsened.
+    """
+    plan = QueryPlan(start, end, step)
+    selectors = extract_vector_selectors(query)
+    if not selectors:
+        return plan
+    base_url = f"{client.grafana_url}/api/datasources/proxy/uid/{datasource_id}/api/v1"
+    # `limit` bounds the response on Prometheus versions that support it; older ones ignore it.
+    results = client._gather_requests([
+        GrafanaRequest("GET", f"{base_url}/series", {"match[]": selector.text, "start": start, "end": end,
+                                                     "limit": max_series + 1})
+        for selector in selectors
+    ])
+    series, returned = [], 0
+    for selector, result in zip(selectors, results):
+        if isinstance(result, Exception):
+            logger.error(f"Error estimating Prometheus query cost for {selector.text}: {str(result)}")
+            return plan
+        series.extend(result.get("data") or [])
+        if not selector.aggregated:
+            returned += len(result.get("data") or [])
+    logger.info(f"Prometheus query cost estimate for {query}: {len(series)} series, {returned} returned as is")
+    if len(series) > max_series:
+        advice = ("Add label matchers or aggregate, e.g. with sum by (...)." if returned else
+                  "The query already aggregates them; add label matchers to select fewer series.")
+        sketch = (f"The PromQL query {query} was not run: it selects more than {max_series} series. {advice} "
+                  f"Label cardinalities of the selected series:\n"
+                  f"{_label_cardinalities(series, complete=False)}")
+        return QueryPlan(start, end, step, sketch=sketch)
+    if step is None or not returned:
+        return plan
+
+    window = end - start
+    if returned * window / step <= max_points:
+        return plan
+    new_step = math.ceil(returned * window / max_points)
+    if window / new_step >= PROMETHEUS_MIN_STEPS:
+        note = (f"Note: {returned} series over {window:.0f}s would return too many points, so the step was "
+                f"raised from {step:g}s to {new_step}s.")
+        return QueryPlan(start, end, new_step, note=note)
+    new_step = max(step, math.floor(window / PROMETHEUS_MIN_STEPS))
+    new_window = max_points * new_step / returned
+    note = (f"Note: {returned} series over {window:.0f}s would return too many points, so only the last "
+            f"{new_window:.0f}s were queried with a {new_step}s step.")
+    return QueryPlan(end - new_window, end, new_step, note=note)
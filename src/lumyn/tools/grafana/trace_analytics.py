@@ -0,0 +1,210 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def is_error_span(span: Dict[str, Any]) -> bool:
+    for tag in span.get("tags") or []:
+        key, value = tag.get("key"), tag.get("value")
+        if key == "error" and value in (True, "true"):
+            return True
+        if key == "otel.status_code" and value == "ERROR":
+            return True
+        if key in ("http.status_code", "http.response.status_code"):
+            try:
+                if int(value) >= 500:
+                    return True
+            except (TypeError, ValueError):
+                pass
+    return False
+
+
+class SpanTable:
+    """Spans of many Jaeger traces flattened into column arrays."""
+
+    def __init__(self, traces: List[Dict[str, Any]]):
+        services: Dict[str, int] = {}
+        operations: Dict[Tuple[int, str], int] = {}
+        trace_index, service, operation, start, duration, error, parent = [], [], [], [], [], [], []
+
+        for trace_number, trace in enumerate(traces):
+            processes = trace.get("processes") or {}
+            spans = trace.get("spans") or []
+            row_of_span = {span["spanID"]: len(trace_index) + offset for offset, span in enumerate(spans)}
+            for span in spans:
+                service_name = (processes.get(span.get("processID")) or {}).get("serviceName", "unknown")
+                service_code = services.setdefault(service_name, len(services))
+                operation_code = operations.setdefault((service_code, span.get("operationName", "")),
+                                                       len(operations))
+                parent_row = -1
+                for reference in span.get("references") or []:
+                    if reference.get("spanID") in row_of_span:
+                        parent_row = row_of_span[reference["spanID"]]
+                        if reference.get("refType") == "CHILD_OF":
+                            break
+                trace_index.append(trace_number)
+                service.append(service_code)
+                operation.append(operation_code)
+                start.append(span.get("startTime", 0))
+                duration.append(span.get("duration", 0))
+                error.append(is_error_span(span))
+                parent.append(parent_row)
+
+        self.service_names = list(services)
+        self.operation_keys = list(operations)
+        self.trace_count = len(traces)
+        self.trace_index = np.array(trace_index, dtype=np.int64)
+        self.service = np.array(service, dtype=np.int64)
+        self.operation = np.array(operation, dtype=np.int64)
+        self.start = np.array(start, dtype=np.float64)
+        self.duration = np.array(duration, dtype=np.float64)
+        self.end = self.start + self.duration
+        self.error = np.array(error, dtype=bool)
+        self.parent = np.array(parent, dtype=np.int64)
+        self.critical_time = self._critical_path_time()
+
+    def __len__(self) -> int:
+        return self.trace_index.size
+
+    def trace_durations(self) -> np.ndarray:
+        """Wall-clock span of each trace (earliest start to latest end)."""
+        if not len(self):
+            return np.zeros(0)
+        first = np.full(self.trace_count, np.inf)
+        last = np.full(self.trace_count, -np.inf)
+        np.minimum.at(first, self.trace_index, self.start)
+        np.maximum.at(last, self.trace_index, self.end)
+        return np.where(np.isfinite(first), last - first, 0.0)
+
+    def _critical_path_time(self) -> np.ndarray:
+        """Time each span spends on its trace's critical path, excluding time covered by its critical children.
+
+        Walks each span's children from the latest-finishing one backwards, the same way the Jaeger UI does.
+        """
+        critical = np.zeros(len(self))
+        children: Dict[int, List[int]] = {}
+        for row in np.nonzero(self.parent >= 0)[0]:
+            children.setdefault(int(self.parent[row]), []).append(int(row))
+        roots = np.nonzero(self.parent < 0)[0]
+
+        stack = [(int(root), float(self.end[root])) for root in roots]
+        while stack:
+            row, end_bound = stack.pop()
+            span_start = self.start[row]
+            cursor = min(self.end[row], end_bound)
+            for child in sorted(children.get(row, []), key=lambda child: self.end[child], reverse=True):
+                if self.start[child] >= cursor:
+                    continue
+                child_end = min(self.end[child], cursor)
+                critical[row] += cursor - child_end
+                stack.append((child, child_end))
+                cursor = max(self.start[child], span_start)
+                if cursor <= span_start:
+                    break
+            critical[row] += max(cursor - span_start, 0.0)
+        return critical
+
+
+def _group_statistics(groups: np.ndarray, durations: np.ndarray, errors: np.ndarray, critical: np.ndarray,
+                      group_count: int, total_trace_time: float) -> Dict[str, np.ndarray]:
+    counts = np.bincount(groups, minlength=group_count)
+    order = np.lexsort((durations, groups))
+    sorted_durations = durations[order]
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    statistics = {"count": counts}
+    for percentile in PERCENTILES:
+        # Linear interpolation between closest ranks, per group, without looping over groups.
+        position = offsets + np.maximum(counts - 1, 0) * percentile
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(np.ceil(position).astype(np.int64), np.maximum(offsets + counts - 1, 0))
+        fraction = position - lower
+        values = np.zeros(group_count)
+        present = counts > 0
+        values[present] = (sorted_durations[lower[present]] * (1 - fraction[present]) +
+                           sorted_durations[upper[present]] * fraction[present])
+        statistics[f"p{int(percentile * 100)}"] = values
+    statistics["error_rate"] = np.bincount(groups, weights=errors.astype(np.float64),
+                                           minlength=group_count) / np.maximum(counts, 1)
+    statistics["critical_share"] = np.bincount(groups, weights=critical,
+                                               minlength=group_count) / max(total_trace_time, 1e-9)
+    return statistics
+
+
+def _format_microseconds(value: float) -> str:
+    return f"{value / 1000:.1f}ms"
+
+
+def _render_rows(title: str, names: List[str], statistics: Dict[str, np.ndarray], max_rows: int) -> List[str]:
+    lines = [title, "name | count | p50 | p95 | p99 | error_rate | critical_path_share"]
+    # Erroring and critical-path-heavy groups first so truncation keeps them.
+    order = np.lexsort((-statistics["p99"], -statistics["critical_share"], -statistics["error_rate"]))
+    for row in order[:max_rows]:
+        lines.append(" | ".join([
+            names[row],
+            f"{statistics['count'][row]}",
+            _format_microseconds(statistics["p50"][row]),
+            _format_microseconds(statistics["p95"][row]),
+            _format_microseconds(statistics["p99"][row]),
+            f"{statistics['error_rate'][row]:.1%}",
+            f"{statistics['critical_share'][row]:.1%}",
+        ]))
+    if len(order) > max_rows:
+        lines.append(f"... {len(order) - max_rows} more omitted")
+    return lines
+
+
+def summarize_traces(traces: List[Dict[str, Any]], max_rows: int = 30) -> str:
+    """Aggregate a batch of Jaeger traces into per-edge and per-operation latency/error/critical-path tables."""
+    table = SpanTable(traces)
+    if not len(table):
+        return "No traces returned for the query."
+    trace_durations = table.trace_durations()
+    total_trace_time = float(trace_durations.sum())
+    trace_errors = np.zeros(table.trace_count, dtype=bool)
+    np.logical_or.at(trace_errors, table.trace_index, table.error)
+
+    lines = [
+        f"{table.trace_count} traces, {len(table)} spans, {int(trace_errors.sum())} traces with errors, "
+        f"trace duration p50 {_format_microseconds(np.percentile(trace_durations, 50))} "
+        f"p95 {_format_microseconds(np.percentile(trace_durations, 95))} "
+        f"p99 {_format_microseconds(np.percentile(trace_durations, 99))}",
+    ]
+
+    has_parent = table.parent >= 0
+    parent_service = np.where(has_parent, table.service[np.maximum(table.parent, 0)], -1)
+    cross_service = has_parent & (parent_service != table.service)
+    if cross_service.any():
+        edge_pairs = np.stack([parent_service[cross_service], table.service[cross_service]], axis=1)
+        unique_edges, edge_groups = np.unique(edge_pairs, axis=0, return_inverse=True)
+        edge_groups = edge_groups.reshape(-1)
+        edge_statistics = _group_statistics(edge_groups, table.duration[cross_service], table.error[cross_service],
+                                            table.critical_time[cross_service], len(unique_edges),
+                                            total_trace_time)
+        edge_names = [f"{table.service_names[caller]} -> {table.service_names[callee]}"
+                      for caller, callee in unique_edges]
+        lines += _render_rows("Caller -> callee edges (callee span latency):", edge_names, edge_statistics,
+                              max_rows)
+
+    operation_statistics = _group_statistics(table.operation, table.duration, table.error, table.critical_time,
+                                             len(table.operation_keys), total_trace_time)
+    operation_names = [f"{table.service_names[service]}: {operation}" for service, operation in table.operation_keys]
+    lines += _render_rows("Operations:", operation_names, operation_statistics, max_rows)
+    return "\n".join(lines)
@@ -0,0 +1,138 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import selectors
+import signal
+import subprocess
+import time
+from typing import NamedTuple, Optional
+
+from lumyn.utils.incident_window import get_incident_window
+
+from .kubectl_command import parse_kubectl_command
+
+KUBECTL_TIMEOUT = float(os.getenv("KUBECTL_TIMEOUT", 60))
+KUBECTL_MAX_OUTPUT_BYTES = int(os.getenv("KUBECTL_MAX_OUTPUT_BYTES", 1024 * 1024))
+KUBECTL_MAX_OUTPUT_LINES = int(os.getenv("KUBECTL_MAX_OUTPUT_LINES", 5000))
+KUBECTL_LOGS_TAIL = int(os.getenv("KUBECTL_LOGS_TAIL", 500))
+# How far before the alert start `kubectl logs` looks when the model did not say.
+KUBECTL_LOGS_LOOKBACK_SECONDS = int(os.getenv("KUBECTL_LOGS_LOOKBACK_SECONDS", 600))
+STDERR_MAX_BYTES = 64 * 1024
+READ_CHUNK_BYTES = 64 * 1024
+
+
+class BoundedResult(NamedTuple):
+    stdout: str
+    stderr: str
+    returncode: Optional[int]
+    # Why output was cut short ("timeout", "byte budget", "line budget"), or None if it ran to completion.
+    truncated: Optional[str]
+
+
+def truncation_notice(reason: str) -> str:
+    return f"\n... [output truncated: {reason} reached]"
+
+
+def bound_logs_command(command: str) -> str:
+    """Add --since (anchored before the alert start) and --tail to `kubectl logs` when the model left them out."""
+    parsed = parse_kubectl_command(command)
+    if parsed is None or parsed.verb != "logs" or parsed.unknown_flags:
+        return command
+    if parsed.since is None:
+        start, end = get_incident_window(KUBECTL_LOGS_LOOKBACK_SECONDS)
+        parsed.since = f"{int(end - start)}s"
+    if parsed.tail is None:
+        parsed.tail = KUBECTL_LOGS_TAIL
+    return parsed.to_command()
+
+
+def bound_output(text: str, max_bytes: int = KUBECTL_MAX_OUTPUT_BYTES,
+                 max_lines: int = KUBECTL_MAX_OUTPUT_LINES) -> BoundedResult:
+    """Apply the subprocess output budget to text produced some other way (the in-process API path)."""
+    truncated = None
+    encoded = text.encode()
+    if len(encoded) > max_bytes:
+        text = encoded[:max_bytes].decode(errors="ignore")
+        truncated = "byte budget"
+    lines = text.split("\n")
+    if len(lines) > max_lines:
+        text = "\n".join(lines[:max_lines])
+        truncated = "line budget"
+    return BoundedResult(text, "", 0, truncated)
+
+
+def run_bounded(command: str, timeout: float = KUBECTL_TIMEOUT, max_bytes: int = KUBECTL_MAX_OUTPUT_BYTES,
+                max_lines: int = KUBECTL_MAX_OUTPUT_LINES) -> BoundedResult:
+    """Run a shell command, reading stdout incrementally; kill it at the deadline or once the budget is spent."""
+    process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               start_new_session=True)
+    deadline = time.monotonic() + timeout
+    stdout, stderr = bytearray(), bytearray()
+    line_count = 0
+    truncated = None
+
+    selector = selectors.DefaultSelector()
+    selector.register(process.stdout, selectors.EVENT_READ, "stdout")
+    selector.register(process.stderr, selectors.EVENT_READ, "stderr")
+    try:
+        while selector.get_map() and truncated is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                truncated = "timeout"
+                break
+            for key, _ in selector.select(timeout=remaining):
+                chunk = os.read(key.fileobj.fileno(), READ_CHUNK_BYTES)
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                    continue
+                if key.data == "stderr":
+                    stderr += chunk[:max(STDERR_MAX_BYTES - len(stderr), 0)]
+                    continue
+                if line_count >= max_lines:
+                    truncated = "line budget"
+                    break
+                room = max_bytes - len(stdout)
+                if len(chunk) > room:
+                    chunk = chunk[:room]
+                    truncated = "byte budget"
+                chunk_lines = chunk.count(b"\n")
+                needed = max_lines - line_count
+                if chunk_lines > needed or (chunk_lines == needed and not chunk.endswith(b"\n")):
+                    # Keep exactly max_lines complete lines.
+                    cut = -1
+                    for _ in range(needed):
+                        cut = chunk.index(b"\n", cut + 1)
+                    chunk = chunk[:cut + 1]
+                    chunk_lines = needed
+                    truncated = "line budget"
+                stdout += chunk
+                line_count += chunk_lines
+                if truncated:
+                    break
+    finally:
+        selector.close()
+        if truncated is not None and process.poll() is None:
+            # The shell may have spawned a pipeline; take down the whole session.
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        process.stdout.close()
+        process.stderr.close()
+        returncode = process.wait()
+
+    return BoundedResult(stdout.decode(errors="replace"), stderr.decode(errors="replace"),
+                         None if truncated == "timeout" else returncode, truncated)
@@ -0,0 +1,313 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+INFORMER_ENABLED = os.getenv("INFORMER_ENABLED", "True") == "True"
+INFORMER_KINDS = set(os.getenv(
+    "INFORMER_KINDS", "Pod,Deployment,ReplicaSet,StatefulSet,DaemonSet,Service,Endpoints,Event").split(","))
+# Reads are only answered from memory when the watch has heard from the API server within this many seconds.
+INFORMER_MAX_STALENESS = float(os.getenv("INFORMER_MAX_STALENESS", 60))
+INFORMER_SYNC_TIMEOUT = float(os.getenv("INFORMER_SYNC_TIMEOUT", 10))
+INFORMER_WATCH_TIMEOUT = int(os.getenv("INFORMER_WATCH_TIMEOUT", 30))
+INFORMER_RETRY_BACKOFF = float(os.getenv("INFORMER_RETRY_BACKOFF", 2))
+
+ObjectKey = Tuple[str, str]
+
+
+def parse_equality_selector(selector: Optional[str]) -> Optional[List[str]]:
+    """`a=b,c==d` as ["a=b", "c=d"]; None for set-based or negated selectors the indexes cannot answer."""
+    if not selector:
+        return []
+    terms = []
+    for term in selector.split(","):
+        if "!=" in term or "(" in term or "=" not in term:
+            return None
+        key, _, value = term.replace("==", "=").partition("=")
+        terms.append(f"{key.strip()}={value.strip()}")
+    return terms
+
+
+class ObjectStore:
+    """Objects of one kind, keyed by (namespace, name) and indexed by namespace and label."""
+
+    def __init__(self):
+        self._objects: Dict[ObjectKey, Dict[str, Any]] = {}
+        self._sizes: Dict[ObjectKey, int] = {}
+        self._by_namespace: Dict[str, Set[ObjectKey]] = defaultdict(set)
+        self._by_label: Dict[str, Set[ObjectKey]] = defaultdict(set)
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key(obj: Dict[str, Any]) -> ObjectKey:
+        metadata = obj.get("metadata") or {}
+        return metadata.get("namespace") or "", metadata.get("name", "")
+
+    @staticmethod
+    def _label_terms(obj: Dict[str, Any]) -> List[str]:
+        return [f"{key}={value}" for key, value in ((obj.get("metadata") or {}).get("labels") or {}).items()]
+
+    def _unindex(self, key: ObjectKey):
+        obj = self._objects.pop(key, None)
+        self._sizes.pop(key, None)
+        if obj is None:
+            return
+        self._by_namespace[key[0]].discard(key)
+        for label in self._label_terms(obj):
+            self._by_label[label].discard(key)
+
+    def upsert(self, obj: Dict[str, Any]):
+        (obj.get("metadata") or {}).pop("managedFields", None)
+        key = self._key(obj)
+        labels = self._label_terms(obj)
+        with self._lock:
+            self._unindex(key)
+            self._objects[key] = obj
+            self._sizes[key] = len(json.dumps(obj))
+            self._by_namespace[key[0]].add(key)
+            for label in labels:
+                self._by_label[label].add(key)
+
+    def delete(self, obj: Dict[str, Any]):
+        with self._lock:
+            self._unindex(self._key(obj))
+
+    def replace(self, namespace: Optional[str], objects: Iterable[Dict[str, Any]]):
+        """Swap in a fresh list result for a namespace (or everything when namespace is None)."""
+        with self._lock:
+            stale = list(self._objects) if namespace is None else list(self._by_namespace.get(namespace, ()))
+            for key in stale:
+                self._unindex(key)
+            for obj in objects:
+                self.upsert(obj)
+
+    def get(self, namespace: str, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._objects.get((namespace, name))
+
+    def select(self, namespace: str, label_terms: List[str]) -> List[Dict[str, Any]]:
+        with self._lock:
+            keys = set(self._by_namespace.get(namespace, ()))
+            for term in label_terms:
+                keys &= self._by_label.get(term, set())
+            return [self._objects[key] for key in sorted(keys)]
+
+    def stats(self, namespace: str) -> Tuple[int, int]:
+        with self._lock:
+            keys = self._by_namespace.get(namespace, ())
+            return len(keys), sum(self._sizes[key] for key in keys)
+
+
+class Informer:
+    """List-then-watch loop keeping one kind in one namespace mirrored into an ObjectStore."""
+
+    def __init__(self, kind: str, namespace: str, list_function: Callable[..., Any],
+                 sanitize: Callable[[Any], Any], store: ObjectStore):
+        self.kind = kind
+        self.namespace = namespace
+        # A namespaced list_* method of the generated API; watch.Watch needs the real method to find its return type.
+        self._list_function = list_function
+        self._sanitize = sanitize
+        self.store = store
+        self.synced = threading.Event()
+        # Set when the first list did not complete within INFORMER_SYNC_TIMEOUT (e.g. RBAC denies list/watch).
+        self.sync_failed = False
+        self.last_contact = 0.0
+        self.relists = 0
+        self.events_applied = 0
+        self._resource_version: Optional[str] = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"informer-{kind}-{namespace}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    @property
+    def staleness(self) -> float:
+        return time.monotonic() - self.last_contact if self.last_contact else float("inf")
+
+    @property
+    def fresh(self) -> bool:
+        return self.synced.is_set() and self.staleness <= INFORMER_MAX_STALENESS
+
+    def _list(self):
+        result = self._sanitize(self._list_function(self.namespace))
+        items = result.get("items") or []
+        for item in items:
+            item.setdefault("kind", self.kind)
+        self.store.replace(self.namespace, items)
+        self._resource_version = (result.get("metadata") or {}).get("resourceVersion")
+        self.relists += 1
+        self.last_contact = time.monotonic()
+        self.synced.set()
+
+    def _watch(self):
+        stream = watch.Watch().stream(self._list_function, self.namespace,
+                                      resource_version=self._resource_version,
+                                      timeout_seconds=INFORMER_WATCH_TIMEOUT, allow_watch_bookmarks=True)
+        for event in stream:
+            if self._stopped.is_set():
+                return
+            raw = event.get("raw_object") or {}
+            event_type = event.get("type")
+            if event_type == "ERROR":
+                if raw.get("code") == 410:
+                    # Our resourceVersion was compacted away; only a fresh list can resync.
+                    self._resource_version = None
+                    return
+                raise ApiException(status=raw.get("code"), reason=raw.get("message"))
+            self._resource_version = (raw.get("metadata") or {}).get("resourceVersion") or self._resource_version
+            if event_type == "DELETED":
+                self.store.delete(raw)
+            elif event_type in ("ADDED", "MODIFIED"):
+                raw.setdefault("kind", self.kind)
+                self.store.upsert(raw)
+            self.events_applied += 1
+            self.last_contact = time.monotonic()
+        # The server closed the watch at its timeout, so we were connected and up to date until now.
+        self.last_contact = time.monotonic()
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            try:
+                if self._resource_version is None:
+                    self._list()
+                self._watch()
+            except ApiException as e:
+                if e.status == 410:
+                    self._resource_version = None
+                    continue
+                logger.error(f"Informer {self.kind}/{self.namespace} failed: {e.status} {e.reason}")
+                self._stopped.wait(INFORMER_RETRY_BACKOFF)
+            except Exception as e:
+                logger.error(f"Informer {self.kind}/{self.namespace} failed: {e}")
+                self._stopped.wait(INFORMER_RETRY_BACKOFF)
+
+
+class InformerCache:
+    """Lazily started informers per (kind, namespace) answering reads from memory while fresh."""
+
+    def __init__(self, sanitize: Callable[[Any], Any]):
+        self._sanitize = sanitize
+        self._stores: Dict[str, ObjectStore] = defaultdict(ObjectStore)
+        self._informers: Dict[Tuple[str, str], Informer] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _informer(self, kind: str, namespace: str, list_function: Callable[..., Any],
+                  wait: bool = True) -> Optional[Informer]:
+        """The informer for (kind, namespace), started on first use; None if it cannot serve reads.
+
+        Only the read that starts an informer waits for its initial sync. One that missed that deadline is skipped
+        until it does sync, so an informer that never will (no list/watch permission, unreachable API) does not
+        stall every read before the fallback.
+        """
+        if kind not in INFORMER_KINDS or not namespace:
+            return None
+        started = False
+        with self._lock:
+            informer = self._informers.get((kind, namespace))
+            if informer is None:
+                informer = Informer(kind, namespace, list_function, self._sanitize, self._stores[kind])
+                self._informers[(kind, namespace)] = informer
+                informer.start()
+                started = True
+                logger.info(f"Started informer for {kind} in {namespace}")
+        if started and wait and not informer.synced.wait(INFORMER_SYNC_TIMEOUT):
+            informer.sync_failed = True
+            logger.error(f"Informer for {kind} in {namespace} did not sync within {INFORMER_SYNC_TIMEOUT}s, "
+                         f"reading from the API until it does")
+        if informer.sync_failed and not informer.synced.is_set():
+            return None
+        return informer
+
+    def _record(self, served: bool):
+        with self._lock:
+            if served:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def watch(self, kind: str, namespace: str, list_function: Callable[..., Any]):
+        """Start mirroring a kind in a namespace ahead of the first read, without waiting for it to sync."""
+        self._informer(kind, namespace, list_function, wait=False)
+
+    def get_objects(self, kind: str, namespace: str, list_function: Callable[..., Any], names: List[str],
+                    label_selector: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """Objects from memory, or None when the informer cannot answer (unsupported, unsynced or stale)."""
+        label_terms = parse_equality_selector(label_selector)
+        informer = self._informer(kind, namespace, list_function) if label_terms is not None else None
+        if informer is None or not informer.fresh:
+            self._record(False)
+            return None
+        store = self._stores[kind]
+        if names:
+            objects = [store.get(namespace, name) for name in names]
+            if any(obj is None for obj in objects):
+                # Let the API produce kubectl's NotFound error.
+                self._record(False)
+                return None
+            self._record(True)
+            return objects
+        self._record(True)
+        return store.select(namespace, label_terms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            informers = list(self._informers.values())
+        stores = []
+        for informer in informers:
+            count, size = informer.store.stats(informer.namespace)
+            stores.append({
+                "kind": informer.kind,
+                "namespace": informer.namespace,
+                "objects": count,
+                "approx_bytes": size,
+                "synced": informer.synced.is_set(),
+                "sync_failed": informer.sync_failed,
+                "staleness_seconds": round(informer.staleness, 1),
+                "relists": informer.relists,
+                "events_applied": informer.events_applied,
+            })
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "approx_bytes": sum(store["approx_bytes"] for store in stores),
+            "stores": stores,
+        }
+
+    def stop(self):
+        with self._lock:
+            for informer in self._informers.values():
+                informer.stop()
+            self._informers.clear()
@@ -0,0 +1,520 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import datetime
+import json
+import logging
+import os
+import threading
+from dataclasses import replace
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import urllib3
+import yaml
+from kubernetes import client, config
+from kubernetes.client.rest import ApiException
+
+from .bounded_exec import KUBECTL_MAX_OUTPUT_BYTES, KUBECTL_TIMEOUT
+from .informer_cache import INFORMER_ENABLED, INFORMER_KINDS, InformerCache
+from .kubectl_command import KubectlCommand, parse_kubectl_command
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+KUBE_API_POOL_MAXSIZE = int(os.getenv("KUBE_API_POOL_MAXSIZE", 16))
+KUBE_API_REQUEST_TIMEOUT = float(os.getenv("KUBE_API_REQUEST_TIMEOUT", KUBECTL_TIMEOUT))
+SERVICE_ACCOUNT_NAMESPACE_FILE = "/var/run/secrets/kubernetes.io/serviceaccount/namespace"
+
+
+class ResourceSpec(NamedTuple):
+    kind: str
+    plural: str
+    api: str
+    namespaced: bool
+
+
+# Resources served in-process; anything else (secrets included, deliberately) goes through kubectl.
+RESOURCES = {
+    spec.plural: spec for spec in [
+        ResourceSpec("Pod", "pods", "core", True),
+        ResourceSpec("Service", "services", "core", True),
+        ResourceSpec("Event", "events", "core", True),
+        ResourceSpec("ConfigMap", "configmaps", "core", True),
+        ResourceSpec("Endpoints", "endpoints", "core", True),
+        ResourceSpec("PersistentVolumeClaim", "persistentvolumeclaims", "core", True),
+        ResourceSpec("Node", "nodes", "core", False),
+        ResourceSpec("Namespace", "namespaces", "core", False),
+        ResourceSpec("Deployment", "deployments", "apps", True),
+        ResourceSpec("ReplicaSet", "replicasets", "apps", True),
+        ResourceSpec("StatefulSet", "statefulsets", "apps", True),
+        ResourceSpec("DaemonSet", "daemonsets", "apps", True),
+    ]
+}
+RESOURCE_ALIASES = {
+    "po": "pods", "pod": "pods",
+    "svc": "services", "service": "services",
+    "ev": "events", "event": "events",
+    "cm": "configmaps", "configmap": "configmaps",
+    "ep": "endpoints",
+    "pvc": "persistentvolumeclaims", "persistentvolumeclaim": "persistentvolumeclaims",
+    "no": "nodes", "node": "nodes",
+    "ns": "namespaces", "namespace": "namespaces",
+    "deploy": "deployments", "deployment": "deployments",
+    "rs": "replicasets", "replicaset": "replicasets",
+    "sts": "statefulsets", "statefulset": "statefulsets",
+    "ds": "daemonsets", "daemonset": "daemonsets",
+}
+
+
+def resolve_resource(name: str) -> Optional[ResourceSpec]:
+    name = name.lower().split(".")[0]
+    return RESOURCES.get(RESOURCE_ALIASES.get(name, name))
+
+
+def resolve_targets(command: KubectlCommand) -> Optional[Tuple[ResourceSpec, List[str]]]:
+    """Resource type and object names from `get pods a b`, `get pod/a` or `describe deployment x`."""
+    if not command.arguments:
+        return None
+    if "/" in command.arguments[0]:
+        specs = {resolve_resource(argument.split("/", 1)[0]) for argument in command.arguments}
+        if len(specs) != 1 or None in specs or any("/" not in argument for argument in command.arguments):
+            return None
+        return specs.pop(), [argument.split("/", 1)[1] for argument in command.arguments]
+    if "," in command.arguments[0]:
+        return None
+    spec = resolve_resource(command.arguments[0])
+    if spec is None:
+        return None
+    return spec, command.arguments[1:]
+
+
+def format_age(timestamp: Optional[str]) -> str:
+    if not timestamp:
+        return "<unknown>"
+    created = datetime.datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    seconds = int((datetime.datetime.now(datetime.timezone.utc) - created).total_seconds())
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size * (2 if unit != "d" else 1):
+            return f"{seconds // size}{unit}"
+    return f"{max(seconds, 0)}s"
+
+
+def pod_status(pod: Dict[str, Any]) -> str:
+    metadata, status = pod.get("metadata") or {}, pod.get("status") or {}
+    if metadata.get("deletionTimestamp"):
+        return "Terminating"
+    reason = status.get("reason") or status.get("phase") or "Unknown"
+    for container in status.get("containerStatuses") or []:
+        state = container.get("state") or {}
+        if state.get("waiting", {}).get("reason"):
+            return state["waiting"]["reason"]
+        if state.get("terminated", {}).get("reason"):
+            reason = state["terminated"]["reason"]
+    return reason
+
+
+def _pod_row(pod: Dict[str, Any]) -> Dict[str, str]:
+    containers = (pod.get("status") or {}).get("containerStatuses") or []
+    ready = sum(1 for container in containers if container.get("ready"))
+    total = len((pod.get("spec") or {}).get("containers") or containers)
+    return {
+        "READY": f"{ready}/{total}",
+        "STATUS": pod_status(pod),
+        "RESTARTS": str(sum(container.get("restartCount", 0) for container in containers)),
+        "IP": (pod.get("status") or {}).get("podIP") or "<none>",
+        "NODE": (pod.get("spec") or {}).get("nodeName") or "<none>",
+    }
+
+
+def _service_row(service: Dict[str, Any]) -> Dict[str, str]:
+    spec = service.get("spec") or {}
+    ingress = ((service.get("status") or {}).get("loadBalancer") or {}).get("ingress") or []
+    ports = ",".join(
+        f"{port.get('port')}{':' + str(port['nodePort']) if port.get('nodePort') else ''}/{port.get('protocol', 'TCP')}"
+        for port in spec.get("ports") or [])
+    return {
+        "TYPE": spec.get("type", ""),
+        "CLUSTER-IP": spec.get("clusterIP") or "<none>",
+        "EXTERNAL-IP": ",".join(entry.get("ip") or entry.get("hostname", "") for entry in ingress) or "<none>",
+        "PORT(S)": ports or "<none>",
+        "SELECTOR": ",".join(f"{key}={value}" for key, value in (spec.get("selector") or {}).items()) or "<none>",
+    }
+
+
+def _workload_row(workload: Dict[str, Any]) -> Dict[str, str]:
+    spec, status = workload.get("spec") or {}, workload.get("status") or {}
+    return {
+        "READY": f"{status.get('readyReplicas', 0)}/{spec.get('replicas', 0)}",
+        "UP-TO-DATE": str(status.get("updatedReplicas", 0)),
+        "AVAILABLE": str(status.get("availableReplicas", 0)),
+        "DESIRED": str(spec.get("replicas", status.get("desiredNumberScheduled", 0))),
+        "CURRENT": str(status.get("replicas", status.get("currentNumberScheduled", 0))),
+    }
+
+
+def _node_row(node: Dict[str, Any]) -> Dict[str, str]:
+    conditions = (node.get("status") or {}).get("conditions") or []
+    ready = next((condition for condition in conditions if condition.get("type") == "Ready"), {})
+    labels = (node.get("metadata") or {}).get("labels") or {}
+    roles = [label.split("/", 1)[1] for label in labels if label.startswith("node-role.kubernetes.io/")]
+    return {
+        "STATUS": "Ready" if ready.get("status") == "True" else "NotReady",
+        "ROLES": ",".join(roles) or "<none>",
+        "VERSION": ((node.get("status") or {}).get("nodeInfo") or {}).get("kubeletVersion", ""),
+    }
+
+
+def _event_row(event: Dict[str, Any]) -> Dict[str, str]:
+    involved = event.get("involvedObject") or {}
+    last_seen = event.get("lastTimestamp") or event.get("eventTime") or (event.get("metadata") or {}).get(
+        "creationTimestamp")
+    return {
+        "LAST SEEN": format_age(last_seen),
+        "TYPE": event.get("type", ""),
+        "REASON": event.get("reason", ""),
+        "OBJECT": f"{involved.get('kind', '').lower()}/{involved.get('name', '')}",
+        "MESSAGE": (event.get("message") or "").strip(),
+    }
+
+
+TABLE_COLUMNS: Dict[str, Tuple[List[str], List[str], Callable[[Dict[str, Any]], Dict[str, str]]]] = {
+    # kind: (default columns, extra -o wide columns, row builder)
+    "Pod": (["READY", "STATUS", "RESTARTS"], ["IP", "NODE"], _pod_row),
+    "Service": (["TYPE", "CLUSTER-IP", "EXTERNAL-IP", "PORT(S)"], ["SELECTOR"], _service_row),
+    "Deployment": (["READY", "UP-TO-DATE", "AVAILABLE"], [], _workload_row),
+    "StatefulSet": (["READY"], [], _workload_row),
+    "ReplicaSet": (["DESIRED", "CURRENT", "READY"], [], _workload_row),
+    "DaemonSet": (["DESIRED", "CURRENT", "READY", "UP-TO-DATE", "AVAILABLE"], [], _workload_row),
+    "Node": (["STATUS", "ROLES"], ["VERSION"], _node_row),
+}
+
+
+def render_table(rows: List[List[str]], no_headers: bool = False) -> str:
+    if no_headers:
+        rows = rows[1:]
+    if not rows:
+        return ""
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    return "\n".join("   ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows)
+
+
+def render_objects(spec: ResourceSpec, objects: List[Dict[str, Any]], command: KubectlCommand) -> str:
+    """Render objects the way `kubectl get` would for the requested output format."""
+    output = command.output or ""
+    if output == "json":
+        if len(objects) == 1 and len(resolve_targets(command)[1]) == 1:
+            return json.dumps(objects[0], indent=4)
+        return json.dumps({"apiVersion": "v1", "kind": "List", "items": objects}, indent=4)
+    if output == "yaml":
+        if len(objects) == 1 and len(resolve_targets(command)[1]) == 1:
+            return yaml.safe_dump(objects[0], sort_keys=False)
+        return yaml.safe_dump({"apiVersion": "v1", "kind": "List", "items": objects}, sort_keys=False)
+    if output == "name":
+        return "\n".join(f"{spec.kind.lower()}/{(obj.get('metadata') or {}).get('name')}" for obj in objects)
+    if not objects:
+        scope = "" if not spec.namespaced or command.all_namespaces else f" in {command.namespace} namespace"
+        return f"No resources found{scope}."
+
+    show_namespace = spec.namespaced and command.all_namespaces
+    if spec.kind == "Event":
+        columns = ["LAST SEEN", "TYPE", "REASON", "OBJECT", "MESSAGE"]
+        rows = [(["NAMESPACE"] if show_namespace else []) + columns]
+        for event in sorted(objects, key=lambda event: event.get("lastTimestamp") or event.get("eventTime") or ""):
+            row = _event_row(event)
+            rows.append(([(event.get("metadata") or {}).get("namespace", "")] if show_namespace else []) +
+                        [row[column] for column in columns])
+        return render_table(rows, command.no_headers)
+
+    default_columns, wide_columns, row_builder = TABLE_COLUMNS.get(spec.kind, ([], [], lambda obj: {}))
+    columns = default_columns + (wide_columns if output == "wide" else [])
+    rows = [(["NAMESPACE"] if show_namespace else []) + ["NAME"] + columns + ["AGE"]]
+    for obj in objects:
+        metadata = obj.get("metadata") or {}
+        row = row_builder(obj)
+        rows.append(([metadata.get("namespace", "")] if show_namespace else []) + [metadata.get("name", "")] +
+                    [row[column] for column in columns] + [format_age(metadata.get("creationTimestamp"))])
+    return render_table(rows, command.no_headers)
+
+
+class KubernetesAPIEngine:
+    """Serves read-only kubectl commands over one persistent, pooled Kubernetes API client."""
+
+    _instance: Optional["KubernetesAPIEngine"] = None
+    _instance_error: Optional[Exception] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        configuration = client.Configuration()
+        try:
+            config.load_kube_config(config_file=os.getenv("KUBECONFIG") or None, client_configuration=configuration)
+            _, active_context = config.list_kube_config_contexts(config_file=os.getenv("KUBECONFIG") or None)
+            # What kubectl uses when -n is omitted.
+            self.default_namespace = (active_context.get("context") or {}).get("namespace") or "default"
+        except config.ConfigException:
+            config.load_incluster_config(client_configuration=configuration)
+            self.default_namespace = _in_cluster_namespace()
+        configuration.connection_pool_maxsize = KUBE_API_POOL_MAXSIZE
+        self.api_client = client.ApiClient(configuration)
+        self.core = client.CoreV1Api(self.api_client)
+        self.apps = client.AppsV1Api(self.api_client)
+        self.custom = client.CustomObjectsApi(self.api_client)
+        self.informers = InformerCache(self._sanitize) if INFORMER_ENABLED else None
+        self.requests_served = 0
+
+    @classmethod
+    def instance(cls) -> Optional["KubernetesAPIEngine"]:
+        """Shared engine, or None when no kubeconfig/in-cluster config is usable (callers fall back to kubectl)."""
+        with cls._instance_lock:
+            if cls._instance is None and cls._instance_error is None:
+                try:
+                    cls._instance = cls()
+                except Exception as e:
+                    logger.error(f"Kubernetes API client unavailable, using kubectl: {e}")
+                    cls._instance_error = e
+            return cls._instance
+
+    def _sanitize(self, obj: Any) -> Any:
+        return self.api_client.sanitize_for_serialization(obj)
+
+    def _api_for(self, spec: ResourceSpec):
+        return self.core if spec.api == "core" else self.apps
+
+    def _singular(self, spec: ResourceSpec) -> str:
+        return "".join("_" + character.lower() if character.isupper() else character
+                       for character in spec.kind).lstrip("_")
+
+    def _list_function(self, spec: ResourceSpec):
+        return getattr(self._api_for(spec), f"list_namespaced_{self._singular(spec)}")
+
+    def _for_output(self, spec: ResourceSpec, objects: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Copies shaped like kubectl's: kind/apiVersion set (list items lack them) and managedFields dropped."""
+        return [{
+            "apiVersion": "v1" if spec.api == "core" else "apps/v1",
+            "kind": spec.kind,
+            **obj,
+            "metadata": {key: value for key, value in (obj.get("metadata") or {}).items() if key != "managedFields"},
+        } for obj in objects]
+
+    def watch_namespaces(self, namespaces: List[str]):
+        """Start informers for every informer-backed kind in the given namespaces ahead of the first query."""
+        if self.informers is None:
+            return
+        for namespace in namespaces:
+            for spec in RESOURCES.values():
+                if spec.namespaced and spec.kind in INFORMER_KINDS:
+                    self.informers.watch(spec.kind, namespace, self._list_function(spec))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests_served": self.requests_served,
+            "informers": self.informers.stats() if self.informers is not None else None,
+        }
+
+    def list_objects(self, spec: ResourceSpec, namespace: Optional[str], label_selector: Optional[str] = None,
+                     field_selector: Optional[str] = None) -> List[Dict[str, Any]]:
+        api = self._api_for(spec)
+        kwargs = {"_request_timeout": KUBE_API_REQUEST_TIMEOUT}
+        if label_selector:
+            kwargs["label_selector"] = label_selector
+        if field_selector:
+            kwargs["field_selector"] = field_selector
+        singular = self._singular(spec)
+        if not spec.namespaced:
+            result = getattr(api, f"list_{singular}")(**kwargs)
+        elif namespace is None:
+            result = getattr(api, f"list_{singular}_for_all_namespaces")(**kwargs)
+        else:
+            result = getattr(api, f"list_namespaced_{singular}")(namespace, **kwargs)
+        return self._for_output(spec, self._sanitize(result).get("items") or [])
+
+    def read_object(self, spec: ResourceSpec, name: str, namespace: Optional[str]) -> Dict[str, Any]:
+        api = self._api_for(spec)
+        singular = self._singular(spec)
+        if spec.namespaced:
+            result = getattr(api, f"read_namespaced_{singular}")(name, namespace,
+                                                                 _request_timeout=KUBE_API_REQUEST_TIMEOUT)
+        else:
+            result = getattr(api, f"read_{singular}")(name, _request_timeout=KUBE_API_REQUEST_TIMEOUT)
+        return self._for_output(spec, [self._sanitize(result)])[0]
+
+    def fetch_objects(self, command: KubectlCommand) -> Optional[Tuple[ResourceSpec, List[Dict[str, Any]]]]:
+        """Objects selected by a get/describe command, or None if the command is not servable here."""
+        targets = resolve_targets(command)
+        if targets is None:
+            return None
+        spec, names = targets
+        namespace = None if command.all_namespaces or not spec.namespaced else command.namespace
+        if self.informers is not None and namespace is not None and not command.field_selector:
+            cached = self.informers.get_objects(spec.kind, namespace, self._list_function(spec), names,
+                                                command.selector)
+            if cached is not None:
+                return spec, self._for_output(spec, cached)
+        if names:
+            return spec, [self.read_object(spec, name, namespace) for name in names]
+        return spec, self.list_objects(spec, namespace, command.selector, command.field_selector)
+
+    def _logs(self, command: KubectlCommand) -> Optional[str]:
+        if len(command.arguments) != 1 or command.selector:
+            return None
+        name = command.arguments[0]
+        if "/" in name:
+            kind, name = name.split("/", 1)
+            if resolve_resource(kind) is not RESOURCES["pods"]:
+                # deployment/x and friends need kubectl's pod resolution.
+                return None
+        # Same byte budget as the kubectl path, enforced by the API server instead of after the download.
+        kwargs = {"_request_timeout": KUBE_API_REQUEST_TIMEOUT, "limit_bytes": KUBECTL_MAX_OUTPUT_BYTES}
+        if command.container:
+            kwargs["container"] = command.container
+        if command.tail is not None:
+            kwargs["tail_lines"] = command.tail
+        if command.since:
+            if command.since_seconds is None:
+                return None
+            kwargs["since_seconds"] = command.since_seconds
+        if command.previous:
+            kwargs["previous"] = True
+        if command.timestamps:
+            kwargs["timestamps"] = True
+        return self.core.read_namespaced_pod_log(name, command.namespace, **kwargs)
+
+    def _top(self, command: KubectlCommand) -> Optional[str]:
+        if not command.arguments:
+            return None
+        spec = resolve_resource(command.arguments[0])
+        names = set(command.arguments[1:])
+        if spec is RESOURCES["pods"]:
+            if command.all_namespaces:
+                result = self.custom.list_cluster_custom_object("metrics.k8s.io", "v1beta1", "pods",
+                                                                label_selector=command.selector or "")
+            else:
+                result = self.custom.list_namespaced_custom_object("metrics.k8s.io", "v1beta1", command.namespace,
+                                                                   "pods", label_selector=command.selector or "")
+            rows = [(["NAMESPACE"] if command.all_namespaces else []) + ["NAME", "CPU(cores)", "MEMORY(bytes)"]]
+            for item in result.get("items") or []:
+                metadata = item.get("metadata") or {}
+                if names and metadata.get("name") not in names:
+                    continue
+                usage = [container.get("usage") or {} for container in item.get("containers") or []]
+                rows.append(([metadata.get("namespace", "")] if command.all_namespaces else []) +
+                            [metadata.get("name", ""), _sum_quantities(usage, "cpu"),
+                             _sum_quantities(usage, "memory")])
+            return render_table(rows, command.no_headers)
+        if spec is RESOURCES["nodes"]:
+            result = self.custom.list_cluster_custom_object("metrics.k8s.io", "v1beta1", "nodes")
+            rows = [["NAME", "CPU(cores)", "MEMORY(bytes)"]]
+            for item in result.get("items") or []:
+                name = (item.get("metadata") or {}).get("name", "")
+                if names and name not in names:
+                    continue
+                usage = item.get("usage") or {}
+                rows.append([name, usage.get("cpu", ""), usage.get("memory", "")])
+            return render_table(rows, command.no_headers)
+        return None
+
+    def _events(self, command: KubectlCommand) -> Optional[str]:
+        if command.arguments:
+            return None
+        field_selector = command.field_selector
+        if command.for_object:
+            kind, _, name = command.for_object.partition("/")
+            spec = resolve_resource(kind)
+            if spec is None or not name:
+                return None
+            field_selector = ",".join(filter(None, [field_selector, f"involvedObject.name={name}",
+                                                    f"involvedObject.kind={spec.kind}"]))
+        events_command = KubectlCommand(verb="get", arguments=["events"], namespace=command.namespace,
+                                        all_namespaces=command.all_namespaces, output=command.output,
+                                        field_selector=field_selector, no_headers=command.no_headers)
+        return self._get(events_command)
+
+    def _get(self, command: KubectlCommand) -> Optional[str]:
+        if command.output not in (None, "json", "yaml", "wide", "name"):
+            return None
+        fetched = self.fetch_objects(command)
+        if fetched is None:
+            return None
+        spec, objects = fetched
+        return render_objects(spec, objects, command)
+
+    def execute(self, command: str) -> Optional[str]:
+        """kubectl-equivalent output for a read-only command, or None when kubectl must handle it."""
+        parsed = parse_kubectl_command(command)
+        if parsed is None or parsed.unknown_flags or not parsed.is_read_only:
+            return None
+        # describe is left to kubectl: its sectioned output is not worth re-implementing per kind.
+        handlers = {"get": self._get, "logs": self._logs, "top": self._top, "events": self._events}
+        if parsed.verb not in handlers:
+            return None
+        if parsed.namespace is None:
+            parsed = replace(parsed, namespace=self.default_namespace)
+        try:
+            output = handlers[parsed.verb](parsed)
+        except ApiException as e:
+            message = e.body
+            try:
+                message = json.loads(e.body).get("message", e.body)
+            except (TypeError, ValueError):
+                pass
+            return f"Error executing kubectl command: Error from server ({e.reason}): {message}"
+        except urllib3.exceptions.HTTPError as e:
+            # Includes read timeouts at KUBE_API_REQUEST_TIMEOUT, the API path's per-call deadline.
+            return f"Error executing kubectl command: {e}"
+        except Exception as e:
+            # Anything else (an unexpected response shape, a row builder choking on a field) is this engine's
+            # problem, not the command's; kubectl gets to run it.
+            logger.error(f"Kubernetes API engine could not serve {command!r}, using kubectl: {e}")
+            return None
+        if output is not None:
+            self.requests_served += 1
+        return output
+
+
+def get_kube_api_stats() -> Optional[Dict[str, Any]]:
+    engine = KubernetesAPIEngine._instance
+    return engine.stats() if engine is not None else None
+
+
+def _in_cluster_namespace() -> str:
+    try:
+        with open(SERVICE_ACCOUNT_NAMESPACE_FILE) as namespace_file:
+            return namespace_file.read().strip() or "default"
+    except OSError:
+        return "default"
+
+
+def _sum_quantities(usages: List[Dict[str, str]], resource: str) -> str:
+    """Sum per-container CPU (to millicores) or memory (to Mi) quantities from metrics.k8s.io."""
+    total = 0.0
+    for usage in usages:
+        value = usage.get(resource, "0")
+        if resource == "cpu":
+            if value.endswith("n"):
+                total += float(value[:-1]) / 1e6
+            elif value.endswith("u"):
+                total += float(value[:-1]) / 1e3
+            elif value.endswith("m"):
+                total += float(value[:-1])
+            else:
+                total += float(value) * 1000
+        else:
+            units = {"Ki": 1 / 1024, "Mi": 1, "Gi": 1024, "K": 1e3 / 2**20, "M": 1e6 / 2**20, "G": 1e9 / 2**20}
+            for suffix, factor in units.items():
+                if value.endswith(suffix):
+                    total += float(value[:-len(suffix)]) * factor
+                    break
+            else:
+                total += float(value) / 2**20
+    return f"{int(round(total))}m" if resource == "cpu" else f"{int(round(total))}Mi"
@@ -0,0 +1,153 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import re
+import shlex
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# Anything that makes the command more than a single kubectl invocation must go through the shell.
+SHELL_METACHARACTERS = re.compile(r"[|;&<>`]|\$\(")
+READ_ONLY_VERBS = {"get", "describe", "logs", "top", "events", "explain", "api-resources", "api-versions", "version"}
+
+FLAGS_WITH_VALUES = {
+    "-n": "namespace",
+    "--namespace": "namespace",
+    "-l": "selector",
+    "--selector": "selector",
+    "-o": "output",
+    "--output": "output",
+    "-c": "container",
+    "--container": "container",
+    "--tail": "tail",
+    "--since": "since",
+    "--field-selector": "field_selector",
+    "--for": "for_object",
+}
+BOOLEAN_FLAGS = {
+    "-A": "all_namespaces",
+    "--all-namespaces": "all_namespaces",
+    "-p": "previous",
+    "--previous": "previous",
+    "--timestamps": "timestamps",
+    "--no-headers": "no_headers",
+}
+# Canonical long form of each value flag, used when rebuilding a command line.
+LONG_FLAG_NAMES = {
+    "namespace": "--namespace",
+    "selector": "--selector",
+    "field_selector": "--field-selector",
+    "output": "--output",
+    "container": "--container",
+    "since": "--since",
+    "for_object": "--for",
+}
+DURATION_PATTERN = re.compile(r"(\d+)([smhd])")
+DURATION_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+@dataclass
+class KubectlCommand:
+    verb: str
+    arguments: List[str] = field(default_factory=list)
+    namespace: Optional[str] = None
+    all_namespaces: bool = False
+    selector: Optional[str] = None
+    field_selector: Optional[str] = None
+    output: Optional[str] = None
+    container: Optional[str] = None
+    tail: Optional[int] = None
+    since: Optional[str] = None
+    for_object: Optional[str] = None
+    previous: bool = False
+    timestamps: bool = False
+    no_headers: bool = False
+    # Flags this module does not understand, kept verbatim so callers can decide to fall back to kubectl.
+    unknown_flags: List[str] = field(default_factory=list)
+
+    @property
+    def is_read_only(self) -> bool:
+        return self.verb in READ_ONLY_VERBS
+
+    @property
+    def since_seconds(self) -> Optional[int]:
+        return parse_duration(self.since) if self.since else None
+
+    def to_command(self) -> str:
+        # Only faithful when unknown_flags is empty: a separated value of an unknown flag is parsed as an argument.
+        parts = ["kubectl", self.verb, *self.arguments]
+        for attribute, flag in LONG_FLAG_NAMES.items():
+            value = getattr(self, attribute)
+            if value is not None:
+                parts.append(f"{flag}={value}")
+        if self.tail is not None:
+            parts.append(f"--tail={self.tail}")
+        for flag in ("all_namespaces", "previous", "timestamps", "no_headers"):
+            if getattr(self, flag):
+                parts.append(f"--{flag.replace('_', '-')}")
+        parts += self.unknown_flags
+        return shlex.join(parts)
+
+
+def parse_duration(value: str) -> Optional[int]:
+    matches = DURATION_PATTERN.findall(value)
+    if not matches or "".join(f"{number}{unit}" for number, unit in matches) != value:
+        return None
+    return sum(int(number) * DURATION_SECONDS[unit] for number, unit in matches)
+
+
+def parse_kubectl_command(command: str) -> Optional[KubectlCommand]:
+    """Parse a single kubectl command line; None if it is not one (pipes, redirects, other binaries)."""
+    if SHELL_METACHARACTERS.search(command):
+        return None
+    try:
+        tokens = shlex.split(command)
+    except ValueError:
+        return None
+    if len(tokens) < 2 or tokens[0] != "kubectl":
+        return None
+
+    values = {}
+    positionals = []
+    unknown_flags = []
+    i = 1
+    while i < len(tokens):
+        token = tokens[i]
+        name, has_inline_value, inline_value = token.partition("=")
+        if token.startswith("-") and name in FLAGS_WITH_VALUES:
+            if has_inline_value:
+                values[FLAGS_WITH_VALUES[name]] = inline_value
+            elif i + 1 < len(tokens):
+                values[FLAGS_WITH_VALUES[name]] = tokens[i + 1]
+                i += 1
+            else:
+                return None
+        elif token in BOOLEAN_FLAGS:
+            values[BOOLEAN_FLAGS[token]] = True
+        elif token.startswith("-") and len(token) > 1:
+            unknown_flags.append(token)
+        else:
+            positionals.append(token)
+        i += 1
+
+    if not positionals:
+        return None
+    tail = values.pop("tail", None)
+    try:
+        tail = int(tail) if tail is not None else None
+    except ValueError:
+        return None
+    return KubectlCommand(verb=positionals[0], arguments=positionals[1:], tail=tail, unknown_flags=unknown_flags,
+                          **values)
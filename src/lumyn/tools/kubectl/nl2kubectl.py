@@ -16,38 +16,67 @@
 import logging
 import os
 import re
-import subprocess
-from typing import Any, Dict, Optional, Type
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Type
 
 from crewai.tools.base_tool import BaseTool
 from pydantic import BaseModel, Field
+from lumyn.llm_backends.response_cache import scoped_tool_run
 from lumyn.tools.linting.kubectl_linter import KubectlLinter
+from lumyn.utils.evidence_cache import EVIDENCE_PREFETCH, evidence_cache, with_evidence
+
+from .bounded_exec import KUBECTL_TIMEOUT, bound_logs_command, bound_output, run_bounded, truncation_notice
+from .kube_api_engine import KubernetesAPIEngine, resolve_resource
+from .kubectl_command import parse_kubectl_command
+from .projection import events_command, parse_events, project_output, structured_command, truncate_to_budget
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+NL2KUBECTL_USE_API = os.getenv("NL2KUBECTL_USE_API", "True") == "True"
+NL2KUBECTL_STRUCTURED_OUTPUT = os.getenv("NL2KUBECTL_STRUCTURED_OUTPUT", "True") == "True"
+NL2KUBECTL_OUTPUT_TOKEN_BUDGET = int(os.getenv("NL2KUBECTL_OUTPUT_TOKEN_BUDGET", 2000))
+NL2KUBECTL_MAX_WORKERS = int(os.getenv("NL2KUBECTL_MAX_WORKERS", 4))
+HARMFUL_COMMANDS = ["rm "]
+BASH_BLOCK = r"```bash\n(.*?)\n```"
+
 
 class NL2KubectlCustomToolInput(BaseModel):
     nl_query: str = Field(
+        default="",
         title="NL Query",
         description="NL query to execute. Keep queries simple and straight-forward.\
         This tool cannot handle complex mutli-step queries.\
         Make sure to include a namespace where required.",
     )
+    nl_queries: Optional[List[str]] = Field(
+        default=None,
+        title="NL Queries",
+        description="Optional list of independent NL queries, one entity per query, to run together in one call.\
+        Results are returned in the same order.",
+    )
 
 
 class NL2KubectlCustomTool(BaseTool):
     name: str = "NL2Kubectl Tool"
     description: str = (
-        "Converts natural language to kubectl commands and executes them. Can be used to get/describe/edit Kubernetes deployments, services, and other Kubernetes components. Only takes one query at a time. Keep queries simple and straight-forward. This tool cannot handle complex mutli-step queries. Remember that most kubectl queries require a namespace name."
+        "Converts natural language to kubectl commands and executes them. Can be used to get/describe/edit Kubernetes deployments, services, and other Kubernetes components. Takes one query at a time in nl_query, or several independent single-entity queries at once in nl_queries. Keep queries simple and straight-forward. This tool cannot handle complex mutli-step queries. Remember that most kubectl queries require a namespace name."
     )
     llm_backend: Any
     is_remediation: bool = False
     god_mode: bool = False
+    use_kube_api: bool = NL2KUBECTL_USE_API
+    structured_output: bool = NL2KUBECTL_STRUCTURED_OUTPUT
+    output_token_budget: int = NL2KUBECTL_OUTPUT_TOKEN_BUDGET
+    command_timeout: float = KUBECTL_TIMEOUT
+    max_workers: int = NL2KUBECTL_MAX_WORKERS
+    prefetched_evidence: bool = EVIDENCE_PREFETCH
     args_schema: Type[BaseModel] = NL2KubectlCustomToolInput
 
-    def _run(self, nl_query: str) -> str:
-        harmful_commands = ["rm "]
+    @scoped_tool_run
+    def _run(self, nl_query: str = "", nl_queries: Optional[List[str]] = None) -> str:
+        if nl_queries:
+            return self._run_batch(list(nl_queries) + ([nl_query] if nl_query else []))
         if self.is_remediation:
             while True:
                 try:
@@ -60,7 +89,7 @@ class NL2KubectlCustomTool(BaseTool):
                         user_input = input("Execute command? (Y/N)").strip().lower()
                     
                     if user_input == "y":
-                        return self._execute_kubectl_command(command)[0:8000]
+                        return truncate_to_budget(self._execute_kubectl_command(command), self.output_token_budget)
                     else:
                         problem_description = input("What is wrong with the command?")
                         nl_query = (
@@ -72,15 +101,69 @@ class NL2KubectlCustomTool(BaseTool):
                     return f"NL2Kubectl Tool failed with: {exc}"
         else:
             try:
+                    evidence = self._prefetched(nl_query)
                     command = self._generate_kubectl_command(prompt=nl_query)
-                    for harmful_command in harmful_commands:
-                        if command.startswith(harmful_command):
-                            return "Potentially harmful command found. Execution is not allowed."
-                    return self._execute_kubectl_command(command)[0:8000]
+                    return with_evidence(evidence, self._execute_generated_command(command))
             except Exception as exc:
                     logger.error(f"NL2Kubectl Tool failed with: {exc}")
                     return f"NL2Kubectl Tool failed with: {exc}"
 
+    def _run_batch(self, nl_queries: List[str]) -> str:
+        """Generate commands for several queries in one LLM call; run read-only ones in parallel, in order."""
+        if self.is_remediation:
+            # Every remediation command needs its own confirmation, so there is nothing to batch.
+            return "\n\n".join(f"Query {position + 1}: {nl_query}\n{self._run(nl_query)}"
+                                for position, nl_query in enumerate(nl_queries))
+        try:
+            commands = self._generate_kubectl_commands(nl_queries)
+        except Exception as exc:
+            logger.error(f"NL2Kubectl Tool failed with: {exc}")
+            return f"NL2Kubectl Tool failed with: {exc}"
+
+        results: List[Optional[str]] = [None] * len(commands)
+
+        def execute(position: int):
+            try:
+                results[position] = self._execute_generated_command(commands[position])
+            except Exception as exc:
+                logger.error(f"NL2Kubectl Tool failed with: {exc}")
+                results[position] = f"NL2Kubectl Tool failed with: {exc}"
+
+        # Consecutive read-only commands run together; a mutating (or unparseable) command runs alone, in order,
+        # so later reads in the batch observe its effect.
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = []
+            for position, command in enumerate(commands):
+                parsed = parse_kubectl_command(command)
+                if parsed is not None and parsed.is_read_only:
+                    pending.append(executor.submit(execute, position))
+                    continue
+                for future in pending:
+                    future.result()
+                pending = []
+                execute(position)
+            for future in pending:
+                future.result()
+
+        return "\n\n".join(f"Query {position + 1}: {nl_query}\nCommand: {command}\n{result}"
+                            for position, (nl_query, command, result) in enumerate(zip(nl_queries, commands, results)))
+
+    def _prefetched(self, nl_query: str) -> Optional[str]:
+        """Pod status pre-fetched before the crew started for the entities a pod query mentions, served once."""
+        if not self.prefetched_evidence or "pod" not in nl_query.lower():
+            return None
+        return evidence_cache.take("pods", nl_query)
+
+    def _execute_generated_command(self, command: str) -> str:
+        for harmful_command in HARMFUL_COMMANDS:
+            if command.startswith(harmful_command):
+                return "Potentially harmful command found. Execution is not allowed."
+        if self.structured_output:
+            projected = self._execute_structured(command)
+            if projected is not None:
+                return projected
+        return truncate_to_budget(self._execute_kubectl_command(command), self.output_token_budget)
+
     def _generate_kubectl_command(self, prompt: str) -> str:
         with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "in_context_examples", "kubectl.txt"),
                   "r") as f:
@@ -88,8 +171,9 @@ class NL2KubectlCustomTool(BaseTool):
 
         system_prompt = f"{kubectl_icl} You write kubectl commands. Answer with only the correct kubectl command. The formatting should always be like this: ```bash\n<kubectl command>\n```"
 
-        response = self.llm_backend.inference(system_prompt, prompt)
-        command_of_interest = re.search(r'```bash\n(.*?)\n```', response, re.DOTALL).group(1).strip()
+        # Generation stops at the closing fence; anything the model would add after the command is never produced.
+        response = self.llm_backend.inference_until(system_prompt, prompt, BASH_BLOCK)
+        command_of_interest = re.search(BASH_BLOCK, response, re.DOTALL).group(1).strip()
         logger.info(f"NL2Kubectl Tool NL prompt received: {prompt}")
         logger.info(f"NL2Kubectl Tool response received: {response}")
         logger.info(f"NL2Kubectl Tool command returned: {command_of_interest}")
@@ -98,17 +182,82 @@ class NL2KubectlCustomTool(BaseTool):
         print(f"NL2Kubectl Tool command returned: {command_of_interest}")
         return command_of_interest
 
+    def _generate_kubectl_commands(self, prompts: List[str]) -> List[str]:
+        """One command per prompt from a single LLM call; prompts the reply missed are generated one by one."""
+        if len(prompts) == 1:
+            return [self._generate_kubectl_command(prompt=prompts[0])]
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "in_context_examples", "kubectl.txt"),
+                  "r") as f:
+            kubectl_icl = f.read()
+
+        system_prompt = f"{kubectl_icl} You write kubectl commands. You will be given several numbered requests. Answer with only the correct kubectl command for each request, in the same order, one block per request. The formatting should always be like this: ```bash\n<kubectl command>\n```"
+        numbered = "\n".join(f"{position + 1}. {prompt}" for position, prompt in enumerate(prompts))
+
+        # Stop once one block per prompt has been written.
+        response = self.llm_backend.inference_until(system_prompt, numbered, f"(?:{BASH_BLOCK}.*?){{{len(prompts)}}}")
+        commands = [command.strip() for command in re.findall(BASH_BLOCK, response, re.DOTALL)]
+        logger.info(f"NL2Kubectl Tool NL prompts received: {numbered}")
+        logger.info(f"NL2Kubectl Tool response received: {response}")
+        print(f"NL2Kubectl Tool NL prompts received: {numbered}")
+        print(f"NL2Kubectl Tool NL response received: {response}")
+        if len(commands) != len(prompts):
+            logger.info(f"NL2Kubectl Tool got {len(commands)} commands for {len(prompts)} prompts, generating separately")
+            return [self._generate_kubectl_command(prompt=prompt) for prompt in prompts]
+        return commands
+
+    def _execute_structured(self, command: str) -> Optional[str]:
+        """Run a get/describe as `-o json` and project the diagnostic fields; None to run the command as written.
+
+        Output that cannot be projected (truncated JSON, an unexpected kind) is returned raw rather than run again.
+        """
+        original = parse_kubectl_command(command)
+        parsed = structured_command(original)
+        if parsed is None:
+            return None
+        output = self._execute_kubectl_command(parsed.to_command())
+        if output.startswith("Error executing kubectl command"):
+            return truncate_to_budget(output, self.output_token_budget)
+        events, events_table = None, None
+        if resolve_resource(parsed.arguments[0].split("/", 1)[0]) is not resolve_resource("events") and (
+                original.verb == "describe" or len(parsed.arguments) > 1 or "/" in parsed.arguments[0]):
+            # describe and named gets show recent events of the objects, like `kubectl describe` does.
+            events_output = self._execute_kubectl_command(events_command(parsed))
+            events = parse_events(events_output)
+            if events is None and not events_output.startswith("Error executing kubectl command"):
+                # The JSON was cut off by the output budget (a busy namespace); the table is far smaller per event.
+                events_table = self._execute_kubectl_command(events_command(parsed, output=None))
+        projected = project_output(output, self.output_token_budget, events, events_table)
+        if projected is None:
+            return truncate_to_budget(output, self.output_token_budget)
+        logger.info(f"NL2Kubectl Tool projected output: {projected}")
+        return projected
+
     def _execute_kubectl_command(self, command: str): #-> Optional[Dict[str, Any]]:
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
-        if result.returncode == 0:
-            logger.info(f"NL2Kubectl Tool command execution: {result.stdout}")
-            print(f"NL2Kubectl Tool command execution: {result.stdout}")
-            return result.stdout
+        command = bound_logs_command(command)
+        if self.use_kube_api:
+            engine = KubernetesAPIEngine.instance()
+            output = engine.execute(command) if engine is not None else None
+            if output is not None:
+                bounded = bound_output(output)
+                output = bounded.stdout + (truncation_notice(bounded.truncated) if bounded.truncated else "")
+                logger.info(f"NL2Kubectl Tool command execution (API): {output}")
+                print(f"NL2Kubectl Tool command execution (API): {output}")
+                return output
+        result = run_bounded(command, timeout=self.command_timeout)
+        if result.truncated == "timeout" and not result.stdout:
+            print(f"Error executing kubectl command: timed out after {self.command_timeout}s")
+            logger.error(f"Error executing kubectl command: timed out after {self.command_timeout}s")
+            return f"Error executing kubectl command: timed out after {self.command_timeout}s. {result.stderr}"
+        if result.returncode == 0 or result.truncated:
+            output = result.stdout + (truncation_notice(result.truncated) if result.truncated else "")
+            logger.info(f"NL2Kubectl Tool command execution: {output}")
+            print(f"NL2Kubectl Tool command execution: {output}")
+            return output
         else:
             print(f"Error executing kubectl command: {result.stderr}")
             logger.error(f"Error executing kubectl command: {result.stderr}")
             return f"Error executing kubectl command: {result.stderr}"
-        
+
     def _summarize_kubernetes(self, kubernetes):
         system_prompt = "You do kubectl output analysis and summarization. Look at the kubectl output given to you and provide a brief summary and analysis of them."
         kubernetes_summary = self.llm_backend.inference(system_prompt, kubernetes)
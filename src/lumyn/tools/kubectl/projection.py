@@ -0,0 +1,250 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import dataclasses
+import json
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from lumyn.utils.tokens import estimate_tokens, tokens_to_chars
+
+from .kube_api_engine import resolve_targets
+from .kubectl_command import KubectlCommand
+
+# Output formats the user asked for explicitly; those are returned as-is rather than projected.
+EXPLICIT_OUTPUTS = ("jsonpath", "custom-columns", "go-template", "template", "name", "yaml", "wide")
+# Kinds project_object knows the diagnostic fields of; anything else runs as written so none of its data is lost.
+PROJECTED_KINDS = ("Pod", "Deployment", "StatefulSet", "ReplicaSet", "DaemonSet", "Service", "Node", "Event")
+RECENT_EVENTS_PER_OBJECT = 5
+
+
+def structured_command(parsed: Optional[KubectlCommand]) -> Optional[KubectlCommand]:
+    """The command rewritten as `kubectl get ... -o json`, or None when it should run unchanged."""
+    if parsed is None or parsed.verb not in ("get", "describe") or parsed.unknown_flags or not parsed.arguments:
+        return None
+    if parsed.output and parsed.output.startswith(EXPLICIT_OUTPUTS):
+        return None
+    targets = resolve_targets(parsed)
+    if targets is None or targets[0].kind not in PROJECTED_KINDS:
+        return None
+    return dataclasses.replace(parsed, verb="get", output="json")
+
+
+def events_command(parsed: KubectlCommand, output: Optional[str] = "json") -> str:
+    """Events to attach to the objects a structured command looked at.
+
+    A single named object gets only its own events; otherwise all events of the namespace(s) are fetched.
+    """
+    targets = resolve_targets(parsed)
+    field_selector = None
+    if targets is not None and len(targets[1]) == 1:
+        spec, (name,) = targets
+        field_selector = f"involvedObject.name={name},involvedObject.kind={spec.kind}"
+    return KubectlCommand(verb="get", arguments=["events"], namespace=parsed.namespace,
+                          all_namespaces=parsed.all_namespaces, field_selector=field_selector,
+                          output=output).to_command()
+
+
+def parse_events(output: str) -> Optional[List[Dict[str, Any]]]:
+    """Items of `kubectl get events -o json` output, or None if it is not JSON (an error, or cut off by the budget)."""
+    try:
+        document = json.loads(output)
+    except ValueError:
+        return None
+    return (document.get("items") or []) if isinstance(document, dict) else None
+
+
+def truncate_to_budget(text: str, token_budget: int) -> str:
+    limit = tokens_to_chars(token_budget)
+    if len(text) <= limit:
+        return text
+    return text[:limit] + f"\n... [truncated {len(text) - limit} of {len(text)} characters]"
+
+
+def _quantities(resources: Dict[str, Dict[str, str]], section: str) -> str:
+    values = resources.get(section) or {}
+    return ",".join(f"{key}={value}" for key, value in values.items()) or "-"
+
+
+def _container_state(state: Dict[str, Any]) -> str:
+    if "waiting" in state:
+        return f"waiting:{state['waiting'].get('reason', '')}"
+    if "terminated" in state:
+        terminated = state["terminated"]
+        return f"terminated:{terminated.get('reason', '')}({terminated.get('exitCode', '')})"
+    if "running" in state:
+        return "running"
+    return "-"
+
+
+def _last_termination(status: Dict[str, Any]) -> str:
+    terminated = (status.get("lastState") or {}).get("terminated")
+    if not terminated:
+        return "-"
+    return f"{terminated.get('reason', '')}({terminated.get('exitCode', '')}) at {terminated.get('finishedAt', '')}"
+
+
+def _conditions(obj: Dict[str, Any]) -> Tuple[str, bool]:
+    """Condition summary, and whether any condition indicates a problem."""
+    parts, unhealthy = [], False
+    for condition in (obj.get("status") or {}).get("conditions") or []:
+        status = condition.get("status")
+        condition_type = condition.get("type", "")
+        # Most condition types are good when True; the node pressure/unavailable ones are good when False.
+        bad = status != "True" if not condition_type.endswith(("Pressure", "Unavailable", "Failure")) else \
+            status == "True"
+        part = f"{condition_type}={status}"
+        if bad:
+            unhealthy = True
+            detail = condition.get("reason") or ""
+            if condition.get("message"):
+                detail += f": {condition['message']}"
+            part += f" ({detail.strip(': ')})" if detail else ""
+        parts.append(part)
+    return "; ".join(parts), unhealthy
+
+
+def _container_rows(spec: Dict[str, Any], statuses: List[Dict[str, Any]]) -> Tuple[List[str], bool]:
+    status_by_name = {status.get("name"): status for status in statuses}
+    rows, unhealthy = ["  container | image | state | ready | restarts | last_termination | requests | limits"], False
+    for container in spec.get("containers") or []:
+        status = status_by_name.get(container.get("name"), {})
+        resources = container.get("resources") or {}
+        if status and (not status.get("ready") or status.get("restartCount", 0) > 0):
+            unhealthy = True
+        rows.append("  " + " | ".join([
+            container.get("name", ""),
+            container.get("image", ""),
+            _container_state(status.get("state") or {}) if status else "-",
+            str(status.get("ready", "-")) if status else "-",
+            str(status.get("restartCount", 0)) if status else "-",
+            _last_termination(status),
+            _quantities(resources, "requests"),
+            _quantities(resources, "limits"),
+        ]))
+    return rows, unhealthy
+
+
+def _describe_selector(selector: Dict[str, Any]) -> str:
+    labels = selector.get("matchLabels", selector) if isinstance(selector, dict) else {}
+    return ",".join(f"{key}={value}" for key, value in labels.items() if isinstance(value, str)) or "-"
+
+
+def _event_line(event: Dict[str, Any]) -> str:
+    involved = event.get("involvedObject") or {}
+    return (f"{event.get('lastTimestamp') or event.get('eventTime') or ''} {event.get('type', '')} "
+            f"{event.get('reason', '')} {involved.get('kind', '')}/{involved.get('name', '')} "
+            f"x{event.get('count') or 1}: {(event.get('message') or '').strip()}")
+
+
+def project_object(obj: Dict[str, Any]) -> Optional[Tuple[List[str], bool]]:
+    """Diagnostically relevant lines for one object and whether it looks unhealthy; None for kinds not projected."""
+    kind = obj.get("kind", "")
+    metadata, spec, status = obj.get("metadata") or {}, obj.get("spec") or {}, obj.get("status") or {}
+    name = f"{metadata.get('namespace')}/{metadata.get('name')}" if metadata.get("namespace") else metadata.get("name")
+    conditions, unhealthy = _conditions(obj)
+
+    if kind == "Pod":
+        phase = status.get("reason") or status.get("phase", "")
+        lines = [f"Pod {name} phase={phase} node={spec.get('nodeName', '-')}"]
+        container_lines, unhealthy_containers = _container_rows(spec, status.get("containerStatuses") or [])
+        lines += container_lines
+        unhealthy = unhealthy or unhealthy_containers or phase not in ("Running", "Succeeded")
+    elif kind in ("Deployment", "StatefulSet", "ReplicaSet", "DaemonSet"):
+        desired = spec.get("replicas", status.get("desiredNumberScheduled", 0))
+        ready = status.get("readyReplicas", status.get("numberReady", 0))
+        lines = [f"{kind} {name} desired={desired} ready={ready} available="
+                 f"{status.get('availableReplicas', status.get('numberAvailable', 0))} updated="
+                 f"{status.get('updatedReplicas', status.get('updatedNumberScheduled', 0))} "
+                 f"selector={_describe_selector(spec.get('selector') or {})}"]
+        container_lines, _ = _container_rows((spec.get("template") or {}).get("spec") or {}, [])
+        lines += container_lines
+        unhealthy = unhealthy or ready != desired
+    elif kind == "Service":
+        ports = ",".join(f"{port.get('port')}->{port.get('targetPort')}/{port.get('protocol', 'TCP')}"
+                         for port in spec.get("ports") or [])
+        lines = [f"Service {name} type={spec.get('type')} clusterIP={spec.get('clusterIP')} ports={ports or '-'} "
+                 f"selector={_describe_selector(spec.get('selector') or {})}"]
+    elif kind == "Node":
+        allocatable = status.get("allocatable") or {}
+        lines = [f"Node {name} allocatable cpu={allocatable.get('cpu', '-')} memory={allocatable.get('memory', '-')}"
+                 f" unschedulable={spec.get('unschedulable', False)}"]
+    elif kind == "Event":
+        return [_event_line(obj)], obj.get("type") == "Warning"
+    else:
+        return None
+    if conditions:
+        lines.append(f"  conditions: {conditions}")
+    return lines, unhealthy
+
+
+def _event_lines(events: List[Dict[str, Any]]) -> List[str]:
+    recent = sorted(events, key=lambda event: event.get("lastTimestamp") or event.get("eventTime") or "")
+    return [_event_line(event) for event in recent[-RECENT_EVENTS_PER_OBJECT:]]
+
+
+def project_output(output: str, token_budget: int, events: Optional[List[Dict[str, Any]]] = None,
+                   events_table: Optional[str] = None) -> Optional[str]:
+    """Compact rendering of `kubectl get -o json` output within a token budget.
+
+    `events` are attached to the objects they are about; `events_table` (plain `kubectl get events` output, for when
+    the JSON did not fit) is appended as is. None if the output is not JSON (e.g. truncated) or holds a kind
+    project_object does not know.
+    """
+    try:
+        document = json.loads(output)
+    except ValueError:
+        return None
+    if not isinstance(document, dict):
+        return None
+    objects = document.get("items") if document.get("kind", "").endswith("List") else [document]
+    if not objects:
+        return "No resources found."
+
+    events_by_uid = defaultdict(list)
+    for event in events or []:
+        events_by_uid[(event.get("involvedObject") or {}).get("uid")].append(event)
+
+    if all(obj.get("kind") == "Event" or "involvedObject" in obj for obj in objects):
+        blocks = [([_event_line(event)], event.get("type") == "Warning") for event in
+                  sorted(objects, key=lambda event: event.get("lastTimestamp") or event.get("eventTime") or "",
+                         reverse=True)]
+    else:
+        blocks = []
+        for obj in objects:
+            projected = project_object(obj)
+            if projected is None:
+                return None
+            lines, unhealthy = projected
+            events = events_by_uid.get((obj.get("metadata") or {}).get("uid"))
+            if events:
+                lines += ["  events:"] + ["    " + line for line in _event_lines(events)]
+                unhealthy = unhealthy or any(event.get("type") == "Warning" for event in events)
+            blocks.append((lines, unhealthy))
+    # Unhealthy objects and warnings first so the budget keeps what matters for diagnosis.
+    blocks.sort(key=lambda block: not block[1])
+
+    rendered, used = [], 0
+    for position, (lines, _) in enumerate(blocks):
+        text = "\n".join(lines)
+        cost = estimate_tokens(text) + 1
+        if rendered and used + cost > token_budget:
+            rendered.append(f"... {len(blocks) - position} more objects omitted (token budget {token_budget})")
+            break
+        rendered.append(text)
+        used += cost
+    if events_table:
+        rendered.append(f"events:\n{events_table}")
+    return truncate_to_budget("\n".join(rendered), token_budget)
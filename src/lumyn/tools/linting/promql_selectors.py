@@ -0,0 +1,132 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+IDENTIFIER_PATTERN = re.compile(r"[a-zA-Z_:][a-zA-Z0-9_:]*")
+MATCHER_PATTERN = re.compile(
+    r"\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*(=~|!~|!=|=)\s*(\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*'|`[^`]*`)\s*,?")
+
+# Keywords followed by a parenthesised list of label names rather than an expression.
+GROUPING_KEYWORDS = {"by", "without", "on", "ignoring", "group_left", "group_right"}
+KEYWORDS = {"and", "or", "unless", "bool", "offset", "inf", "nan", "atan2"}
+# Aggregations may be followed by a grouping clause before their parentheses, e.g. `sum by (pod) (...)`.
+AGGREGATION_OPERATORS = {
+    "sum", "min", "max", "avg", "group", "stddev", "stdvar", "count", "count_values", "bottomk", "topk", "quantile",
+    "limitk", "limit_ratio"
+}
+
+
+class VectorSelector(NamedTuple):
+    metric: Optional[str]
+    matchers: List[Tuple[str, str, str]]
+    text: str
+    # Inside an aggregation's parentheses, so the query returns fewer series than the selector matches.
+    aggregated: bool = False
+
+
+def _skip_quoted(query: str, start: int) -> int:
+    quote = query[start]
+    i = start + 1
+    while i < len(query) and query[i] != quote:
+        i += 2 if query[i] == "\\" and quote != "`" else 1
+    return i + 1
+
+
+def _skip_group(query: str, start: int, opening: str, closing: str) -> int:
+    depth = 0
+    i = start
+    while i < len(query):
+        if query[i] in "\"'`":
+            i = _skip_quoted(query, i)
+            continue
+        if query[i] == opening:
+            depth += 1
+        elif query[i] == closing:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def _parse_matchers(query: str, start: int) -> Tuple[List[Tuple[str, str, str]], int]:
+    end = _skip_group(query, start, "{", "}")
+    body = query[start + 1:end - 1]
+    matchers = [(label, operator, value[1:-1]) for label, operator, value in MATCHER_PATTERN.findall(body)]
+    return matchers, end
+
+
+def extract_vector_selectors(query: str) -> List[VectorSelector]:
+    """Find the instant/range vector selectors of a PromQL query without a full parser.
+
+    Function and aggregation names, grouping label lists, durations, numbers and string
+    arguments are skipped; what remains are metric names and/or label matcher blocks.
+    """
+    selectors = []
+    # One entry per open parenthesis: whether it (or one it is nested in) belongs to an aggregation.
+    parentheses: List[bool] = []
+    aggregation_pending = False
+    i = 0
+    while i < len(query):
+        character = query[i]
+        if character in "\"'`":
+            i = _skip_quoted(query, i)
+        elif character == "[":
+            i = _skip_group(query, i, "[", "]")
+        elif character == "{":
+            matchers, end = _parse_matchers(query, i)
+            metric = next((value for label, operator, value in matchers if label == "__name__" and operator == "="),
+                          None)
+            selectors.append(VectorSelector(metric, matchers, query[i:end], any(parentheses)))
+            i = end
+        elif IDENTIFIER_PATTERN.match(character):
+            identifier = IDENTIFIER_PATTERN.match(query, i).group(0)
+            start = i
+            i += len(identifier)
+            j = i
+            while j < len(query) and query[j].isspace():
+                j += 1
+            next_character = query[j] if j < len(query) else ""
+            if identifier.lower() in GROUPING_KEYWORDS:
+                if next_character == "(":
+                    i = _skip_group(query, j, "(", ")")
+                continue
+            if identifier.lower() in AGGREGATION_OPERATORS and next_character != "{":
+                aggregation_pending = True
+                continue
+            if next_character == "(" or identifier.lower() in KEYWORDS:
+                continue
+            if next_character == "{":
+                matchers, i = _parse_matchers(query, j)
+            else:
+                matchers = []
+            selectors.append(VectorSelector(identifier, matchers, query[start:i], any(parentheses)))
+        elif character.isdigit() or character == ".":
+            # Numbers and durations (5m, 1h30m, 1e3, 0x1f) are not selectors.
+            while i < len(query) and (query[i].isalnum() or query[i] == "."):
+                i += 1
+        elif character == "(":
+            parentheses.append(aggregation_pending)
+            aggregation_pending = False
+            i += 1
+        elif character == ")":
+            if parentheses:
+                parentheses.pop()
+            i += 1
+        else:
+            i += 1
+    return selectors
@@ -20,6 +20,9 @@ from typing import Any
 from crewai.tools.base_tool import BaseTool
 from pydantic import BaseModel, Field
 
+from lumyn.llm_backends.response_cache import scoped_tool_run
+from lumyn.tools.grafana.compact_encoding import COMPACT_ENCODING, COMPACT_ENCODING_TOKEN_BUDGET, encode_payload
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
@@ -35,9 +38,15 @@ class LLMAnalyzerCustomTool(BaseTool):
     name: str = "Summarize content and key insights."
     description: str = ("A tool that be used to summarize the content given and list key insights.")
     llm_backend: Any
+    compact_encoding: bool = COMPACT_ENCODING
+    compact_token_budget: int = COMPACT_ENCODING_TOKEN_BUDGET
 
+    @scoped_tool_run
     def _run(self, content_to_summarize: str) -> str:
         input = content_to_summarize
+        if self.compact_encoding:
+            # JSON tool output (metrics, logs, traces, object lists) is tabulated; plain text passes through.
+            input = encode_payload(content_to_summarize, self.compact_token_budget).render()
         system_prompt = "You are tasked with analyzing and summarizing the content provided, particularly from the IT operations domain. Please summarize and make note of any key insights."
         try:
             response = self.llm_backend.inference(system_prompt, input)
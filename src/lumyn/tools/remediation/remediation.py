@@ -20,6 +20,8 @@ from typing import Any
 from crewai.tools.base_tool import BaseTool
 from pydantic import BaseModel, Field
 
+from lumyn.llm_backends.response_cache import scoped_tool_run
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
@@ -35,6 +37,7 @@ class RemediationCustomTool(BaseTool):
     description: str = ("A tool that provides remediation steps to resolve faults identified.")
     llm_backend: Any
 
+    @scoped_tool_run
     def _run(self, diagnosis_to_remediate: str) -> str:
         
 
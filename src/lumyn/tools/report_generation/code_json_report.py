@@ -22,6 +22,7 @@ from pydantic import BaseModel, Field
 from crewai_tools import FileWriterTool
 from crewai.tasks import TaskOutput
 
+from lumyn.llm_backends.response_cache import scoped_tool_run
 
 # Initialize the tool
 
@@ -41,6 +42,7 @@ class CodeJSONReportCustomTool(BaseTool):
     description: str = ("A tool that can be used to extract the JSON-formatted code commands from the input.")
     llm_backend: Any
 
+    @scoped_tool_run
     def _run(self, output: TaskOutput) -> str:
         commands = output.raw 
         input = commands
@@ -23,6 +23,9 @@ from pydantic import BaseModel, Field
 from crewai_tools import FileWriterTool
 import json 
 import datetime
+
+from lumyn.llm_backends.response_cache import scoped_tool_run
+
 # Initialize the tool
 
 
@@ -36,6 +39,7 @@ class DiagnosisJSONReportCustomTool(BaseTool):
     description: str = ("A tool that be used to structure the identified faults from the summary of diagnosis.")
     llm_backend: Any
 
+    @scoped_tool_run
     def _run(self, output: TaskOutput) -> str:
         diagnosis_summary = output.raw
 
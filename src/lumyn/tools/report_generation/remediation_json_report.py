@@ -22,6 +22,8 @@ from pydantic import BaseModel, Field
 from crewai_tools import FileWriterTool
 from crewai.tasks import TaskOutput
 
+from lumyn.llm_backends.response_cache import scoped_tool_run
+
 # Initialize the tool
 
 
@@ -34,6 +36,7 @@ class RemediationJSONReportCustomTool(BaseTool):
     description: str = ("A tool that can be used to extract the JSON-formatted remediation steps from the remediation plan.")
     llm_backend: Any
 
+    @scoped_tool_run
     def _run(self, output: TaskOutput) -> str:
         remediation_plan = output.raw 
         
@@ -0,0 +1,47 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Iterable, List, Optional
+
+
+def run_sync(coroutine: Awaitable[Any]) -> Any:
+    """Run a coroutine to completion from synchronous code, even when called inside a running event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    # A loop is already running in this thread (e.g. an async crew); drive the coroutine on a fresh one elsewhere.
+    # Carry context variables (e.g. the LLM cache's tool scope) over to that thread.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(contextvars.copy_context().run, asyncio.run, coroutine).result()
+
+
+async def gather_bounded(awaitables: Iterable[Awaitable[Any]],
+                         limit: Optional[int] = None,
+                         return_exceptions: bool = True) -> List[Any]:
+    """asyncio.gather with at most `limit` awaitables in flight, results in input order."""
+    if not limit:
+        return await asyncio.gather(*awaitables, return_exceptions=return_exceptions)
+    semaphore = asyncio.Semaphore(limit)
+
+    async def _bounded(awaitable):
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(*(_bounded(awaitable) for awaitable in awaitables),
+                                return_exceptions=return_exceptions)
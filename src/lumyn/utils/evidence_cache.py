@@ -0,0 +1,111 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import datetime
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+EVIDENCE_PREFETCH = os.getenv("EVIDENCE_PREFETCH", "True") == "True"
+# Pre-fetched evidence older than this is no longer served; the tools query live instead.
+EVIDENCE_CACHE_TTL = float(os.getenv("EVIDENCE_CACHE_TTL", 900))
+
+
+class Evidence(NamedTuple):
+    signal: str
+    entity: str
+    text: str
+    terms: Tuple[str, ...]
+    fetched_at: float
+
+
+def _mentions(query: str, term: str) -> bool:
+    # Entity names contain dashes, so a dash does not end a word here ("cart" must not match "cart-redis").
+    return re.search(rf"(?<![\w-]){re.escape(term.lower())}(?![\w-])", query.lower()) is not None
+
+
+class EvidenceCache:
+    """Process-wide evidence pre-fetched for the alerting entities, keyed by (signal, entity).
+
+    Each entry is served once, alongside the live answer to the first tool query of its signal that mentions the
+    entity: a query naming the entity may ask about something else entirely, so the evidence never replaces it.
+    """
+
+    def __init__(self, ttl: float = EVIDENCE_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, str], Evidence] = {}
+        self._served: set = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, signal: str, entity: str, text: str, terms: Iterable[str] = ()):
+        """Store evidence for an entity; `terms` are other names a query may use for it (e.g. its Jaeger service)."""
+        evidence = Evidence(signal, entity, text, tuple(dict.fromkeys([entity, *terms])), time.time())
+        with self._lock:
+            self._entries[(signal, entity)] = evidence
+            self._served.discard((signal, entity))
+
+    def take(self, signal: str, query: str) -> Optional[str]:
+        """Unserved evidence of `signal` for the entities `query` mentions, marked served; None if there is none."""
+        now = time.time()
+        with self._lock:
+            matched = [
+                evidence for key, evidence in self._entries.items()
+                if key[0] == signal and key not in self._served and now - evidence.fetched_at < self.ttl
+                and any(_mentions(query, term) for term in evidence.terms)
+            ]
+            if not matched:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._served.update((evidence.signal, evidence.entity) for evidence in matched)
+        logger.info(f"Evidence cache served {signal} evidence for {', '.join(e.entity for e in matched)}")
+        return "\n\n".join(
+            f"Pre-fetched {evidence.signal} evidence for {evidence.entity} as of "
+            f"{datetime.datetime.fromtimestamp(evidence.fetched_at, tz=datetime.timezone.utc).strftime('%H:%M:%S')} "
+            f"UTC:\n{evidence.text}" for evidence in matched)
+
+    def digest(self) -> List[str]:
+        """One line per cached entry: signal, entity and size, for logging what the crew starts with."""
+        with self._lock:
+            return [f"{evidence.signal} {evidence.entity}: {len(evidence.text)} chars"
+                    for evidence in self._entries.values()]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._served.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries),
+                    "served": len(self._served)}
+
+
+def with_evidence(evidence: Optional[str], output: Any) -> Any:
+    """Prefix a tool's live output with the pre-fetched evidence taken for its query, if any."""
+    if evidence is None:
+        return output
+    return f"{evidence}\n\nLive result for this query:\n{output}"
+
+
+evidence_cache = EvidenceCache()
@@ -0,0 +1,39 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import datetime
+import os
+import time
+from typing import Optional, Tuple
+
+INCIDENT_LOOKBACK_SECONDS = int(os.getenv("INCIDENT_LOOKBACK_SECONDS", 3600))
+
+
+def get_alert_start_time() -> Optional[float]:
+    """Alert start as a Unix timestamp in seconds, if main.run() recorded one in ALERT_START_TIME."""
+    alert_start_time = os.getenv("ALERT_START_TIME")
+    if not alert_start_time:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(alert_start_time).timestamp()
+    except ValueError:
+        return None
+
+
+def get_incident_window(lookback_seconds: int = INCIDENT_LOOKBACK_SECONDS) -> Tuple[float, float]:
+    """(start, end) in Unix seconds covering the lookback before the alert start (or now) up to now."""
+    end = time.time()
+    anchor = get_alert_start_time() or end
+    return min(anchor, end) - lookback_seconds, end
@@ -0,0 +1,27 @@
+# Copyright contributors to the ITBench project. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+
+# Rough characters-per-token ratio; good enough for budgeting without pulling in a tokenizer per backend.
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", 4))
+
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text) / CHARS_PER_TOKEN + 0.999)
+
+
+def tokens_to_chars(tokens: int) -> int:
+    return int(tokens * CHARS_PER_TOKEN)